@@ -4,3 +4,18 @@ from django.apps import AppConfig
 class ApiConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'api'
+
+    def ready(self):
+        from . import signals  # noqa: F401
+
+        from django.db.backends.signals import connection_created
+        from .metricas import instalar_en_conexion
+        connection_created.connect(instalar_en_conexion, dispatch_uid='metricas_consultas')
+
+        from django.conf import settings
+        if settings.ML['PRECARGAR']:
+            from .prediccion import get_servicio
+            try:
+                get_servicio().cargar()
+            except Exception as e:
+                print(f"Error cargando modelo ML: {str(e)}")
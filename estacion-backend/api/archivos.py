@@ -0,0 +1,81 @@
+"""
+Utilidades para archivos de datos compartidos entre workers
+"""
+import os
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+
+@contextmanager
+def bloqueo_exclusivo(f):
+    """
+    Bloqueo a nivel de sistema operativo sobre un archivo abierto.
+
+    Serializa las escrituras de varios procesos (workers de gunicorn)
+    sobre el mismo archivo.
+    """
+    if fcntl is not None:
+        fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+        try:
+            yield f
+        finally:
+            fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+    else:
+        posicion = f.tell()
+        f.seek(0)
+        msvcrt.locking(f.fileno(), msvcrt.LK_LOCK, 1)
+        f.seek(posicion)
+        try:
+            yield f
+        finally:
+            f.seek(0)
+            msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+            f.seek(0, os.SEEK_END)
+
+
+@contextmanager
+def abrir_para_agregar(ruta, modo='a', **kwargs):
+    """
+    Abre un archivo en modo 'a' (o 'a+' para leerlo) con bloqueo exclusivo.
+
+    Si mientras se esperaba el bloqueo el archivo fue reemplazado
+    (recálculo o rotación con os.replace), se vuelve a abrir la ruta
+    para no escribir en el archivo viejo.
+    """
+    while True:
+        f = open(ruta, modo, **kwargs)
+        try:
+            with bloqueo_exclusivo(f):
+                try:
+                    reemplazado = os.fstat(f.fileno()).st_ino != os.stat(ruta).st_ino
+                except FileNotFoundError:
+                    reemplazado = True
+                if not reemplazado:
+                    f.seek(0, os.SEEK_END)
+                    yield f
+                    return
+        finally:
+            f.close()
+
+
+def intentar_bloqueo(f):
+    """
+    Intenta el bloqueo exclusivo sin esperar.
+
+    Retorna False si otro proceso ya lo tiene. El bloqueo se libera al
+    cerrar el archivo.
+    """
+    try:
+        if fcntl is not None:
+            fcntl.flock(f.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+        else:
+            f.seek(0)
+            msvcrt.locking(f.fileno(), msvcrt.LK_NBLCK, 1)
+    except OSError:
+        return False
+    return True
@@ -0,0 +1,72 @@
+from django.utils.functional import cached_property
+from rest_framework_simplejwt.authentication import JWTAuthentication, JWTStatelessUserAuthentication
+from rest_framework_simplejwt.exceptions import AuthenticationFailed
+from rest_framework_simplejwt.models import TokenUser
+
+from .roles import cache_roles
+
+
+class UsuarioToken(TokenUser):
+    """Usuario construido desde los claims del token, sin consultar auth_user"""
+
+    @cached_property
+    def rol(self):
+        return self.token.get('rol')
+
+    @cached_property
+    def rol_version(self):
+        return self.token.get('rol_version', 0)
+
+    @cached_property
+    def email(self):
+        return self.token.get('email', '')
+
+    @cached_property
+    def first_name(self):
+        return self.token.get('first_name', '')
+
+    @cached_property
+    def last_name(self):
+        return self.token.get('last_name', '')
+
+
+class JWTRolAuthentication(JWTStatelessUserAuthentication):
+    """
+    Autenticación JWT que usa los claims de rol del token.
+
+    Tokens emitidos antes de incluir el rol se validan contra la BD como
+    siempre. Para el resto solo se compara la versión de rol del token con
+    la cache de roles: un cambio de rol, de superusuario o la desactivación
+    del usuario invalidan los tokens emitidos antes.
+    """
+
+    def get_user(self, validated_token):
+        if 'rol' not in validated_token:
+            return JWTAuthentication.get_user(self, validated_token)
+
+        user = super().get_user(validated_token)
+        entrada = cache_roles.obtener_entrada(user.id)
+        if entrada is None or not entrada.is_active:
+            raise AuthenticationFailed('Usuario inactivo o eliminado', code='user_inactive')
+        if entrada.version != user.rol_version or entrada.is_superuser != user.is_superuser:
+            raise AuthenticationFailed(
+                'El rol del usuario cambió, vuelve a iniciar sesión',
+                code='rol_changed'
+            )
+        return user
+
+
+def claims_de_usuario(user):
+    """Claims de rol que se agregan al token al iniciar sesión"""
+    # Se lee de la BD (no de la cache) para no emitir una versión vieja
+    cache_roles.invalidar(user.pk)
+    entrada = cache_roles.obtener_entrada(user.pk)
+    return {
+        'rol': entrada.rol,
+        'rol_version': entrada.version,
+        'is_superuser': entrada.is_superuser,
+        'username': user.username,
+        'email': user.email,
+        'first_name': user.first_name,
+        'last_name': user.last_name,
+    }
@@ -0,0 +1,106 @@
+"""
+Autenticación con email o username en una sola consulta
+"""
+import threading
+import time
+
+from django.conf import settings
+from django.contrib.auth.backends import ModelBackend
+from django.contrib.auth.models import User
+from django.db.models import Q
+
+
+class ContadorFallos:
+    """
+    Intentos de login fallidos por identificador (email o username) en
+    memoria del proceso. Al superar MAX_FALLOS dentro de VENTANA segundos
+    el identificador queda bloqueado hasta que la ventana expire, sin
+    llegar a calcular el hash de la contraseña.
+    """
+
+    def __init__(self, max_fallos=None, ventana=None, maximo_entradas=10000):
+        self.max_fallos = max_fallos or settings.LOGIN_THROTTLE['MAX_FALLOS']
+        self.ventana = ventana or settings.LOGIN_THROTTLE['VENTANA']
+        self.maximo_entradas = maximo_entradas
+        self._fallos = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _clave(identificador):
+        return (identificador or '').strip().lower()
+
+    def espera(self, identificador):
+        """Segundos que faltan para desbloquear el identificador (0 si no está bloqueado)"""
+        clave = self._clave(identificador)
+        ahora = time.monotonic()
+        with self._lock:
+            entrada = self._fallos.get(clave)
+            if entrada is None:
+                return 0
+            cantidad, inicio = entrada
+            if ahora - inicio >= self.ventana:
+                del self._fallos[clave]
+                return 0
+            if cantidad >= self.max_fallos:
+                return int(self.ventana - (ahora - inicio)) + 1
+            return 0
+
+    def registrar_fallo(self, identificador):
+        clave = self._clave(identificador)
+        ahora = time.monotonic()
+        with self._lock:
+            cantidad, inicio = self._fallos.get(clave, (0, ahora))
+            if ahora - inicio >= self.ventana:
+                cantidad, inicio = 0, ahora
+            self._fallos[clave] = (cantidad + 1, inicio)
+            if len(self._fallos) > self.maximo_entradas:
+                self._purgar(ahora)
+
+    def reiniciar(self, identificador):
+        with self._lock:
+            self._fallos.pop(self._clave(identificador), None)
+
+    def _purgar(self, ahora):
+        vencidas = [clave for clave, (_, inicio) in self._fallos.items() if ahora - inicio >= self.ventana]
+        for clave in vencidas:
+            del self._fallos[clave]
+        # Si todas siguen vigentes, se descartan las más antiguas
+        exceso = len(self._fallos) - self.maximo_entradas
+        if exceso > 0:
+            for clave in sorted(self._fallos, key=lambda c: self._fallos[c][1])[:exceso]:
+                del self._fallos[clave]
+
+
+contador_fallos = ContadorFallos()
+
+
+class EmailOUsernameBackend(ModelBackend):
+    """Permite login con email o username resolviendo el usuario en una sola consulta"""
+
+    def authenticate(self, request, username=None, password=None, **kwargs):
+        identificador = username or kwargs.get(User.USERNAME_FIELD)
+        if not identificador or password is None:
+            return None
+
+        if contador_fallos.espera(identificador):
+            return None
+
+        candidatos = list(
+            User.objects.filter(Q(username=identificador) | Q(email=identificador))[:2]
+        )
+        # Si el texto es username de uno y email de otro, gana el username
+        candidatos.sort(key=lambda user: user.username != identificador)
+
+        if not candidatos:
+            # Igual se calcula un hash para no revelar qué usuarios existen
+            User().set_password(password)
+            contador_fallos.registrar_fallo(identificador)
+            return None
+
+        user = candidatos[0]
+        if user.check_password(password) and self.user_can_authenticate(user):
+            contador_fallos.reiniciar(identificador)
+            return user
+
+        contador_fallos.registrar_fallo(identificador)
+        return None
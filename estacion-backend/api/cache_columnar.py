@@ -0,0 +1,331 @@
+"""
+Cache columnar del CSV de cultivos en archivos binarios mapeados en memoria
+
+Cada columna del CSV se guarda en un archivo .bin (int64 para la fecha en
+nanosegundos UTC, float64 para las métricas, int8 para los cultivos) junto
+a un meta.json con el offset del CSV ya procesado. Como el CSV solo crece
+por el final, refrescar la cache solo parsea los bytes agregados desde ese
+offset. Los workers abren los .bin con np.memmap, así todos comparten la
+misma copia desde la cache de páginas del sistema operativo.
+
+Un archivo mapeado nunca se achica (leer una página más allá del final
+termina el proceso con SIGBUS): si el CSV se reemplaza, la cache se
+reconstruye en archivos de una generación nueva ({columna}.{n}.bin) y
+meta.json pasa a apuntar a ellos. Quien tenga mapeada la generación
+anterior sigue leyéndola hasta que vuelva a abrir la cache.
+"""
+import io
+import json
+import os
+import re
+import threading
+
+import numpy as np
+import pandas as pd
+from django.conf import settings
+
+from .archivos import bloqueo_exclusivo
+from .ingesta import CAMPOS_CSV, CULTIVOS, METRICAS
+
+
+VERSION_FORMATO = 2
+
+NAT = np.iinfo(np.int64).min
+
+TIPOS_COLUMNA = {'date': np.int64}
+TIPOS_COLUMNA.update({metrica: np.float64 for metrica in METRICAS})
+TIPOS_COLUMNA.update({cultivo: np.int8 for cultivo in CULTIVOS})
+
+VALORES_CULTIVO = {'Si': 1, 'No': 0}
+
+# Offset o 'Z' al final de una fecha ISO ("...T11:00:00Z", "... 10:00-05:00")
+PATRON_ZONA = r'(?:[zZ]|[+-]\d{2}:?\d{2})$'
+
+ARCHIVO_COLUMNA = re.compile(r'^(?P<columna>\w+?)(?:\.(?P<generacion>\d+))?\.bin$')
+
+
+class CacheColumnar:
+    """Imagen columnar de un CSV que solo crece por el final"""
+
+    def __init__(self, ruta_csv=None, directorio=None):
+        self.ruta_csv = str(ruta_csv or settings.INGESTA['CSV_CULTIVOS'])
+        self.directorio = str(directorio or settings.CACHE_COLUMNAR_DIR)
+        os.makedirs(self.directorio, exist_ok=True)
+        self._lock = threading.Lock()
+        self._mapas = None
+        self._meta_mapeada = _meta_vacio()
+
+    # ------------------------------------------------------------------
+    # Lectura
+    # ------------------------------------------------------------------
+
+    def columnas(self):
+        """
+        Retorna {columna: np.memmap} de solo lectura con todas las filas.
+        La fecha viene en int64 (ns UTC); NAT marca fechas inválidas.
+        """
+        meta = self.refrescar()
+        with self._lock:
+            mapeada = self._meta_mapeada
+            if (self._mapas is None or mapeada['filas'] != meta['filas']
+                    or mapeada['generacion'] != meta['generacion']):
+                self._mapas = {
+                    columna: self._mapear(columna, tipo, meta['filas'], meta['generacion'])
+                    for columna, tipo in TIPOS_COLUMNA.items()
+                }
+                self._meta_mapeada = meta
+            return self._mapas
+
+    def frame(self, desde=None, hasta=None, columnas=None):
+        """
+        DataFrame con índice de fecha (zona horaria local) para el rango
+        [desde, hasta). Solo se copian las filas del rango pedido.
+        """
+        datos = self.columnas()
+        fechas = datos['date']
+        seleccion = self._seleccion(fechas, desde, hasta)
+
+        nombres = columnas or (METRICAS + CULTIVOS)
+        indice = pd.to_datetime(fechas[seleccion], utc=True).tz_convert(settings.TIME_ZONE)
+        frame = pd.DataFrame(
+            {nombre: np.asarray(datos[nombre][seleccion]) for nombre in nombres},
+            index=indice,
+        )
+        frame.index.name = 'date'
+        return frame[frame.index.notna()]
+
+    def _seleccion(self, fechas, desde, hasta):
+        inicio = _a_ns(desde)
+        fin = _a_ns(hasta)
+        if self._meta_mapeada['ordenado']:
+            izquierda = 0 if inicio is None else int(np.searchsorted(fechas, inicio, side='left'))
+            derecha = len(fechas) if fin is None else int(np.searchsorted(fechas, fin, side='left'))
+            # Las fechas inválidas (NAT) quedan al inicio de una serie ordenada
+            izquierda = max(izquierda, int(np.searchsorted(fechas, NAT, side='right')))
+            return slice(izquierda, max(izquierda, derecha))
+
+        mascara = fechas != NAT
+        if inicio is not None:
+            mascara &= fechas >= inicio
+        if fin is not None:
+            mascara &= fechas < fin
+        return mascara
+
+    def _mapear(self, columna, tipo, filas, generacion):
+        if filas == 0:
+            return np.empty(0, dtype=tipo)
+        return np.memmap(self._ruta_columna(columna, generacion), dtype=tipo, mode='r', shape=(filas,))
+
+    # ------------------------------------------------------------------
+    # Refresco incremental
+    # ------------------------------------------------------------------
+
+    def refrescar(self):
+        """
+        Agrega a la cache las filas escritas en el CSV desde el último
+        refresco. Si el CSV fue reemplazado (rotación) se reconstruye.
+        """
+        meta = self._leer_meta()
+        try:
+            estado = os.stat(self.ruta_csv)
+        except FileNotFoundError:
+            return meta
+
+        if not self._necesita_refresco(meta, estado):
+            return meta
+
+        with open(os.path.join(self.directorio, 'cache.lock'), 'a') as candado:
+            with bloqueo_exclusivo(candado):
+                # Otro worker pudo refrescar mientras esperábamos el bloqueo
+                meta = self._leer_meta()
+                estado = os.stat(self.ruta_csv)
+                if self._necesita_refresco(meta, estado):
+                    meta = self._agregar_filas(meta, estado)
+        return meta
+
+    def _necesita_refresco(self, meta, estado):
+        return meta['inodo'] != estado.st_ino or estado.st_size != meta['offset']
+
+    def _agregar_filas(self, meta, estado):
+        reconstruir = meta['inodo'] != estado.st_ino or estado.st_size < meta['offset']
+        if reconstruir:
+            # Generación nueva: los archivos mapeados no se tocan
+            meta = _meta_vacio()
+            meta['inodo'] = estado.st_ino
+            meta['generacion'] = self._nueva_generacion()
+
+        with open(self.ruta_csv, 'rb') as f:
+            f.seek(meta['offset'])
+            bloque = f.read(estado.st_size - meta['offset'])
+
+        # Una línea a medio escribir queda para el próximo refresco
+        fin = bloque.rfind(b'\n') + 1
+        bloque = bloque[:fin]
+        if not bloque:
+            if reconstruir:
+                self._crear_columnas(meta['generacion'])
+                self._guardar_meta(meta)
+                self._borrar_generaciones_viejas(meta['generacion'])
+            return meta
+
+        saltar = 1 if meta['offset'] == 0 and bloque.startswith(b'date,') else 0
+        columnas = _parsear(bloque, saltar)
+
+        fechas = columnas['date']
+        validas = fechas[fechas != NAT]
+        ordenado = meta['ordenado'] and bool(np.all(np.diff(fechas) >= 0))
+        if ordenado and len(fechas) and meta['ultima_fecha'] is not None:
+            ordenado = bool(fechas[0] >= meta['ultima_fecha'])
+
+        if reconstruir:
+            self._crear_columnas(meta['generacion'])
+        for columna, valores in columnas.items():
+            ruta = self._ruta_columna(columna, meta['generacion'])
+            tamano = meta['filas'] * np.dtype(TIPOS_COLUMNA[columna]).itemsize
+            with open(ruta, 'ab') as destino:
+                # Descarta bytes de un refresco interrumpido antes de actualizar
+                # meta.json; nadie mapea más allá de meta['filas']
+                destino.truncate(tamano)
+                destino.write(valores.tobytes())
+
+        meta.update({
+            'offset': meta['offset'] + fin,
+            'filas': meta['filas'] + len(fechas),
+            'ordenado': ordenado,
+            'ultima_fecha': int(validas.max()) if len(validas) else meta['ultima_fecha'],
+        })
+        self._guardar_meta(meta)
+        if reconstruir:
+            self._borrar_generaciones_viejas(meta['generacion'])
+        return meta
+
+    # ------------------------------------------------------------------
+    # Archivos de la cache
+    # ------------------------------------------------------------------
+
+    def _ruta_columna(self, columna, generacion):
+        return os.path.join(self.directorio, f'{columna}.{generacion}.bin')
+
+    def _generaciones(self):
+        """{ruta: generacion} de los .bin del directorio (None: formato anterior)"""
+        resultado = {}
+        for nombre in os.listdir(self.directorio):
+            coincidencia = ARCHIVO_COLUMNA.match(nombre)
+            if coincidencia and coincidencia.group('columna') in TIPOS_COLUMNA:
+                generacion = coincidencia.group('generacion')
+                resultado[os.path.join(self.directorio, nombre)] = None if generacion is None else int(generacion)
+        return resultado
+
+    def _nueva_generacion(self):
+        # Mayor que cualquier archivo existente, aunque meta.json se haya perdido
+        existentes = [generacion for generacion in self._generaciones().values() if generacion is not None]
+        return max(existentes, default=0) + 1
+
+    def _crear_columnas(self, generacion):
+        for columna in TIPOS_COLUMNA:
+            # Restos de una reconstrucción interrumpida: nadie los mapea
+            open(self._ruta_columna(columna, generacion), 'wb').close()
+
+    def _borrar_generaciones_viejas(self, actual):
+        # Quitar el nombre no invalida los mapeos existentes
+        for ruta, generacion in self._generaciones().items():
+            if generacion != actual:
+                try:
+                    os.remove(ruta)
+                except OSError:
+                    pass
+
+    def _leer_meta(self):
+        try:
+            with open(os.path.join(self.directorio, 'meta.json'), encoding='utf-8') as f:
+                meta = json.load(f)
+        except (FileNotFoundError, ValueError):
+            return _meta_vacio()
+        if meta.get('version') != VERSION_FORMATO:
+            return _meta_vacio()
+        return meta
+
+    def _guardar_meta(self, meta):
+        ruta = os.path.join(self.directorio, 'meta.json')
+        temporal = f'{ruta}.{os.getpid()}.tmp'
+        with open(temporal, 'w', encoding='utf-8') as f:
+            json.dump(meta, f)
+        os.replace(temporal, ruta)
+
+
+def _meta_vacio():
+    return {
+        'version': VERSION_FORMATO,
+        'inodo': None,
+        'generacion': 0,
+        'offset': 0,
+        'filas': 0,
+        'ordenado': True,
+        'ultima_fecha': None,
+    }
+
+
+def _a_ns(fecha):
+    if fecha is None:
+        return None
+    fecha = pd.Timestamp(fecha)
+    if fecha.tzinfo is None:
+        fecha = fecha.tz_localize(settings.TIME_ZONE)
+    return fecha.tz_convert('UTC').value
+
+
+def _parsear(bloque, saltar):
+    """Convierte un bloque de bytes del CSV en arreglos por columna"""
+    crudo = pd.read_csv(
+        io.BytesIO(bloque), header=None, names=CAMPOS_CSV, skiprows=saltar,
+        dtype=str, keep_default_na=False, on_bad_lines='skip',
+    )
+    return convertir_columnas(crudo)
+
+
+def convertir_fechas(textos):
+    """
+    Fechas de texto a int64 (ns UTC); NAT si no son válidas.
+
+    Las fechas sin zona son hora local (TIME_ZONE); las que traen offset o
+    'Z' se respetan. Se convierten por separado: mezcladas, pandas retorna
+    objetos en vez de fechas.
+    """
+    textos = pd.Series(textos, dtype=object).fillna('').astype(str).str.strip()
+    con_zona = textos.str.contains(PATRON_ZONA, regex=True).to_numpy()
+    resultado = np.full(len(textos), NAT, dtype=np.int64)
+
+    if (~con_zona).any():
+        locales = pd.to_datetime(textos[~con_zona], errors='coerce', format='mixed')
+        locales = locales.dt.tz_localize(settings.TIME_ZONE, ambiguous='NaT', nonexistent='NaT')
+        resultado[~con_zona] = locales.dt.tz_convert('UTC').array.asi8
+    if con_zona.any():
+        # utc=True normaliza offsets distintos en una sola columna
+        resultado[con_zona] = pd.to_datetime(
+            textos[con_zona], errors='coerce', format='mixed', utc=True
+        ).array.asi8
+    return resultado
+
+
+def convertir_columnas(crudo):
+    """Convierte un DataFrame de texto del CSV en arreglos tipados por columna"""
+    columnas = {'date': convertir_fechas(crudo['date'])}
+    for metrica in METRICAS:
+        columnas[metrica] = pd.to_numeric(crudo[metrica], errors='coerce').to_numpy(np.float64)
+    for cultivo in CULTIVOS:
+        columnas[cultivo] = crudo[cultivo].map(VALORES_CULTIVO).fillna(-1).to_numpy(np.int8)
+    return columnas
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_cache():
+    """Retorna la cache columnar del CSV de cultivos para el proceso actual"""
+    global _cache
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                _cache = CacheColumnar()
+    return _cache
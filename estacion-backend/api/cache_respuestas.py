@@ -0,0 +1,139 @@
+"""
+Cache de respuestas GET por versión de datos, con ETag/304
+
+Cada dominio de datos ('lecturas', 'usuarios', 'rangos') tiene un número
+de versión guardado en un archivo compartido por todos los workers; la
+ingesta y los cambios de usuarios lo incrementan. La clave de una
+respuesta combina la ruta, el alcance (usuario o rol) y las versiones de
+los dominios de los que depende, así una versión nueva invalida sola
+las respuestas viejas. El ETag sale de la misma clave: si coincide con
+If-None-Match se responde 304 sin consultar ni serializar nada.
+"""
+import hashlib
+import os
+import time
+from functools import wraps
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+from django.utils.http import parse_etags
+from rest_framework import status
+from rest_framework.response import Response
+
+from .archivos import bloqueo_exclusivo
+from .routers import uso_replica
+
+
+DOMINIOS = ('lecturas', 'usuarios', 'rangos')
+
+
+def _ruta_version(dominio):
+    return os.path.join(settings.CACHE_RESPUESTAS['VERSIONES_DIR'], f'{dominio}.version')
+
+
+def version_datos(dominio):
+    """Versión actual de un dominio de datos (0 si nunca se incrementó)"""
+    try:
+        with open(_ruta_version(dominio), encoding='ascii') as f:
+            return int(f.read() or 0)
+    except (FileNotFoundError, ValueError):
+        return 0
+
+
+def incrementar_version(dominio):
+    """Incrementa la versión de un dominio; se ejecuta al confirmar la transacción"""
+    transaction.on_commit(lambda: _incrementar(dominio))
+
+
+def _incrementar(dominio):
+    directorio = settings.CACHE_RESPUESTAS['VERSIONES_DIR']
+    os.makedirs(directorio, exist_ok=True)
+    with open(os.path.join(directorio, 'versiones.lock'), 'a') as candado:
+        with bloqueo_exclusivo(candado):
+            version = version_datos(dominio) + 1
+            # Reemplazo atómico: los lectores nunca ven el archivo a medio escribir
+            ruta = _ruta_version(dominio)
+            temporal = f'{ruta}.{os.getpid()}.tmp'
+            with open(temporal, 'w', encoding='ascii') as f:
+                f.write(str(version))
+            os.replace(temporal, ruta)
+    return version
+
+
+def _cambio_reciente(dominios):
+    """True si algún dominio cambió dentro del retraso tolerado de la réplica"""
+    limite = time.time() - settings.REPLICA['PEGAJOSIDAD']
+    for dominio in dominios:
+        try:
+            if os.path.getmtime(_ruta_version(dominio)) > limite:
+                return True
+        except OSError:
+            pass
+    return False
+
+
+def _alcance(request, alcance):
+    if alcance == 'usuario':
+        # Por token: me() responde con los claims del token
+        jti = request.auth.get('jti', '') if request.auth is not None else ''
+        return f'u{request.user.pk}:{jti}'
+    if alcance == 'rol':
+        return f'r{request.rol}:{request.user.pk if request.rol == "estudiante" else ""}'
+    return ''
+
+
+def clave_respuesta(request, alcance, dominios):
+    consulta = '&'.join(
+        f'{nombre}={valor}'
+        for nombre, valores in sorted(request.query_params.lists())
+        for valor in valores
+    )
+    versiones = ','.join(f'{dominio}:{version_datos(dominio)}' for dominio in dominios)
+    base = '|'.join([
+        request.path, consulta, _alcance(request, alcance), versiones,
+        getattr(request, 'accepted_media_type', '') or '',
+    ])
+    return hashlib.sha1(base.encode('utf-8')).hexdigest()
+
+
+def cache_respuesta(alcance, dominios):
+    """
+    Cachea las respuestas 200 de una vista GET de DRF.
+
+    alcance: 'usuario' (por usuario y token), 'rol' (compartida entre
+    usuarios del mismo rol; los estudiantes solo ven sus datos) o
+    'publico'. dominios: versiones de datos de las que depende la respuesta.
+    Para métodos de ViewSet usar con method_decorator.
+    """
+    def decorador(vista):
+        @wraps(vista)
+        def envoltura(request, *args, **kwargs):
+            if request.method not in ('GET', 'HEAD'):
+                return vista(request, *args, **kwargs)
+
+            clave = clave_respuesta(request, alcance, dominios)
+            etag = f'"{clave}"'
+            cabeceras = {'ETag': etag, 'Cache-Control': 'private, no-cache'}
+
+            if etag in parse_etags(request.META.get('HTTP_IF_NONE_MATCH', '')):
+                return Response(status=status.HTTP_304_NOT_MODIFIED, headers=cabeceras)
+
+            cache = caches[settings.CACHE_RESPUESTAS['ALIAS']]
+            datos = cache.get(clave)
+            if datos is not None:
+                return Response(datos, headers=cabeceras)
+
+            response = vista(request, *args, **kwargs)
+            # Una réplica atrasada podría responder datos de la versión
+            # anterior: no se guardan bajo la versión nueva
+            if uso_replica() and _cambio_reciente(dominios):
+                return response
+            # Solo respuestas DRF exitosas (no las exportaciones en streaming)
+            if isinstance(response, Response) and response.status_code == status.HTTP_200_OK:
+                cache.set(clave, response.data)
+                for nombre, valor in cabeceras.items():
+                    response[nombre] = valor
+            return response
+        return envoltura
+    return decorador
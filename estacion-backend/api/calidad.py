@@ -0,0 +1,456 @@
+"""
+Control de calidad de las lecturas de los sensores
+
+Dos etapas:
+
+- En la ingesta (escribir_filas y la sincronización con la API externa)
+  cada lectura se revisa contra los rangos físicos de CALIDAD['RANGOS'] y
+  contra la velocidad de cambio respecto de la lectura anterior de la
+  misma fuente (estado en memoria del proceso). También se marcan los
+  valores no numéricos (texto, NaN, infinito).
+- Periódicamente (manage.py revisar_calidad) se buscan en una ventana
+  reciente de la base de datos, con NumPy/pandas vectorizado por fuente:
+  picos (distancia a la mediana móvil mayor a PICO_UMBRAL MADs), sensores
+  planos (el mismo valor durante PLANO_MINUTOS) y huecos entre lecturas.
+
+Un valor marcado se pone en cuarentena: se quita de la lectura (queda
+vacío en el CSV y NULL en la base de datos) y se anota con su valor
+original y el motivo en CALIDAD['CUARENTENA'] (JSON por línea). El campo
+calidad de DatosMeteorologicos guarda las banderas de la lectura. Así los
+valores malos no entran en resúmenes, estadísticas, viabilidad ni
+predicciones. Los huecos solo se marcan: no invalidan ninguna métrica.
+
+La revisión periódica actúa sobre la base de datos y recalcula los
+resúmenes de los periodos afectados. El CSV de cultivos y la historia
+archivada no se reescriben: frame_completo les aplica al leer la
+cuarentena registrada (aplicar_cuarentena, por fecha y métrica) y la
+revisión sube la versión 'lecturas' después de registrarla.
+"""
+import json
+import math
+import os
+import threading
+from datetime import datetime, timedelta
+
+import numpy as np
+import pandas as pd
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from .archivos import abrir_para_agregar
+from .cache_respuestas import incrementar_version
+from .ingesta import METRICAS
+from .models import DatosMeteorologicos, ResumenLecturas, parsear_fecha, parsear_numero
+from .resumenes import acumular, construir_resumenes, inicio_periodo
+
+
+# Banderas (bits del campo DatosMeteorologicos.calidad)
+FUERA_DE_RANGO = 1
+SALTO = 2
+PICO = 4
+PLANO = 8
+HUECO = 16
+NO_NUMERICO = 32
+
+BANDERAS = {
+    FUERA_DE_RANGO: 'fuera_de_rango',
+    SALTO: 'salto',
+    PICO: 'pico',
+    PLANO: 'plano',
+    HUECO: 'hueco',
+    NO_NUMERICO: 'no_numerico',
+}
+
+
+FUENTES = dict(DatosMeteorologicos.FUENTES)
+
+
+def describir(calidad):
+    """Nombres de las banderas de un valor de calidad"""
+    return [nombre for bandera, nombre in BANDERAS.items() if calidad & bandera]
+
+
+# ----------------------------------------------------------------------
+# Revisión en la ingesta
+# ----------------------------------------------------------------------
+
+class EstadoCalidad:
+    """Último valor aceptado de cada (fuente, métrica) en este proceso"""
+
+    def __init__(self):
+        self._ultimos = {}
+        self._lock = threading.Lock()
+
+    def revisar(self, fuente, timestamp, valores):
+        """
+        Revisa los valores crudos {metrica: valor} de una lectura.
+
+        Retorna {metrica: bandera} con las métricas rechazadas.
+        """
+        rangos = settings.CALIDAD['RANGOS']
+        cambios = settings.CALIDAD['CAMBIO_MAXIMO']
+        vigencia = timedelta(minutes=settings.CALIDAD['VENTANA_CAMBIO'])
+        marcadas = {}
+
+        with self._lock:
+            for metrica in METRICAS:
+                crudo = valores.get(metrica)
+                if crudo in (None, ''):
+                    continue
+                valor = parsear_numero(crudo)
+                if valor is None or not math.isfinite(valor):
+                    marcadas[metrica] = NO_NUMERICO
+                    continue
+
+                minimo, maximo = rangos.get(metrica, (None, None))
+                if (minimo is not None and valor < minimo) or (maximo is not None and valor > maximo):
+                    marcadas[metrica] = FUERA_DE_RANGO
+                    continue
+
+                if timestamp is None:
+                    continue
+                anterior = self._ultimos.get((fuente, metrica))
+                if anterior is not None and timestamp < anterior[0]:
+                    # Lectura atrasada (carga de un respaldo): solo rangos
+                    continue
+                limite = cambios.get(metrica)
+                # Con la anterior muy vieja se acepta el nuevo nivel (p. ej.
+                # un sensor reemplazado) en vez de rechazar todo lo que sigue
+                if anterior is not None and limite is not None and timestamp - anterior[0] <= vigencia:
+                    minutos = max((timestamp - anterior[0]).total_seconds() / 60, 1)
+                    if abs(valor - anterior[1]) / minutos > limite:
+                        marcadas[metrica] = SALTO
+                        continue
+                self._ultimos[(fuente, metrica)] = (timestamp, valor)
+        return marcadas
+
+    def reiniciar(self):
+        with self._lock:
+            self._ultimos.clear()
+
+
+def _calidad(marcadas):
+    calidad = 0
+    for bandera in marcadas.values():
+        calidad |= bandera
+    return calidad
+
+
+def revisar_filas(filas, estado=None):
+    """
+    Revisa filas del CSV de cultivos antes de escribirlas (en el lugar):
+    vacía las métricas rechazadas y agrega 'calidad' (no se escribe en el
+    CSV; la usa la persistencia en base de datos).
+
+    Retorna la cantidad de filas con alguna métrica rechazada.
+    """
+    estado = estado or get_estado()
+    fechas = [parsear_fecha(fila.get('date')) for fila in filas]
+    # En orden cronológico, para comparar cada lectura con la anterior
+    orden = sorted(range(len(filas)), key=lambda i: (fechas[i] is None, fechas[i] or 0))
+
+    cuarentena = []
+    marcadas_total = 0
+    for i in orden:
+        fila = filas[i]
+        fuente = fila.get('fuente')
+        if fuente not in FUENTES:
+            fuente = 'sensor'  # igual que DatosMeteorologicos.desde_fila
+        marcadas = estado.revisar(fuente, fechas[i], fila)
+        fila['calidad'] = _calidad(marcadas)
+        if not marcadas:
+            continue
+        marcadas_total += 1
+        for metrica, bandera in marcadas.items():
+            cuarentena.append(_entrada_cuarentena(fechas[i] or fila.get('date'), fuente, metrica, fila[metrica], bandera))
+            fila[metrica] = ''
+
+    registrar_cuarentena(cuarentena)
+    return marcadas_total
+
+
+def revisar_lecturas(lecturas, estado=None):
+    """Igual que revisar_filas para instancias de DatosMeteorologicos sin guardar"""
+    estado = estado or get_estado()
+    cuarentena = []
+    marcadas_total = 0
+    for lectura in sorted(lecturas, key=lambda lectura: lectura.timestamp):
+        valores = {metrica: getattr(lectura, metrica) for metrica in METRICAS}
+        marcadas = estado.revisar(lectura.fuente, lectura.timestamp, valores)
+        lectura.calidad = (lectura.calidad or 0) | _calidad(marcadas)
+        if not marcadas:
+            continue
+        marcadas_total += 1
+        for metrica, bandera in marcadas.items():
+            cuarentena.append(_entrada_cuarentena(lectura.timestamp, lectura.fuente, metrica, valores[metrica], bandera))
+            setattr(lectura, metrica, None)
+
+    registrar_cuarentena(cuarentena)
+    return marcadas_total
+
+
+def _entrada_cuarentena(fecha, fuente, metrica, valor, bandera):
+    if isinstance(fecha, datetime):
+        fecha = timezone.localtime(fecha).isoformat()
+    if isinstance(valor, float) and not math.isfinite(valor):
+        valor = str(valor)
+    return {
+        'fecha': fecha,
+        'fuente': fuente,
+        'metrica': metrica,
+        'valor': valor,
+        'motivo': BANDERAS[bandera],
+        'detectado_en': timezone.now().isoformat(),
+    }
+
+
+def registrar_cuarentena(entradas):
+    """Agrega los valores rechazados al archivo de cuarentena"""
+    if not entradas:
+        return
+    lineas = ''.join(json.dumps(entrada, ensure_ascii=False, default=str) + '\n' for entrada in entradas)
+    try:
+        with abrir_para_agregar(settings.CALIDAD['CUARENTENA'], encoding='utf-8') as f:
+            f.write(lineas)
+    except OSError as e:
+        print(f"Error escribiendo cuarentena de calidad: {str(e)}")
+
+
+def aplicar_cuarentena(frame):
+    """
+    Vacía (NaN) en un frame indexado por fecha los valores anotados en la
+    cuarentena. El CSV no tiene fuente: se compara solo fecha y métrica.
+
+    Retorna el mismo frame si no hay nada que quitar, o una copia.
+    """
+    if frame.empty:
+        return frame
+    fechas = frame.index.asi8
+    copia = None
+    for metrica, rechazadas in _cuarentena_por_metrica().items():
+        if metrica not in frame.columns:
+            continue
+        quitar = np.isin(fechas, rechazadas)
+        if quitar.any():
+            if copia is None:
+                copia = frame.copy()
+            copia.loc[quitar, metrica] = np.nan
+    return frame if copia is None else copia
+
+
+_cuarentena = (None, {})
+_cuarentena_lock = threading.Lock()
+
+
+def _cuarentena_por_metrica():
+    """{metrica: fechas en ns (UTC)} del archivo de cuarentena, releído si cambió"""
+    global _cuarentena
+    ruta = settings.CALIDAD['CUARENTENA']
+    try:
+        estado = os.stat(ruta)
+    except FileNotFoundError:
+        return {}
+    firma = (str(ruta), estado.st_ino, estado.st_size, estado.st_mtime_ns)
+    with _cuarentena_lock:
+        if _cuarentena[0] == firma:
+            return _cuarentena[1]
+
+        fechas = {}
+        with open(ruta, encoding='utf-8') as f:
+            for linea in f:
+                try:
+                    entrada = json.loads(linea)
+                except ValueError:
+                    continue
+                if entrada.get('metrica') in METRICAS and entrada.get('fecha'):
+                    fechas.setdefault(entrada['metrica'], []).append(entrada['fecha'])
+        por_metrica = {
+            metrica: np.unique(pd.to_datetime(valores, utc=True, format='ISO8601', errors='coerce').dropna().asi8)
+            for metrica, valores in fechas.items()
+        }
+        _cuarentena = (firma, por_metrica)
+        return por_metrica
+
+
+_estado = None
+_estado_lock = threading.Lock()
+
+
+def get_estado():
+    """Retorna el estado de calidad del proceso actual"""
+    global _estado
+    if _estado is None:
+        with _estado_lock:
+            if _estado is None:
+                _estado = EstadoCalidad()
+    return _estado
+
+
+# ----------------------------------------------------------------------
+# Detección periódica (vectorizada)
+# ----------------------------------------------------------------------
+
+def detectar_picos(valores, ventana, umbral, minimo):
+    """
+    Picos de una serie: |x - mediana móvil| > umbral * MAD (escalada a
+    desviación estándar) y mayor que el mínimo absoluto de la métrica.
+    """
+    serie = pd.Series(valores)
+    minimos = ventana // 2 + 1
+    mediana = serie.rolling(ventana, center=True, min_periods=minimos).median()
+    desvio = (serie - mediana).abs()
+    mad = desvio.rolling(ventana, center=True, min_periods=minimos).median() * 1.4826
+    picos = (desvio > umbral * mad) & (desvio > minimo)
+    return picos.to_numpy()
+
+
+def detectar_planos(fechas_ns, valores, minutos):
+    """
+    Tramos con el mismo valor durante al menos `minutos` (y 3 lecturas);
+    marca todas las lecturas del tramo salvo la primera.
+    """
+    n = len(valores)
+    if n < 3:
+        return np.zeros(n, dtype=bool)
+    igual = np.r_[False, valores[1:] == valores[:-1]]  # NaN nunca es igual
+    inicios = np.flatnonzero(~igual)
+    tramo = np.cumsum(~igual) - 1
+    largo = np.diff(np.r_[inicios, n])
+    duracion = fechas_ns[np.r_[inicios[1:], n] - 1] - fechas_ns[inicios]
+    plano = (largo >= 3) & (duracion >= minutos * 60 * 10 ** 9)
+    return plano[tramo] & igual
+
+
+def detectar_huecos(fechas_ns, minutos):
+    """Lecturas que llegan más de `minutos` después de la anterior"""
+    return np.r_[False, np.diff(fechas_ns) > minutos * 60 * 10 ** 9]
+
+
+def revisar_ventana(desde, hasta=None, fuente=None):
+    """
+    Busca picos, sensores planos y huecos en las lecturas de [desde, hasta)
+    y pone en cuarentena los valores detectados.
+
+    Retorna {'lecturas': n, 'marcadas': n, 'banderas': {nombre: n}, 'huecos': [...]}
+    """
+    configuracion = settings.CALIDAD
+    filas = list(
+        DatosMeteorologicos.objects
+        .rango(desde=desde, hasta=hasta, fuente=fuente)
+        .order_by('fuente', 'timestamp', 'id')
+        .values_list('id', 'fuente', 'timestamp', 'calidad', *METRICAS)
+    )
+    resultado = {'lecturas': len(filas), 'marcadas': 0, 'banderas': {}, 'huecos': []}
+    if not filas:
+        return resultado
+
+    ids = np.array([fila[0] for fila in filas], dtype=np.int64)
+    fuentes = np.array([fila[1] for fila in filas], dtype=object)
+    fechas_ns = pd.to_datetime([fila[2] for fila in filas], utc=True).asi8
+    calidad = np.array([fila[3] for fila in filas], dtype=np.int64)
+    valores = np.array(
+        [[np.nan if valor is None else valor for valor in fila[4:]] for fila in filas],
+        dtype=np.float64,
+    )
+
+    nuevas = np.zeros(len(filas), dtype=np.int64)
+    rechazadas = np.zeros(valores.shape, dtype=np.int64)  # bandera por valor rechazado
+
+    # Filas contiguas por fuente (vienen ordenadas por fuente y fecha)
+    cortes = np.flatnonzero(np.r_[True, fuentes[1:] != fuentes[:-1], True])
+    for inicio, fin in zip(cortes[:-1], cortes[1:]):
+        tramo = slice(inicio, fin)
+        huecos = detectar_huecos(fechas_ns[tramo], configuracion['HUECO_MINUTOS'])
+        nuevas[tramo][huecos] |= HUECO
+        for posicion in np.flatnonzero(huecos):
+            resultado['huecos'].append({
+                'fuente': fuentes[inicio],
+                'desde': filas[inicio + posicion - 1][2].isoformat(),
+                'hasta': filas[inicio + posicion][2].isoformat(),
+            })
+
+        for j, metrica in enumerate(METRICAS):
+            serie = valores[tramo, j]
+            if metrica in configuracion['PICO_MINIMO']:
+                picos = detectar_picos(
+                    serie, configuracion['PICO_VENTANA'], configuracion['PICO_UMBRAL'],
+                    configuracion['PICO_MINIMO'][metrica],
+                )
+                rechazadas[tramo, j][picos] = PICO
+            if metrica in configuracion['PLANO_METRICAS']:
+                planos = detectar_planos(fechas_ns[tramo], serie, configuracion['PLANO_MINUTOS'])
+                rechazadas[tramo, j][planos & (rechazadas[tramo, j] == 0)] = PLANO
+
+    nuevas |= np.bitwise_or.reduce(rechazadas, axis=1)
+    # Los valores rechazados nunca son NULL: cada uno es un cambio. Del
+    # resto solo importan las banderas que la lectura todavía no tenía.
+    con_rechazos = rechazadas.any(axis=1)
+    cambios = np.flatnonzero(con_rechazos | ((nuevas & ~calidad) != 0))
+    if len(cambios) == 0:
+        return resultado
+
+    lecturas = []
+    cuarentena = []
+    for i in cambios.tolist():
+        lectura = DatosMeteorologicos(
+            id=int(ids[i]), fuente=fuentes[i], timestamp=filas[i][2],
+            calidad=int(calidad[i] | nuevas[i]),
+        )
+        for j, metrica in enumerate(METRICAS):
+            if rechazadas[i, j]:
+                cuarentena.append(_entrada_cuarentena(
+                    filas[i][2], fuentes[i], metrica, filas[i][4 + j], int(rechazadas[i, j])
+                ))
+                setattr(lectura, metrica, None)
+            else:
+                setattr(lectura, metrica, filas[i][4 + j])
+        lecturas.append(lectura)
+        for nombre in describir(int(nuevas[i] & ~calidad[i])):
+            resultado['banderas'][nombre] = resultado['banderas'].get(nombre, 0) + 1
+
+    with transaction.atomic():
+        DatosMeteorologicos.objects.bulk_update(
+            lecturas, ['calidad', *METRICAS], batch_size=settings.INGESTA['TAMANO_LOTE_BD']
+        )
+        afectadas = [lectura for lectura, i in zip(lecturas, cambios.tolist()) if con_rechazos[i]]
+        if afectadas:
+            recalcular_resumenes(afectadas)
+
+    # Después de anotar la cuarentena: las respuestas cacheadas con la
+    # versión nueva ya leen el CSV con la máscara
+    registrar_cuarentena(cuarentena)
+    incrementar_version('lecturas')
+    resultado['marcadas'] = len(lecturas)
+    return resultado
+
+
+def recalcular_resumenes(lecturas):
+    """
+    Reconstruye los resúmenes de los días (y sus horas) de las lecturas
+    modificadas, sumando solo las lecturas de esos días. Debe llamarse
+    dentro de transaction.atomic().
+    """
+    dias = {}
+    for lectura in lecturas:
+        dias.setdefault(lectura.fuente, set()).add(inicio_periodo(lectura.timestamp, 'dia'))
+
+    resumenes = []
+    for fuente, inicios in dias.items():
+        for dia in sorted(inicios):
+            siguiente = inicio_periodo(dia + timedelta(hours=36), 'dia')
+            periodos = ResumenLecturas.objects.filter(
+                fuente=fuente, periodo__gte=dia, periodo__lt=siguiente
+            )
+            # Bloquea los periodos: una ingesta concurrente espera y suma
+            # sus lecturas sobre las filas reconstruidas
+            list(periodos.select_for_update().values_list('id', flat=True))
+            periodos.delete()
+            del_dia = (
+                DatosMeteorologicos.objects
+                .rango(desde=dia, hasta=siguiente, fuente=fuente)
+                .order_by()
+                .only('timestamp', 'fuente', *METRICAS)
+            )
+            resumenes.extend(construir_resumenes(acumular(del_dia)))
+    ResumenLecturas.objects.bulk_create(resumenes, batch_size=settings.INGESTA['TAMANO_LOTE_BD'])
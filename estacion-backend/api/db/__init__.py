@@ -0,0 +1,6 @@
+"""
+Backends de base de datos con un pool de conexiones por proceso
+
+ENGINE 'api.db.mysql' (producción) o 'api.db.sqlite3' (desarrollo y
+benchmarks). Ver api/db/pool.py.
+"""
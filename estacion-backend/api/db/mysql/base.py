@@ -0,0 +1,14 @@
+from django.db.backends.mysql import base
+
+from ..pool import ConexionEnPoolMixin
+
+
+class DatabaseWrapper(ConexionEnPoolMixin, base.DatabaseWrapper):
+    """Backend MySQL (pymysql) con pool de conexiones por proceso"""
+
+    def conexion_viva(self, conexion):
+        try:
+            conexion.ping(reconnect=False)
+        except base.Database.Error:
+            return False
+        return True
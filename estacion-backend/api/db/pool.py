@@ -0,0 +1,160 @@
+"""
+Pool de conexiones a la base de datos por proceso
+
+Django 4.2 no trae pool: con CONN_MAX_AGE=0 cada request abre y cierra
+una conexión (TCP + autenticación en MySQL), y con CONN_MAX_AGE>0 cada
+hilo del worker se queda con la suya aunque esté inactivo. Con este pool,
+al cerrar la conexión del request (request_finished) la conexión cruda
+vuelve a una cola compartida por los hilos del proceso y el siguiente
+request la toma en vez de abrir una nueva.
+
+- Se usa con CONN_MAX_AGE=0, también en ASGI.
+- Las conexiones inactivas más de DB_POOL['PING_INACTIVA'] segundos se
+  verifican con un ping antes de entregarlas; las que superan
+  DB_POOL['EDAD_MAXIMA'] se cierran (antes del wait_timeout de MySQL).
+- No se devuelven al pool conexiones con errores, en medio de una
+  transacción o con autocommit modificado.
+- El pool es por proceso y por base de datos (clave por pid, servidor y
+  nombre): después de un fork los workers no comparten sockets, y la base
+  de pruebas no recibe conexiones de la real.
+"""
+import os
+import threading
+import time
+from collections import deque
+
+from django.conf import settings
+
+
+class PoolConexiones:
+    """Conexiones crudas (del driver) inactivas, thread-safe"""
+
+    def __init__(self, tamano, edad_maxima, ping_inactiva):
+        self.tamano = tamano
+        self.edad_maxima = edad_maxima
+        self.ping_inactiva = ping_inactiva
+        self._inactivas = deque()
+        self._lock = threading.Lock()
+        # Momento de creación de cada conexión entregada (por id)
+        self._creadas_en = {}
+        self._stats = {'creadas': 0, 'reutilizadas': 0, 'descartadas': 0}
+
+    def registrar(self, conexion):
+        with self._lock:
+            self._creadas_en[id(conexion)] = time.monotonic()
+            self._stats['creadas'] += 1
+
+    def tomar(self, conexion_viva):
+        """Retorna una conexión inactiva utilizable, o None para abrir una nueva"""
+        while True:
+            with self._lock:
+                if not self._inactivas:
+                    return None
+                conexion, creada_en, devuelta_en = self._inactivas.pop()
+
+            ahora = time.monotonic()
+            if ahora - creada_en > self.edad_maxima or (
+                ahora - devuelta_en > self.ping_inactiva and not conexion_viva(conexion)
+            ):
+                self._descartar(conexion)
+                continue
+
+            with self._lock:
+                self._creadas_en[id(conexion)] = creada_en
+                self._stats['reutilizadas'] += 1
+            return conexion
+
+    def devolver(self, conexion, reutilizable=True):
+        with self._lock:
+            creada_en = self._creadas_en.pop(id(conexion), None)
+            if (
+                reutilizable
+                and creada_en is not None
+                and len(self._inactivas) < self.tamano
+                and time.monotonic() - creada_en <= self.edad_maxima
+            ):
+                # LIFO: la más reciente es la que menos probablemente expiró
+                self._inactivas.append((conexion, creada_en, time.monotonic()))
+                return True
+        self._descartar(conexion)
+        return False
+
+    def _descartar(self, conexion):
+        with self._lock:
+            self._stats['descartadas'] += 1
+        try:
+            conexion.close()
+        except Exception:
+            pass
+
+    def vaciar(self):
+        with self._lock:
+            inactivas = list(self._inactivas)
+            self._inactivas.clear()
+        for conexion, _, _ in inactivas:
+            self._descartar(conexion)
+
+    def estadisticas(self):
+        with self._lock:
+            return {**self._stats, 'inactivas': len(self._inactivas), 'en_uso': len(self._creadas_en)}
+
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+def get_pool(settings_dict):
+    """Pool de la base de datos (motor, servidor, nombre) para el proceso actual"""
+    clave = (os.getpid(),) + tuple(
+        str(settings_dict.get(campo)) for campo in ('ENGINE', 'HOST', 'PORT', 'NAME', 'USER')
+    )
+    pool = _pools.get(clave)
+    if pool is None:
+        with _pools_lock:
+            pool = _pools.get(clave)
+            if pool is None:
+                configuracion = settings.DB_POOL
+                pool = _pools[clave] = PoolConexiones(
+                    configuracion['TAMANO'], configuracion['EDAD_MAXIMA'], configuracion['PING_INACTIVA']
+                )
+    return pool
+
+
+class ConexionEnPoolMixin:
+    """
+    Mixin para un DatabaseWrapper de Django: toma las conexiones del pool
+    en get_new_connection y las devuelve en _close.
+    """
+
+    def usar_pool(self):
+        return settings.DB_POOL['TAMANO'] > 0
+
+    def conexion_viva(self, conexion):
+        try:
+            conexion.cursor().execute('SELECT 1')
+        except Exception:
+            return False
+        return True
+
+    def get_new_connection(self, conn_params):
+        if not self.usar_pool():
+            return super().get_new_connection(conn_params)
+        pool = get_pool(self.settings_dict)
+        conexion = pool.tomar(self.conexion_viva)
+        if conexion is None:
+            conexion = super().get_new_connection(conn_params)
+            pool.registrar(conexion)
+        return conexion
+
+    def _close(self):
+        if self.connection is None or not self.usar_pool():
+            return super()._close()
+        reutilizable = (
+            not self.in_atomic_block
+            and not self.errors_occurred
+            and self.autocommit == self.settings_dict['AUTOCOMMIT']
+        )
+        with self.wrap_database_errors:
+            if reutilizable and not self.autocommit:
+                self.connection.rollback()
+            get_pool(self.settings_dict).devolver(self.connection, reutilizable)
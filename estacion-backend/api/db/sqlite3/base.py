@@ -0,0 +1,11 @@
+from django.db.backends.sqlite3 import base
+
+from ..pool import ConexionEnPoolMixin
+
+
+class DatabaseWrapper(ConexionEnPoolMixin, base.DatabaseWrapper):
+    """Backend SQLite con pool de conexiones (sustituto local de MySQL)"""
+
+    def usar_pool(self):
+        # Una base en memoria vive y muere con su conexión
+        return not self.is_in_memory_db() and super().usar_pool()
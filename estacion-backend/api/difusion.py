@@ -0,0 +1,139 @@
+"""
+Difusión en el proceso de las lecturas recién ingeridas (SSE / long-poll)
+
+Cada lote escrito por la ingesta se publica una vez en el difusor del
+proceso, que lo reparte a las colas asyncio de los clientes suscritos.
+Las últimas DIFUSION['CAPACIDAD'] lecturas quedan en un buffer circular:
+un cliente que se reconecta con Last-Event-ID recibe desde ahí lo que se
+perdió, sin consultar la base de datos.
+
+Los ids de evento parten del tiempo en milisegundos al iniciar el proceso,
+así siguen creciendo después de un reinicio. El difusor es por proceso:
+los clientes del feed deben conectarse al mismo proceso ASGI que recibe
+la ingesta.
+"""
+import asyncio
+import threading
+import time
+from collections import deque
+
+from django.conf import settings
+from django.utils import timezone
+
+from .ingesta import CULTIVOS, METRICAS
+from .models import parsear_fecha, parsear_numero
+
+
+class Suscripcion:
+    """Cola de eventos de un cliente conectado"""
+
+    def __init__(self, loop, maximo):
+        self.loop = loop
+        self.cola = asyncio.Queue(maxsize=maximo)
+        # El cliente no consume al ritmo de la ingesta: se cierra su conexión
+        # y al reconectarse retoma desde el buffer
+        self.desbordada = False
+
+    def entregar(self, eventos):
+        for evento in eventos:
+            try:
+                self.cola.put_nowait(evento)
+            except asyncio.QueueFull:
+                self.desbordada = True
+                return
+
+
+class Difusor:
+    """Buffer circular de eventos + suscriptores del proceso actual"""
+
+    def __init__(self, capacidad=None):
+        self._buffer = deque(maxlen=capacidad or settings.DIFUSION['CAPACIDAD'])
+        self._ultimo_id = int(time.time() * 1000)
+        self._lock = threading.Lock()
+        self._suscripciones = set()
+
+    @property
+    def ultimo_id(self):
+        return self._ultimo_id
+
+    def publicar(self, datos):
+        """Agrega eventos al buffer y los entrega a los suscriptores (thread-safe)"""
+        if not datos:
+            return []
+        with self._lock:
+            eventos = []
+            for dato in datos:
+                self._ultimo_id += 1
+                eventos.append((self._ultimo_id, dato))
+            self._buffer.extend(eventos)
+            suscripciones = list(self._suscripciones)
+
+        for suscripcion in suscripciones:
+            try:
+                suscripcion.loop.call_soon_threadsafe(suscripcion.entregar, eventos)
+            except RuntimeError:
+                # El event loop del cliente ya terminó
+                self.desuscribir(suscripcion)
+        return eventos
+
+    def desde(self, ultimo_id):
+        """
+        Eventos con id > ultimo_id que siguen en el buffer.
+
+        Retorna (eventos, completo); completo es False si el cliente se
+        perdió eventos que ya salieron del buffer, o si el id no es de este
+        proceso: anterior a su inicio (buffer vacío tras un reinicio) o
+        mayor que el último publicado (otro proceso).
+        """
+        with self._lock:
+            eventos = [evento for evento in self._buffer if evento[0] > ultimo_id]
+            primero = self._buffer[0][0] if self._buffer else self._ultimo_id + 1
+            completo = primero - 1 <= ultimo_id <= self._ultimo_id
+        return eventos, completo
+
+    def suscribir(self):
+        """Suscribe el event loop actual; llamar desde una corrutina"""
+        suscripcion = Suscripcion(asyncio.get_running_loop(), settings.DIFUSION['COLA_MAXIMA'])
+        with self._lock:
+            self._suscripciones.add(suscripcion)
+        return suscripcion
+
+    def desuscribir(self, suscripcion):
+        with self._lock:
+            self._suscripciones.discard(suscripcion)
+
+    def estadisticas(self):
+        with self._lock:
+            return {
+                'suscriptores': len(self._suscripciones),
+                'en_buffer': len(self._buffer),
+                'ultimo_id': self._ultimo_id,
+            }
+
+
+def evento_desde_fila(fila):
+    """Lectura del CSV de cultivos como dict serializable a JSON"""
+    fecha = parsear_fecha(fila.get('date'))
+    evento = {
+        'fecha': timezone.localtime(fecha).isoformat() if fecha else None,
+        'fuente': fila.get('fuente') or 'sensor',
+    }
+    for metrica in METRICAS:
+        evento[metrica] = parsear_numero(fila.get(metrica))
+    for cultivo in CULTIVOS:
+        evento[cultivo] = fila.get(cultivo)
+    return evento
+
+
+_difusor = None
+_difusor_lock = threading.Lock()
+
+
+def get_difusor():
+    """Retorna el difusor de lecturas del proceso actual"""
+    global _difusor
+    if _difusor is None:
+        with _difusor_lock:
+            if _difusor is None:
+                _difusor = Difusor()
+    return _difusor
@@ -0,0 +1,183 @@
+"""
+Estadísticas por intervalos de tiempo sobre las lecturas del CSV de cultivos
+
+Todo se calcula con operaciones vectorizadas de NumPy (ufunc.reduceat por
+cubeta, cumsum para el promedio móvil) sobre el frame de frame_completo
+(archivo histórico + cache columnar), sin recorrer las lecturas en Python:
+
+- promedio, mínimo y máximo por intervalo de cada métrica
+- promedio móvil de los promedios sobre las últimas `ventana` cubetas
+- lluvia por intervalo y acumulada en la ventana consultada
+- grados-día por cultivo: max(0, (Tmax + Tmin) / 2 - base) por día local
+"""
+import numpy as np
+import pandas as pd
+from django.conf import settings
+from pandas.tseries.frequencies import to_offset
+
+from .historico import frame_completo
+from .ingesta import CULTIVOS, METRICAS
+
+
+DIA_NS = 24 * 3600 * 10 ** 9
+
+
+def parsear_intervalo(valor):
+    """
+    Intervalo de resample ('15min', '1h', '1D'...). Debe ser fijo (no
+    meses) y de al menos ESTADISTICAS['INTERVALO_MINIMO'].
+    """
+    try:
+        intervalo = to_offset(valor)
+        nanos = intervalo.nanos
+    except (ValueError, TypeError):
+        raise ValueError(f'intervalo inválido: {valor} (usar p. ej. 15min, 1h, 1D)')
+    if nanos < pd.Timedelta(settings.ESTADISTICAS['INTERVALO_MINIMO']).value:
+        raise ValueError(f"intervalo mínimo: {settings.ESTADISTICAS['INTERVALO_MINIMO']}")
+    return intervalo
+
+
+def agrupar(fechas_ns, valores, paso_ns):
+    """
+    Reduce filas ordenadas a cubetas fijas de paso_ns con ufunc.reduceat
+    (una pasada por estadística sobre todas las columnas a la vez).
+
+    fechas_ns: int64 de hora local (wall clock); valores: (n, columnas).
+    Las cubetas empiezan a la medianoche local del primer día; las cubetas
+    sin lecturas quedan en NaN. Retorna (inicio_ns, estadisticas) con
+    arreglos (cubetas, columnas) para 'promedio', 'minimo', 'maximo',
+    'suma' y 'cantidad'.
+    """
+    columnas = valores.shape[1]
+    if len(fechas_ns) == 0:
+        vacio = np.empty((0, columnas))
+        return None, {nombre: vacio for nombre in ('promedio', 'minimo', 'maximo', 'suma', 'cantidad')}
+
+    inicio = fechas_ns[0] - fechas_ns[0] % DIA_NS
+    codigos = (fechas_ns - inicio) // paso_ns
+    cubetas = int(codigos[-1]) + 1
+    if cubetas > settings.ESTADISTICAS['MAXIMO_INTERVALOS']:
+        raise ValueError(f"demasiados intervalos ({cubetas}); máximo {settings.ESTADISTICAS['MAXIMO_INTERVALOS']}")
+
+    # Primera fila de cada cubeta con lecturas
+    cortes = np.flatnonzero(np.r_[True, codigos[1:] != codigos[:-1]])
+    ocupadas = codigos[cortes]
+
+    nulos = np.isnan(valores)
+    cantidad = np.add.reduceat(~nulos, cortes, axis=0)
+    suma = np.add.reduceat(np.where(nulos, 0.0, valores), cortes, axis=0)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        promedio = suma / cantidad
+    # fmin/fmax ignoran NaN salvo que toda la cubeta sea NaN
+    minimo = np.fmin.reduceat(valores, cortes, axis=0)
+    maximo = np.fmax.reduceat(valores, cortes, axis=0)
+    suma[cantidad == 0] = np.nan
+
+    resultado = {}
+    for nombre, parcial in (('promedio', promedio), ('minimo', minimo), ('maximo', maximo),
+                            ('suma', suma), ('cantidad', cantidad)):
+        completo = np.full((cubetas, columnas), 0 if nombre == 'cantidad' else np.nan)
+        completo[ocupadas] = parcial
+        resultado[nombre] = completo
+    return inicio, resultado
+
+
+def promedio_movil(valores, ventana):
+    """Promedio de las últimas `ventana` cubetas con datos (cumsum, sin bucles)"""
+    nulos = np.isnan(valores)
+    suma = np.cumsum(np.where(nulos, 0.0, valores), axis=0)
+    cantidad = np.cumsum(~nulos, axis=0)
+    suma[ventana:] = suma[ventana:] - suma[:-ventana].copy()
+    cantidad[ventana:] = cantidad[ventana:] - cantidad[:-ventana].copy()
+    with np.errstate(invalid='ignore', divide='ignore'):
+        return np.where(cantidad > 0, suma / np.maximum(cantidad, 1), np.nan)
+
+
+def calcular_estadisticas(frame, intervalo, ventana, bases=None):
+    """
+    frame: DataFrame con índice de fecha local y columnas METRICAS.
+
+    Retorna un dict columnar: cada serie es una lista con una posición por
+    intervalo; el intervalo i empieza en `inicio` + i * `intervalo_segundos`.
+    """
+    if bases is None:
+        bases = settings.ESTADISTICAS['TEMPERATURA_BASE']
+    if not frame.index.is_monotonic_increasing:
+        frame = frame.sort_index()
+    indice = frame.index.tz_localize(None) if frame.index.tz is not None else frame.index
+    fechas_ns = indice.asi8
+    valores = frame[METRICAS].to_numpy(np.float64)
+
+    inicio, agregados = agrupar(fechas_ns, valores, intervalo.nanos)
+    movil = promedio_movil(agregados['promedio'], ventana)
+
+    lluvia = agregados['suma'][:, METRICAS.index('precipitacion')]
+    lluvia_acumulada = np.cumsum(np.nan_to_num(lluvia))
+
+    metricas = {}
+    for j, metrica in enumerate(METRICAS):
+        metricas[metrica] = {
+            'promedio': _lista(agregados['promedio'][:, j]),
+            'minimo': _lista(agregados['minimo'][:, j]),
+            'maximo': _lista(agregados['maximo'][:, j]),
+            'movil': _lista(movil[:, j]),
+        }
+    metricas['precipitacion']['suma'] = _lista(lluvia)
+    metricas['precipitacion']['acumulada'] = _lista(lluvia_acumulada)
+
+    temperatura = valores[:, [METRICAS.index('temperatura')]]
+    return {
+        'inicio': _fecha_iso(inicio),
+        'intervalo_segundos': intervalo.nanos // 10 ** 9,
+        'lecturas': agregados['cantidad'][:, METRICAS.index('temperatura')].astype(np.int64).tolist(),
+        'metricas': metricas,
+        'grados_dia': _grados_dia(fechas_ns, temperatura, bases),
+    }
+
+
+def _grados_dia(fechas_ns, temperatura, bases):
+    inicio, diario = agrupar(fechas_ns, temperatura, DIA_NS)
+    media = (diario['minimo'][:, 0] + diario['maximo'][:, 0]) / 2
+    sin_datos = np.isnan(media)
+    resultado = {'inicio': _fecha_iso(inicio, 'D')}
+    for cultivo in CULTIVOS:
+        base = bases[cultivo] if isinstance(bases, dict) else bases
+        grados = np.maximum(np.nan_to_num(media - base), 0)
+        acumulados = np.cumsum(grados)
+        grados[sin_datos] = np.nan
+        resultado[cultivo] = {
+            'base': base,
+            'diarios': _lista(grados),
+            'acumulados': _lista(acumulados),
+            'total': round(float(acumulados[-1]), 2) if len(acumulados) else 0.0,
+        }
+    return resultado
+
+
+def _lista(arreglo, decimales=3):
+    """Arreglo float a lista JSON (NaN -> None)"""
+    arreglo = np.round(np.asarray(arreglo, dtype=np.float64), decimales)
+    lista = arreglo.tolist()
+    for i in np.flatnonzero(np.isnan(arreglo)).tolist():
+        lista[i] = None
+    return lista
+
+
+def _fecha_iso(fecha_ns, unidad='s'):
+    if fecha_ns is None:
+        return None
+    return str(np.datetime_as_string(np.datetime64(int(fecha_ns), 'ns'), unit=unidad))
+
+
+def estadisticas_ventana(desde, hasta, intervalo, ventana, bases=None):
+    frame = frame_completo(desde=desde, hasta=hasta, columnas=METRICAS)
+    resultado = calcular_estadisticas(frame, intervalo, ventana, bases)
+    resultado.update({
+        'desde': frame.index.min().isoformat() if len(frame) else None,
+        'hasta': frame.index.max().isoformat() if len(frame) else None,
+        'zona_horaria': settings.TIME_ZONE,
+        'intervalo': intervalo.freqstr,
+        'ventana': ventana,
+        'total_lecturas': int(len(frame)),
+    })
+    return resultado
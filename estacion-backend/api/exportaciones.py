@@ -0,0 +1,252 @@
+"""
+Exportaciones de lecturas a CSV en segundo plano
+
+Cada exportación se escribe por bloques de EXPORTACION['TAMANO_BLOQUE']
+lecturas en un archivo .part. Después de cada bloque se guardan en la
+tabla exportaciones_csv el progreso, el cursor (timestamp, id) y los bytes
+escritos, así una exportación interrumpida (reinicio del worker) se
+reanuda desde el último bloque con `manage.py reanudar_exportaciones`.
+
+Una exportación con los mismos filtros se reutiliza mientras el rango no
+haya recibido lecturas nuevas (misma cantidad y mismo id máximo) ni
+cambios en el lugar (versión de datos 'lecturas', que también incrementa
+la cuarentena de calidad). Solo se reutilizan exportaciones del mismo
+usuario; un administrativo puede reutilizar cualquiera.
+"""
+import hashlib
+import json
+import os
+import re
+import threading
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import connections
+from django.db.models import Count, F, Max, Q
+from django.http import FileResponse, HttpResponse, StreamingHttpResponse
+from django.utils import timezone
+
+from .cache_respuestas import version_datos
+from .ingesta import METRICAS
+from .lecturas import CAMPOS_EXPORTACION, escritor_csv, filtrar_lecturas, linea_csv, siguiente_bloque
+from .models import DatosMeteorologicos, ExportacionCSV, parsear_fecha
+
+
+PARAMETROS_FILTRO = ['desde', 'hasta', 'fuente'] + [
+    f'{metrica}_{sufijo}' for metrica in METRICAS for sufijo in ('min', 'max')
+]
+
+
+def normalizar_filtros(params):
+    """Solo los filtros que cambian el contenido, sin vacíos"""
+    return {
+        parametro: str(params.get(parametro)).strip()
+        for parametro in PARAMETROS_FILTRO
+        if params.get(parametro) not in (None, '')
+    }
+
+
+def clave_filtros(filtros):
+    return hashlib.sha1(json.dumps(filtros, sort_keys=True).encode('utf-8')).hexdigest()
+
+
+def _queryset(filtros):
+    return filtrar_lecturas(DatosMeteorologicos.objects.all(), filtros)
+
+
+def solicitar_exportacion(filtros, user_id=None, reutilizar_ajenas=False):
+    """
+    Retorna (exportacion, reutilizada). Valida los filtros (ValidationError
+    de DRF) y reutiliza una exportación con los mismos filtros si los datos
+    del rango no cambiaron; si no, crea una nueva y la inicia en segundo plano.
+
+    reutilizar_ajenas: permite reutilizar exportaciones de otros usuarios
+    (solo para quien puede verlas, los administrativos).
+    """
+    # Antes de la firma: un cambio concurrente deja una versión vieja, no una nueva
+    version = version_datos('lecturas')
+    queryset = _queryset(filtros)
+    firma = queryset.aggregate(total=Count('id'), id_maximo=Max('id'))
+    firma['id_maximo'] = firma['id_maximo'] or 0
+    clave = clave_filtros(filtros)
+
+    existentes = ExportacionCSV.objects.filter(
+        clave=clave, total_registros=firma['total'], id_maximo=firma['id_maximo'],
+        version_lecturas=version,
+    )
+    if not reutilizar_ajenas:
+        existentes = existentes.filter(creado_por_id=user_id)
+    existente = existentes.exclude(estado='error').order_by('-creado_en').first()
+    if existente is not None and (existente.estado != 'completado' or os.path.exists(existente.ruta)):
+        return existente, True
+
+    exportacion = ExportacionCSV(
+        filtros=filtros,
+        clave=clave,
+        fecha_inicio=parsear_fecha(filtros.get('desde')),
+        fecha_fin=parsear_fecha(filtros.get('hasta')),
+        total_registros=firma['total'],
+        id_maximo=firma['id_maximo'],
+        version_lecturas=version,
+        creado_por_id=user_id,
+    )
+    exportacion.nombre_archivo = f"lecturas_{timezone.localtime():%Y%m%d_%H%M%S}_{str(exportacion.id)[:8]}.csv"
+    exportacion.ruta = os.path.join(settings.EXPORTACION['DIR'], exportacion.nombre_archivo)
+    exportacion.save()
+
+    iniciar_en_segundo_plano(exportacion.pk)
+    return exportacion, False
+
+
+def iniciar_en_segundo_plano(exportacion_id):
+    hilo = threading.Thread(
+        target=_generar_en_hilo, args=(exportacion_id,),
+        name=f'exportacion-{exportacion_id}', daemon=True,
+    )
+    hilo.start()
+    return hilo
+
+
+def _generar_en_hilo(exportacion_id):
+    try:
+        generar(exportacion_id)
+    finally:
+        # El hilo no es un request: cerrar su conexión a la BD
+        connections.close_all()
+
+
+def tomar(exportacion_id):
+    """
+    Marca la exportación como en proceso si está pendiente o si quien la
+    procesaba dejó de avanzar. Retorna False si otro proceso la tiene.
+    """
+    inactiva = timezone.now() - timedelta(seconds=settings.EXPORTACION['INACTIVIDAD'])
+    return bool(
+        ExportacionCSV.objects
+        .filter(pk=exportacion_id)
+        .filter(Q(estado='pendiente') | Q(estado='en_proceso', actualizado_en__lt=inactiva))
+        .update(estado='en_proceso', actualizado_en=timezone.now())
+    )
+
+
+def generar(exportacion_id):
+    """Escribe (o reanuda) una exportación bloque por bloque"""
+    if not tomar(exportacion_id):
+        return None
+    exportacion = ExportacionCSV.objects.get(pk=exportacion_id)
+    parcial = f'{exportacion.ruta}.part'
+    tamano = settings.EXPORTACION['TAMANO_BLOQUE']
+
+    try:
+        os.makedirs(os.path.dirname(exportacion.ruta), exist_ok=True)
+        queryset = (
+            _queryset(exportacion.filtros)
+            .filter(id__lte=exportacion.id_maximo)
+            .order_by('timestamp', 'id')
+            .values_list(*CAMPOS_EXPORTACION)
+        )
+        ultimo = None
+        if exportacion.ultimo_id is not None:
+            ultimo = (exportacion.ultimo_timestamp, exportacion.ultimo_id)
+
+        writer = escritor_csv()
+        with open(parcial, 'ab') as f:
+            # Descarta un bloque escrito a medias antes de la interrupción
+            f.truncate(exportacion.bytes_escritos)
+            f.seek(exportacion.bytes_escritos)
+            if exportacion.bytes_escritos == 0:
+                f.write(writer.writerow(CAMPOS_EXPORTACION).encode('utf-8'))
+
+            while True:
+                bloque = list(siguiente_bloque(queryset, ultimo, tamano))
+                if bloque:
+                    f.write(''.join(linea_csv(writer, fila) for fila in bloque).encode('utf-8'))
+                    f.flush()
+                    os.fsync(f.fileno())
+                    ultimo = (bloque[-1][1], bloque[-1][0])
+                    ExportacionCSV.objects.filter(pk=exportacion.pk).update(
+                        cantidad_registros=F('cantidad_registros') + len(bloque),
+                        bytes_escritos=f.tell(),
+                        ultimo_timestamp=ultimo[0],
+                        ultimo_id=ultimo[1],
+                        actualizado_en=timezone.now(),
+                    )
+                if len(bloque) < tamano:
+                    break
+
+        os.replace(parcial, exportacion.ruta)
+        ExportacionCSV.objects.filter(pk=exportacion.pk).update(
+            estado='completado', completado_en=timezone.now(), actualizado_en=timezone.now()
+        )
+        print(f'✅ Exportación {exportacion.nombre_archivo} completada')
+    except Exception as e:
+        print(f"Error generando exportación {exportacion.pk}: {str(e)}")
+        ExportacionCSV.objects.filter(pk=exportacion.pk).update(
+            estado='error', error=str(e), actualizado_en=timezone.now()
+        )
+    return ExportacionCSV.objects.get(pk=exportacion.pk)
+
+
+# ----------------------------------------------------------------------
+# Descarga con soporte de Range
+# ----------------------------------------------------------------------
+
+RANGO = re.compile(r'^bytes=(\d*)-(\d*)$')
+
+
+def respuesta_archivo(request, ruta, nombre, content_type='text/csv'):
+    """
+    Sirve un archivo con Accept-Ranges; un header Range de un solo rango
+    responde 206 con esa porción (reanudar descargas grandes).
+    """
+    tamano = os.path.getsize(ruta)
+    etag = f'"{int(os.path.getmtime(ruta))}-{tamano}"'
+    rango = request.META.get('HTTP_RANGE', '').strip()
+
+    # If-Range: si el archivo cambió se envía completo
+    if_range = request.META.get('HTTP_IF_RANGE')
+    if if_range and if_range != etag:
+        rango = ''
+
+    coincidencia = RANGO.match(rango) if rango else None
+    if rango and coincidencia is None:
+        # Múltiples rangos u otras unidades: se envía el archivo completo
+        rango = ''
+
+    if coincidencia:
+        inicio, fin = coincidencia.groups()
+        if inicio == '':
+            # bytes=-N: los últimos N bytes
+            inicio = max(tamano - int(fin or 0), 0)
+            fin = tamano - 1
+        else:
+            inicio = int(inicio)
+            fin = min(int(fin), tamano - 1) if fin else tamano - 1
+        if inicio >= tamano or inicio > fin:
+            response = HttpResponse(status=416)
+            response['Content-Range'] = f'bytes */{tamano}'
+            return response
+
+        response = StreamingHttpResponse(
+            _leer_porcion(ruta, inicio, fin - inicio + 1), status=206, content_type=content_type
+        )
+        response['Content-Range'] = f'bytes {inicio}-{fin}/{tamano}'
+        response['Content-Length'] = str(fin - inicio + 1)
+    else:
+        response = FileResponse(open(ruta, 'rb'), content_type=content_type)
+
+    response['Accept-Ranges'] = 'bytes'
+    response['ETag'] = etag
+    response['Content-Disposition'] = f'attachment; filename="{nombre}"'
+    return response
+
+
+def _leer_porcion(ruta, inicio, longitud, tamano_bloque=64 * 1024):
+    with open(ruta, 'rb') as f:
+        f.seek(inicio)
+        while longitud > 0:
+            datos = f.read(min(tamano_bloque, longitud))
+            if not datos:
+                return
+            longitud -= len(datos)
+            yield datos
@@ -0,0 +1,284 @@
+"""
+Archivo histórico del CSV de cultivos en particiones mensuales comprimidas
+
+La rotación (manage.py archivar_csv) saca del CSV vivo los meses
+anteriores al corte y los guarda como un .npz comprimido por mes en
+DATA_CSV_DIR/archivo/ (mismos tipos que la cache columnar), con un
+manifest.json que registra el rango de fechas de cada partición. Las
+filas originales quedan además en un .csv.gz en DATA_BACKUP_DIR, y las
+líneas mal formadas (otra cantidad de campos) se copian a un archivo de
+rechazadas en el mismo directorio en vez de perderse al reescribir el CSV.
+
+recalcular_particiones vuelve a puntuar la viabilidad de las particiones
+cuando cambian los rangos (manage.py recalcular_viabilidad).
+
+Las lecturas por rango solo abren las particiones que se solapan con el
+rango pedido, y de cada una solo descomprimen las columnas pedidas.
+"""
+import csv
+import json
+import os
+
+import numpy as np
+import pandas as pd
+from django.conf import settings
+from django.utils import timezone
+
+from .archivos import abrir_para_agregar
+from .cache_columnar import NAT, TIPOS_COLUMNA, VALORES_CULTIVO, _a_ns, convertir_columnas, get_cache
+from .calidad import aplicar_cuarentena
+from .ingesta import CAMPOS_CSV, CULTIVOS, METRICAS
+from .viabilidad import METRICAS_RANGO, es_viable, puntuar
+
+
+VERSION_MANIFEST = 1
+
+
+def directorio_archivo():
+    return os.path.join(settings.DATA_CSV_DIR, 'archivo')
+
+
+# ----------------------------------------------------------------------
+# Manifest
+# ----------------------------------------------------------------------
+
+def leer_manifest():
+    try:
+        with open(os.path.join(directorio_archivo(), 'manifest.json'), encoding='utf-8') as f:
+            manifest = json.load(f)
+    except (FileNotFoundError, ValueError):
+        return {'version': VERSION_MANIFEST, 'particiones': {}}
+    return manifest
+
+
+def _guardar_json(ruta, datos):
+    temporal = f'{ruta}.{os.getpid()}.tmp'
+    with open(temporal, 'w', encoding='utf-8') as f:
+        json.dump(datos, f, indent=2)
+    os.replace(temporal, ruta)
+
+
+# ----------------------------------------------------------------------
+# Rotación
+# ----------------------------------------------------------------------
+
+def archivar(corte, ruta_csv=None):
+    """
+    Mueve al archivo las filas del CSV vivo con fecha anterior a corte.
+
+    Retorna {'filas': n, 'particiones': [mes, ...], 'respaldo': ruta,
+    'rechazadas': n, 'archivo_rechazadas': ruta}. Las filas sin fecha
+    válida se quedan en el CSV vivo; las mal formadas pasan al archivo de
+    rechazadas.
+    """
+    ruta_csv = str(ruta_csv or settings.INGESTA['CSV_CULTIVOS'])
+    corte_ns = _a_ns(corte)
+    os.makedirs(directorio_archivo(), exist_ok=True)
+    os.makedirs(settings.DATA_BACKUP_DIR, exist_ok=True)
+
+    # Mismo bloqueo que la ingesta: las escrituras esperan y luego
+    # detectan el reemplazo del archivo y lo reabren
+    with abrir_para_agregar(ruta_csv, newline='', encoding='utf-8'):
+        filas, mal_formadas = _leer_csv(ruta_csv)
+        crudo = pd.DataFrame(filas, columns=CAMPOS_CSV, dtype=str)
+        columnas = convertir_columnas(crudo)
+        fechas = columnas['date']
+        archivar_fila = (fechas != NAT) & (fechas < corte_ns)
+        if not archivar_fila.any():
+            return {'filas': 0, 'particiones': [], 'respaldo': None, 'rechazadas': 0, 'archivo_rechazadas': None}
+
+        marca = f'{os.path.splitext(os.path.basename(ruta_csv))[0]}_{timezone.now():%Y%m%d_%H%M%S}'
+        archivo_rechazadas = None
+        if mal_formadas:
+            # Antes de reescribir el CSV: sin esta copia se perderían
+            archivo_rechazadas = os.path.join(settings.DATA_BACKUP_DIR, f'{marca}_rechazadas.csv')
+            with open(archivo_rechazadas, 'w', newline='', encoding='utf-8') as f:
+                csv.writer(f).writerows(mal_formadas)
+
+        # Mes (hora local) de cada fila a archivar
+        locales = pd.to_datetime(fechas[archivar_fila], utc=True).tz_convert(settings.TIME_ZONE)
+        meses = (locales.year * 100 + locales.month).to_numpy()
+
+        manifest = leer_manifest()
+        particiones = []
+        for mes in np.unique(meses):
+            seleccion = meses == mes
+            datos = {columna: valores[archivar_fila][seleccion] for columna, valores in columnas.items()}
+            nombre = f'{mes // 100:04d}-{mes % 100:02d}'
+            manifest['particiones'][nombre] = _escribir_particion(nombre, datos)
+            particiones.append(nombre)
+        manifest['actualizado_en'] = timezone.now().isoformat()
+        _guardar_json(os.path.join(directorio_archivo(), 'manifest.json'), manifest)
+
+        # Respaldo de las filas originales, en texto comprimido
+        respaldo = os.path.join(settings.DATA_BACKUP_DIR, f'{marca}.csv.gz')
+        crudo[archivar_fila].to_csv(respaldo, index=False, compression='gzip')
+
+        temporal = f'{ruta_csv}.{os.getpid()}.tmp'
+        crudo[~archivar_fila].to_csv(temporal, index=False)
+        os.replace(temporal, ruta_csv)
+
+    return {
+        'filas': int(archivar_fila.sum()),
+        'particiones': particiones,
+        'respaldo': respaldo,
+        'rechazadas': len(mal_formadas),
+        'archivo_rechazadas': archivo_rechazadas,
+    }
+
+
+def _leer_csv(ruta_csv):
+    """
+    Lee el CSV vivo como texto. Retorna (filas, mal_formadas): las filas con
+    la cantidad de campos de CAMPOS_CSV y el resto (líneas en blanco aparte).
+    """
+    filas = []
+    mal_formadas = []
+    with open(ruta_csv, newline='', encoding='utf-8') as f:
+        lector = csv.reader(f)
+        for numero, campos in enumerate(lector):
+            if numero == 0 and campos[:1] == ['date']:
+                continue
+            if len(campos) == len(CAMPOS_CSV):
+                filas.append(campos)
+            elif campos:
+                mal_formadas.append(campos)
+    return filas, mal_formadas
+
+
+def _escribir_particion(nombre, datos):
+    """Escribe (o completa, si el mes ya estaba archivado) una partición"""
+    ruta = os.path.join(directorio_archivo(), f'{nombre}.npz')
+    if os.path.exists(ruta):
+        with np.load(ruta) as existente:
+            anteriores = {columna: existente[columna] for columna in TIPOS_COLUMNA}
+        # Una rotación interrumpida después de escribir la partición vuelve
+        # a archivar las mismas filas: se descartan las nuevas que ya están
+        # en la partición. Lecturas idénticas dentro del CSV vivo se conservan.
+        nuevas = pd.DataFrame(datos).merge(
+            pd.DataFrame(anteriores).drop_duplicates(), how='left', indicator=True
+        )
+        nuevas = nuevas[nuevas['_merge'] == 'left_only']
+        datos = {
+            columna: np.concatenate([anteriores[columna], nuevas[columna].to_numpy(TIPOS_COLUMNA[columna])])
+            for columna in TIPOS_COLUMNA
+        }
+
+    orden = np.argsort(datos['date'], kind='stable')
+    datos = {columna: np.ascontiguousarray(valores[orden]) for columna, valores in datos.items()}
+    return _guardar_particion(ruta, datos)
+
+
+def _guardar_particion(ruta, datos):
+    temporal = f'{ruta}.{os.getpid()}.tmp.npz'
+    np.savez_compressed(temporal, **datos)
+    os.replace(temporal, ruta)
+
+    return {
+        'archivo': os.path.basename(ruta),
+        'filas': int(len(datos['date'])),
+        'desde': int(datos['date'][0]),
+        'hasta': int(datos['date'][-1]),
+        'bytes': os.path.getsize(ruta),
+    }
+
+
+def recalcular_particiones():
+    """
+    Vuelve a puntuar la viabilidad de todas las particiones con los rangos
+    actuales. Llamar con el CSV vivo bloqueado (abrir_para_agregar), igual
+    que archivar, para no competir con una rotación.
+
+    Retorna la cantidad de filas recalculadas.
+    """
+    manifest = leer_manifest()
+    if not manifest['particiones']:
+        return 0
+
+    total = 0
+    for nombre, particion in sorted(manifest['particiones'].items()):
+        ruta = os.path.join(directorio_archivo(), particion['archivo'])
+        with np.load(ruta) as npz:
+            datos = {columna: npz[columna] for columna in TIPOS_COLUMNA}
+        for cultivo, puntajes in puntuar({metrica: datos[metrica] for metrica in METRICAS_RANGO}).items():
+            datos[cultivo] = np.where(
+                es_viable(puntajes), VALORES_CULTIVO['Si'], VALORES_CULTIVO['No']
+            ).astype(TIPOS_COLUMNA[cultivo])
+        manifest['particiones'][nombre] = _guardar_particion(ruta, datos)
+        total += len(datos['date'])
+
+    manifest['actualizado_en'] = timezone.now().isoformat()
+    _guardar_json(os.path.join(directorio_archivo(), 'manifest.json'), manifest)
+    return total
+
+
+# ----------------------------------------------------------------------
+# Lectura
+# ----------------------------------------------------------------------
+
+def particiones_en_rango(desde=None, hasta=None, manifest=None):
+    """Nombres de las particiones que se solapan con [desde, hasta)"""
+    manifest = manifest or leer_manifest()
+    inicio = _a_ns(desde)
+    fin = _a_ns(hasta)
+    return sorted(
+        nombre for nombre, particion in manifest['particiones'].items()
+        if (inicio is None or particion['hasta'] >= inicio)
+        and (fin is None or particion['desde'] < fin)
+    )
+
+
+def frame_historico(desde=None, hasta=None, columnas=None):
+    """
+    DataFrame (índice de fecha local) con las filas archivadas en
+    [desde, hasta), leyendo solo las particiones y columnas necesarias.
+    """
+    nombres = list(columnas or (METRICAS + CULTIVOS))
+    manifest = leer_manifest()
+    inicio = _a_ns(desde)
+    fin = _a_ns(hasta)
+
+    partes = []
+    for particion in particiones_en_rango(desde, hasta, manifest):
+        ruta = os.path.join(directorio_archivo(), manifest['particiones'][particion]['archivo'])
+        with np.load(ruta) as npz:
+            # npz descomprime cada columna solo al accederla
+            fechas = npz['date']
+            izquierda = 0 if inicio is None else int(np.searchsorted(fechas, inicio, side='left'))
+            derecha = len(fechas) if fin is None else int(np.searchsorted(fechas, fin, side='left'))
+            if derecha <= izquierda:
+                continue
+            parte = {'date': fechas[izquierda:derecha]}
+            for nombre in nombres:
+                parte[nombre] = npz[nombre][izquierda:derecha]
+            partes.append(parte)
+
+    if not partes:
+        return pd.DataFrame(
+            {nombre: np.empty(0, dtype=TIPOS_COLUMNA[nombre]) for nombre in nombres},
+            index=pd.DatetimeIndex([], tz=settings.TIME_ZONE, name='date'),
+        )
+
+    indice = pd.to_datetime(np.concatenate([parte['date'] for parte in partes]), utc=True)
+    frame = pd.DataFrame(
+        {nombre: np.concatenate([parte[nombre] for parte in partes]) for nombre in nombres},
+        index=indice.tz_convert(settings.TIME_ZONE),
+    )
+    frame.index.name = 'date'
+    return frame
+
+
+def frame_completo(desde=None, hasta=None, columnas=None):
+    """
+    Historia archivada + CSV vivo (cache columnar) para [desde, hasta),
+    sin los valores puestos en cuarentena por la revisión de calidad
+    """
+    historico = frame_historico(desde, hasta, columnas)
+    vivo = get_cache().frame(desde=desde, hasta=hasta, columnas=columnas)
+    if historico.empty:
+        frame = vivo
+    elif vivo.empty:
+        frame = historico
+    else:
+        frame = pd.concat([historico, vivo])
+    return aplicar_cuarentena(frame)
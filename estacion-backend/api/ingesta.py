@@ -0,0 +1,460 @@
+"""
+Ingesta de lecturas hacia el CSV de cultivos
+
+Las lecturas se encolan en memoria (una cola por proceso, respaldada por
+un diario en disco) y se escriben por lotes, cuando la cola alcanza
+TAMANO_LOTE o cuando pasan INTERVALO_FLUSH segundos desde la primera
+lectura encolada.
+Cada escritura abre el CSV una sola vez y lo bloquea a nivel de
+sistema operativo, así los workers no intercalan filas.
+"""
+import atexit
+import csv
+import json
+import os
+import threading
+import uuid
+from pathlib import Path
+
+from django.conf import settings
+from django.db import connections, transaction
+from django.dispatch import Signal
+from django.utils.dateparse import parse_date, parse_datetime
+
+from .archivos import abrir_para_agregar, intentar_bloqueo
+
+
+CAMPOS_CSV = ['date', 'temperatura', 'radiacion_solar', 'humedad_suelo',
+              'humedad', 'precipitacion', 'tomate', 'banana', 'cacao', 'arroz', 'maiz']
+
+CULTIVOS = ['tomate', 'banana', 'cacao', 'arroz', 'maiz']
+
+METRICAS = ['temperatura', 'radiacion_solar', 'humedad_suelo', 'humedad', 'precipitacion']
+
+# Filas validadas por bloque en la carga masiva
+TAMANO_BLOQUE_VALIDACION = 500
+
+# Se envía después de escribir cada lote en el CSV y en la base de datos: filas=[dict, ...]
+lote_guardado = Signal()
+
+
+def construir_fila(datos):
+    """Convierte una lectura recibida por la API en una fila del CSV"""
+    if not isinstance(datos, dict):
+        raise ValueError('Cada lectura debe ser un objeto JSON')
+
+    return {
+        'date': datos.get('fecha'),
+        'temperatura': datos.get('temperatura'),
+        'radiacion_solar': datos.get('radiacion_solar'),
+        'humedad_suelo': datos.get('humedad_suelo'),
+        'humedad': datos.get('humedad'),
+        'precipitacion': datos.get('precipitacion'),
+        'tomate': datos.get('tomate', 'No'),
+        'banana': datos.get('banana', 'No'),
+        'cacao': datos.get('cacao', 'No'),
+        'arroz': datos.get('arroz', 'No'),
+        'maiz': datos.get('maiz', 'No'),
+        # No se escribe en el CSV; la usa la persistencia en base de datos
+        'fuente': datos.get('fuente'),
+    }
+
+
+def validar_lectura(datos):
+    """
+    Valida una lectura con los mismos campos que construir_fila.
+
+    Retorna (fila, errores); fila es None si la lectura no es válida.
+    """
+    if not isinstance(datos, dict):
+        return None, {'lectura': 'Debe ser un objeto JSON'}
+
+    errores = {}
+    fecha = datos.get('fecha') or datos.get('date')
+    if not fecha:
+        errores['fecha'] = 'Campo requerido'
+    elif not (parse_datetime(str(fecha)) or parse_date(str(fecha))):
+        errores['fecha'] = f'Fecha inválida: {fecha}'
+
+    for campo in METRICAS:
+        valor = datos.get(campo)
+        if valor in (None, ''):
+            continue
+        try:
+            float(valor)
+        except (TypeError, ValueError):
+            errores[campo] = f'Valor numérico inválido: {valor}'
+
+    for cultivo in CULTIVOS:
+        if datos.get(cultivo, 'No') not in ('Si', 'No'):
+            errores[cultivo] = "Debe ser 'Si' o 'No'"
+
+    if errores:
+        return None, errores
+
+    return construir_fila({**datos, 'fecha': fecha}), {}
+
+
+def validar_bloque(bloque):
+    """Valida un bloque de (linea, datos) y separa aceptadas de errores"""
+    aceptadas = []
+    errores = []
+    for linea, datos in bloque:
+        fila, error = validar_lectura(datos)
+        if fila is None:
+            errores.append({'linea': linea, 'errores': error})
+        else:
+            aceptadas.append(fila)
+    return aceptadas, errores
+
+
+def leer_ndjson(lineas):
+    """Genera (linea, datos) desde un cuerpo JSON delimitado por saltos de línea"""
+    for numero, linea in enumerate(lineas, start=1):
+        linea = linea.strip()
+        if not linea:
+            continue
+        try:
+            yield numero, json.loads(linea)
+        except ValueError as e:
+            yield numero, ValueError(f'JSON inválido: {str(e)}')
+
+
+def leer_csv(lineas):
+    """Genera (linea, datos) desde un cuerpo CSV con encabezados"""
+    reader = csv.DictReader(lineas)
+    for datos in reader:
+        yield reader.line_num, datos
+
+
+def procesar_carga_masiva(lecturas):
+    """
+    Valida por bloques las lecturas de un iterador (linea, datos) y
+    escribe las aceptadas en el CSV en una sola pasada.
+
+    Retorna (filas_escritas, errores).
+    """
+    aceptadas = []
+    errores = []
+    bloque = []
+
+    for linea, datos in lecturas:
+        if isinstance(datos, Exception):
+            errores.append({'linea': linea, 'errores': {'lectura': str(datos)}})
+            continue
+        bloque.append((linea, datos))
+        if len(bloque) >= TAMANO_BLOQUE_VALIDACION:
+            ok, mal = validar_bloque(bloque)
+            aceptadas.extend(ok)
+            errores.extend(mal)
+            bloque = []
+
+    if bloque:
+        ok, mal = validar_bloque(bloque)
+        aceptadas.extend(ok)
+        errores.extend(mal)
+
+    errores.sort(key=lambda error: error['linea'])
+    return escribir_filas(aceptadas), errores
+
+
+def escribir_filas(filas, ruta=None):
+    """
+    Escribe las filas en el CSV en una sola pasada y bajo bloqueo.
+
+    Retorna la cantidad de filas escritas.
+    """
+    if not filas:
+        return 0
+
+    if settings.CALIDAD['REVISAR_EN_INGESTA']:
+        # Antes de la viabilidad: los valores rechazados quedan vacíos
+        from .calidad import revisar_filas
+        revisar_filas(filas)
+
+    if settings.VIABILIDAD['CALCULAR_EN_INGESTA']:
+        from .viabilidad import asignar_viabilidad
+        asignar_viabilidad(filas)
+
+    ruta = ruta or settings.INGESTA['CSV_CULTIVOS']
+    with abrir_para_agregar(ruta, newline='', encoding='utf-8') as f:
+        writer = csv.DictWriter(f, fieldnames=CAMPOS_CSV, extrasaction='ignore')
+        if f.tell() == 0:
+            writer.writeheader()
+        writer.writerows(filas)
+        f.flush()
+
+    # Las filas ya están en disco: si la base de datos falla el lote queda
+    # pendiente y se reintenta con el siguiente, nunca se vuelve a escribir
+    try:
+        reintentar_pendientes_bd()
+        persistir_filas(filas)
+    except Exception as e:
+        print(f"Error guardando lote en la base de datos: {str(e)}")
+        guardar_pendientes_bd(filas)
+
+    for receptor, resultado in lote_guardado.send_robust(sender=BufferIngesta, filas=filas):
+        if isinstance(resultado, Exception):
+            print(f"Error procesando lote en {receptor.__name__}: {str(resultado)}")
+
+    return len(filas)
+
+
+def persistir_filas(filas):
+    """Guarda en la base de datos las filas escritas en el CSV y actualiza los resúmenes"""
+    from .models import DatosMeteorologicos
+    from .resumenes import actualizar_resumenes
+
+    lecturas = [DatosMeteorologicos.desde_fila(fila) for fila in filas]
+    lecturas = [lectura for lectura in lecturas if lectura is not None]
+    if lecturas:
+        with transaction.atomic():
+            DatosMeteorologicos.objects.bulk_create(
+                lecturas, batch_size=settings.INGESTA['TAMANO_LOTE_BD']
+            )
+            actualizar_resumenes(lecturas)
+    return lecturas
+
+
+def guardar_pendientes_bd(filas):
+    """Anota filas que están en el CSV pero no en la base de datos"""
+    try:
+        with abrir_para_agregar(settings.INGESTA['PENDIENTES_BD'], encoding='utf-8') as f:
+            f.writelines(json.dumps(fila, default=str) + '\n' for fila in filas)
+            f.flush()
+            os.fsync(f.fileno())
+    except OSError as e:
+        print(f"❌ {len(filas)} filas quedaron solo en el CSV: {str(e)}")
+
+
+def reintentar_pendientes_bd():
+    """
+    Guarda en la base de datos las filas pendientes de lotes anteriores.
+
+    Retorna las filas guardadas; si la base vuelve a fallar la excepción
+    se propaga y las filas siguen pendientes.
+    """
+    ruta = settings.INGESTA['PENDIENTES_BD']
+    if not os.path.exists(ruta) or os.path.getsize(ruta) == 0:
+        return 0
+
+    with abrir_para_agregar(ruta, 'a+', encoding='utf-8') as f:
+        f.seek(0)
+        filas = []
+        for linea in f:
+            try:
+                filas.append(json.loads(linea))
+            except ValueError:
+                pass
+        persistir_filas(filas)
+        f.truncate(0)
+        f.flush()
+        os.fsync(f.fileno())
+
+    print(f'✅ {len(filas)} filas pendientes guardadas en la base de datos')
+    return len(filas)
+
+
+class BufferIngesta:
+    """
+    Cola de lecturas en memoria que se vacía por tamaño o por tiempo
+
+    Cada lectura encolada se agrega antes a un diario en disco (un archivo
+    por proceso, bloqueado mientras el proceso vive y con fsync). Después
+    de cada lote escrito el diario se reescribe con lo que sigue pendiente.
+    Al crear el buffer se adoptan los diarios de procesos que ya no
+    existen, así un reinicio no pierde lecturas que se respondieron como
+    recibidas.
+    """
+
+    def __init__(self, tamano_lote=None, intervalo=None, ruta=None, diario_dir=None):
+        self.tamano_lote = tamano_lote or settings.INGESTA['TAMANO_LOTE']
+        self.intervalo = intervalo if intervalo is not None else settings.INGESTA['INTERVALO_FLUSH']
+        self.ruta = ruta
+        self._cola = []
+        # Lotes tomados de la cola que todavía no llegaron al CSV
+        self._en_escritura = []
+        self._lock = threading.Lock()
+        self._lock_escritura = threading.Lock()
+        self._timer = None
+
+        # Estadísticas del proceso
+        self.lotes_escritos = 0
+        self.filas_escritas = 0
+        self.ultimo_lote = 0
+        self.errores = 0
+        self.recuperadas = 0
+
+        self.diario_dir = Path(diario_dir or settings.INGESTA['DIARIO_DIR'])
+        self.diario_dir.mkdir(parents=True, exist_ok=True)
+        self._diario = open(self.diario_dir / f'{os.getpid()}-{uuid.uuid4().hex}.jsonl', 'a+', encoding='utf-8')
+        intentar_bloqueo(self._diario)
+        self._recuperar_diarios()
+
+    def encolar(self, filas):
+        """
+        Agrega filas a la cola.
+
+        Las filas quedan en el diario antes de retornar. Retorna las filas
+        escritas si la cola llegó a TAMANO_LOTE y se vació en esta llamada,
+        o 0 si las filas quedaron en espera.
+        """
+        with self._lock:
+            self._anotar(filas)
+            self._cola.extend(filas)
+            if len(self._cola) >= self.tamano_lote:
+                lote = self._tomar_cola()
+            else:
+                lote = None
+                self._programar_flush()
+
+        if lote:
+            return self._escribir(lote)
+        return 0
+
+    def vaciar(self):
+        """Escribe inmediatamente todo lo pendiente"""
+        with self._lock:
+            lote = self._tomar_cola()
+        return self._escribir(lote)
+
+    def cerrar(self):
+        """Vacía la cola y borra el diario si no quedó nada pendiente"""
+        self.vaciar()
+        with self._lock:
+            if self._diario.closed:
+                return
+            ruta = self._diario.name
+            pendiente = self._cola or self._en_escritura
+            self._diario.close()
+        if not pendiente:
+            os.remove(ruta)
+
+    def pendientes(self):
+        with self._lock:
+            return len(self._cola)
+
+    def _tomar_cola(self):
+        lote, self._cola = self._cola, []
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        if lote:
+            self._en_escritura.append(lote)
+        return lote
+
+    def _programar_flush(self):
+        if self._timer is None and self.intervalo > 0:
+            self._timer = threading.Timer(self.intervalo, self._flush_por_tiempo)
+            self._timer.daemon = True
+            self._timer.start()
+
+    def _flush_por_tiempo(self):
+        with self._lock:
+            self._timer = None
+            lote = self._tomar_cola()
+        try:
+            self._escribir(lote)
+        finally:
+            # El hilo del timer no es un request: cerrar su conexión a la BD
+            connections.close_all()
+
+    def _escribir(self, lote):
+        if not lote:
+            return 0
+
+        with self._lock_escritura:
+            try:
+                escritas = escribir_filas(lote, self.ruta)
+            except Exception as e:
+                self.errores += 1
+                print(f"Error guardando CSV: {str(e)}")
+                # Se devuelven a la cola para el próximo intento (siguen en el diario)
+                with self._lock:
+                    self._quitar_en_escritura(lote)
+                    self._cola[:0] = lote
+                    self._programar_flush()
+                return 0
+
+            with self._lock:
+                self._quitar_en_escritura(lote)
+                try:
+                    self._reescribir_diario()
+                except OSError as e:
+                    # El lote ya está en el CSV; en el peor caso se repite al recuperar
+                    print(f"Error actualizando diario de ingesta: {str(e)}")
+
+            self.lotes_escritos += 1
+            self.filas_escritas += escritas
+            self.ultimo_lote = escritas
+            print(f'✅ Lote de {escritas} filas escrito en CSV')
+            return escritas
+
+    def _quitar_en_escritura(self, lote):
+        self._en_escritura = [otro for otro in self._en_escritura if otro is not lote]
+
+    def _anotar(self, filas):
+        """Agrega filas al diario y espera a que lleguen al disco"""
+        if self._diario.closed:
+            raise RuntimeError('El buffer de ingesta está cerrado')
+        self._diario.seek(0, os.SEEK_END)
+        self._diario.writelines(json.dumps(fila, default=str) + '\n' for fila in filas)
+        self._diario.flush()
+        os.fsync(self._diario.fileno())
+
+    def _reescribir_diario(self):
+        if self._diario.closed:
+            return
+        self._diario.seek(0)
+        self._diario.truncate()
+        pendientes = [fila for lote in self._en_escritura for fila in lote] + self._cola
+        self._anotar(pendientes)
+
+    def _recuperar_diarios(self):
+        """Adopta los diarios de procesos terminados (sin bloqueo activo)"""
+        for ruta in sorted(self.diario_dir.glob('*.jsonl')):
+            if ruta == Path(self._diario.name):
+                continue
+            try:
+                f = open(ruta, 'r+', encoding='utf-8')
+            except FileNotFoundError:
+                continue
+            with f:
+                if not intentar_bloqueo(f):
+                    continue  # el proceso dueño sigue vivo
+                filas = []
+                for linea in f:
+                    try:
+                        filas.append(json.loads(linea))
+                    except ValueError:
+                        pass  # última línea cortada por la caída del proceso
+                if filas:
+                    with self._lock:
+                        self._anotar(filas)
+                        self._cola.extend(filas)
+                        self._programar_flush()
+                    self.recuperadas += len(filas)
+                    print(f'🔄 {len(filas)} lecturas recuperadas del diario {ruta.name}')
+                # Vacío antes de borrar: otro proceso que lo abrió a la vez no lo repite
+                f.truncate(0)
+                f.flush()
+                os.fsync(f.fileno())
+                try:
+                    os.remove(ruta)
+                except FileNotFoundError:
+                    pass
+
+
+_buffer = None
+_buffer_lock = threading.Lock()
+
+
+def get_buffer():
+    """Retorna el buffer de ingesta del proceso actual"""
+    global _buffer
+    if _buffer is None:
+        with _buffer_lock:
+            if _buffer is None:
+                _buffer = BufferIngesta()
+                atexit.register(_buffer.cerrar)
+    return _buffer
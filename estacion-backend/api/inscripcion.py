@@ -0,0 +1,197 @@
+"""
+Inscripción masiva de usuarios
+
+Las contraseñas se hashean en un pool de procesos que cada worker crea
+una sola vez (PBKDF2 es CPU puro y no libera el GIL), los duplicados se
+buscan con una sola consulta y los User/Usuario se insertan con
+bulk_create dentro de una transacción.
+"""
+import atexit
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from multiprocessing import get_context
+
+from django.conf import settings
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.core.exceptions import ValidationError
+from django.core.validators import validate_email
+from django.db import transaction
+from django.db.models import Q
+
+from .cache_respuestas import incrementar_version
+from .models import Usuario
+from .procesos import iniciar_proceso_hash
+
+
+def hashear_contrasenas(contrasenas):
+    """Retorna los hashes en el mismo orden, usando varios procesos si vale la pena"""
+    procesos = settings.INSCRIPCION['PROCESOS']
+    if len(contrasenas) < settings.INSCRIPCION['MINIMO_PARA_POOL'] or procesos <= 1:
+        return [make_password(contrasena) for contrasena in contrasenas]
+
+    tamano = max(1, len(contrasenas) // (procesos * 4))
+    try:
+        return list(get_pool_hash().map(make_password, contrasenas, chunksize=tamano))
+    except BrokenProcessPool as e:
+        # Un proceso hijo murió: el próximo lote crea un pool nuevo
+        _descartar_pool_hash()
+        print(f"Error en el pool de hash, se hashea en el proceso: {str(e)}")
+        return [make_password(contrasena) for contrasena in contrasenas]
+
+
+_pool_hash = None
+_pool_hash_lock = threading.Lock()
+
+
+def get_pool_hash():
+    """
+    Pool de procesos del worker actual, creado en el primer lote grande.
+
+    'spawn' evita heredar hilos y conexiones del worker web; cada proceso
+    hijo configura Django con el DJANGO_SETTINGS_MODULE del entorno una
+    sola vez y queda para las inscripciones siguientes.
+    """
+    global _pool_hash
+    if _pool_hash is None:
+        with _pool_hash_lock:
+            if _pool_hash is None:
+                _pool_hash = ProcessPoolExecutor(
+                    max_workers=settings.INSCRIPCION['PROCESOS'],
+                    mp_context=get_context('spawn'),
+                    initializer=iniciar_proceso_hash,
+                )
+                atexit.register(_pool_hash.shutdown, wait=False, cancel_futures=True)
+    return _pool_hash
+
+
+def _descartar_pool_hash():
+    global _pool_hash
+    with _pool_hash_lock:
+        pool, _pool_hash = _pool_hash, None
+    if pool is not None:
+        pool.shutdown(wait=False, cancel_futures=True)
+
+
+def validar_fila(datos):
+    """Valida una fila de inscripción; retorna (datos_limpios, errores)"""
+    if not isinstance(datos, dict):
+        return None, {'fila': 'Debe ser un objeto JSON'}
+
+    nombre = (datos.get('nombre') or '').strip()
+    email = (datos.get('email') or '').strip()
+    password = (datos.get('password') or '').strip()
+    rol = (datos.get('rol') or 'estudiante').strip()
+
+    errores = {}
+    if not nombre:
+        errores['nombre'] = 'Campo requerido'
+    try:
+        validate_email(email)
+    except ValidationError:
+        errores['email'] = 'Email inválido'
+    if len(password) < 8:
+        errores['password'] = 'La contraseña debe tener mínimo 8 caracteres'
+    if rol not in Usuario.ROLES_DISPLAY:
+        errores['rol'] = f'Rol inválido: {rol}'
+
+    if errores:
+        return None, errores
+
+    return {
+        'nombre': nombre,
+        'email': email,
+        'username': email.split('@')[0].lower(),
+        'password': password,
+        'rol': rol,
+    }, {}
+
+
+def inscribir_usuarios(filas):
+    """
+    Crea usuarios desde un iterador de (linea, datos).
+
+    Retorna (creados, resultados) con un resultado por fila.
+    """
+    resultados = []
+    validas = []
+    emails = set()
+    usernames = set()
+
+    for linea, datos in filas:
+        limpio, errores = validar_fila(datos)
+        if limpio is not None:
+            if limpio['email'].lower() in emails:
+                errores = {'email': 'Email repetido en el archivo'}
+            elif limpio['username'] in usernames:
+                errores = {'username': f"Username repetido en el archivo: {limpio['username']}"}
+        if errores:
+            resultados.append({'linea': linea, 'estado': 'error', 'errores': errores})
+            continue
+        emails.add(limpio['email'].lower())
+        usernames.add(limpio['username'])
+        validas.append((linea, limpio))
+
+    # Duplicados contra la BD en una sola consulta
+    existentes = User.objects.filter(
+        Q(email__in=[limpio['email'] for _, limpio in validas]) |
+        Q(username__in=[limpio['username'] for _, limpio in validas])
+    ).values_list('email', 'username')
+    emails_existentes = {email.lower() for email, _ in existentes}
+    usernames_existentes = {username for _, username in existentes}
+
+    nuevas = []
+    for linea, limpio in validas:
+        if limpio['email'].lower() in emails_existentes:
+            resultados.append({'linea': linea, 'estado': 'error', 'errores': {'email': 'El email ya existe'}})
+        elif limpio['username'] in usernames_existentes:
+            resultados.append({
+                'linea': linea, 'estado': 'error',
+                'errores': {'username': f"El username ya existe: {limpio['username']}"}
+            })
+        else:
+            nuevas.append((linea, limpio))
+
+    if not nuevas:
+        resultados.sort(key=lambda resultado: resultado['linea'])
+        return 0, resultados
+
+    hashes = hashear_contrasenas([limpio['password'] for _, limpio in nuevas])
+    tamano_lote = settings.INSCRIPCION['TAMANO_LOTE_BD']
+
+    with transaction.atomic():
+        User.objects.bulk_create([
+            User(
+                username=limpio['username'],
+                email=limpio['email'],
+                first_name=limpio['nombre'],
+                password=hash_,
+            )
+            for (_, limpio), hash_ in zip(nuevas, hashes)
+        ], batch_size=tamano_lote)
+
+        # MySQL no retorna los ids de bulk_create: se leen en una consulta
+        ids = dict(
+            User.objects.filter(username__in=[limpio['username'] for _, limpio in nuevas])
+            .values_list('username', 'id')
+        )
+        Usuario.objects.bulk_create([
+            Usuario(user_id=ids[limpio['username']], rol=limpio['rol'])
+            for _, limpio in nuevas
+        ], batch_size=tamano_lote)
+        # bulk_create no envía post_save
+        incrementar_version('usuarios')
+
+    for linea, limpio in nuevas:
+        resultados.append({
+            'linea': linea,
+            'estado': 'creado',
+            'user_id': ids[limpio['username']],
+            'username': limpio['username'],
+            'email': limpio['email'],
+            'rol': limpio['rol'],
+        })
+
+    resultados.sort(key=lambda resultado: resultado['linea'])
+    return len(nuevas), resultados
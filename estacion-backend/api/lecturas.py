@@ -0,0 +1,124 @@
+"""
+Filtros y exportación en streaming de las lecturas guardadas
+"""
+import csv
+import json
+
+from django.utils import timezone
+from rest_framework.exceptions import ValidationError
+
+from .ingesta import METRICAS
+from .models import parsear_fecha
+
+
+CAMPOS_EXPORTACION = ['id', 'timestamp', 'fuente', 'temperatura', 'humedad', 'humedad_suelo',
+                      'radiacion_solar', 'precipitacion', 'presion', 'velocidad_viento']
+
+
+def filtrar_lecturas(queryset, params):
+    """
+    Aplica los filtros de la query string:
+    desde, hasta, fuente y <metrica>_min / <metrica>_max
+    """
+    desde = _fecha(params, 'desde')
+    hasta = _fecha(params, 'hasta')
+    queryset = queryset.rango(desde=desde, hasta=hasta, fuente=params.get('fuente'))
+
+    filtros = {}
+    for metrica in METRICAS:
+        for sufijo, lookup in (('min', 'gte'), ('max', 'lte')):
+            parametro = f'{metrica}_{sufijo}'
+            valor = params.get(parametro)
+            if valor in (None, ''):
+                continue
+            try:
+                filtros[f'{metrica}__{lookup}'] = float(valor)
+            except ValueError:
+                raise ValidationError({parametro: f'Valor numérico inválido: {valor}'})
+    return queryset.filter(**filtros)
+
+
+def _fecha(params, parametro):
+    valor = params.get(parametro)
+    if not valor:
+        return None
+    fecha = parsear_fecha(valor)
+    if fecha is None:
+        raise ValidationError({parametro: f'Fecha inválida: {valor}'})
+    return fecha
+
+
+def iterar_por_bloques(queryset, tamano=2000):
+    """
+    Recorre las lecturas en orden (timestamp, id) por bloques con keyset,
+    sin mantener más de un bloque en memoria.
+    """
+    queryset = queryset.order_by('timestamp', 'id').values_list(*CAMPOS_EXPORTACION)
+    ultimo = None
+    while True:
+        bloque = list(siguiente_bloque(queryset, ultimo, tamano))
+        if not bloque:
+            return
+        yield from bloque
+        ultimo = (bloque[-1][1], bloque[-1][0])
+        if len(bloque) < tamano:
+            return
+
+
+async def iterar_por_bloques_async(queryset, tamano=2000):
+    """Versión asíncrona de iterar_por_bloques para las vistas ASGI"""
+    queryset = queryset.order_by('timestamp', 'id').values_list(*CAMPOS_EXPORTACION)
+    ultimo = None
+    while True:
+        bloque = [fila async for fila in siguiente_bloque(queryset, ultimo, tamano)]
+        if not bloque:
+            return
+        for fila in bloque:
+            yield fila
+        ultimo = (bloque[-1][1], bloque[-1][0])
+        if len(bloque) < tamano:
+            return
+
+
+def siguiente_bloque(queryset, ultimo, tamano):
+    """Lecturas posteriores a ultimo = (timestamp, id)"""
+    if ultimo is not None:
+        timestamp, id_ = ultimo
+        queryset = queryset.filter(timestamp__gte=timestamp).exclude(timestamp=timestamp, id__lte=id_)
+    return queryset[:tamano]
+
+
+class _Eco:
+    """Buffer que retorna lo escrito, para usar csv.writer en streaming"""
+
+    def write(self, valor):
+        return valor
+
+
+def linea_jsonl(fila):
+    datos = dict(zip(CAMPOS_EXPORTACION, fila))
+    datos['timestamp'] = timezone.localtime(datos['timestamp']).isoformat()
+    return json.dumps(datos) + '\n'
+
+
+def linea_csv(writer, fila):
+    fila = list(fila)
+    fila[1] = timezone.localtime(fila[1]).isoformat()
+    return writer.writerow(fila)
+
+
+def escritor_csv():
+    """csv.writer cuyo writerow retorna la línea en lugar de escribirla"""
+    return csv.writer(_Eco())
+
+
+def generar_jsonl(filas):
+    for fila in filas:
+        yield linea_jsonl(fila)
+
+
+def generar_csv(filas):
+    writer = escritor_csv()
+    yield writer.writerow(CAMPOS_EXPORTACION)
+    for fila in filas:
+        yield linea_csv(writer, fila)
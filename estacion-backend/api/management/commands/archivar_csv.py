@@ -0,0 +1,47 @@
+from datetime import datetime
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from api.historico import archivar, leer_manifest
+from api.models import parsear_fecha
+
+
+class Command(BaseCommand):
+    help = 'Mueve los meses anteriores del CSV de cultivos a particiones mensuales comprimidas'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--archivo', default=str(settings.INGESTA['CSV_CULTIVOS']))
+        parser.add_argument(
+            '--meses-vivos', type=int, default=1,
+            help='Meses (incluido el actual) que se quedan en el CSV vivo'
+        )
+        parser.add_argument('--antes-de', help='Archiva las filas anteriores a esta fecha (YYYY-MM-DD)')
+
+    def handle(self, *args, **options):
+        if options['antes_de']:
+            corte = parsear_fecha(options['antes_de'])
+            if corte is None:
+                raise CommandError(f"Fecha inválida: {options['antes_de']}")
+        else:
+            ahora = timezone.localtime()
+            mes = ahora.year * 12 + ahora.month - 1 - (max(options['meses_vivos'], 1) - 1)
+            corte = timezone.make_aware(datetime(mes // 12, mes % 12 + 1, 1))
+
+        resultado = archivar(corte, options['archivo'])
+        if not resultado['filas']:
+            self.stdout.write(f'Sin filas anteriores a {corte:%Y-%m-%d}')
+            return
+
+        manifest = leer_manifest()
+        total_bytes = sum(particion['bytes'] for particion in manifest['particiones'].values())
+        self.stdout.write(self.style.SUCCESS(
+            f"✅ {resultado['filas']} filas archivadas en {len(resultado['particiones'])} particiones "
+            f"({', '.join(resultado['particiones'])}); respaldo en {resultado['respaldo']}. "
+            f"Archivo total: {len(manifest['particiones'])} particiones, {total_bytes / 1024:.0f} KiB"
+        ))
+        if resultado['rechazadas']:
+            self.stderr.write(self.style.WARNING(
+                f"{resultado['rechazadas']} líneas mal formadas copiadas a {resultado['archivo_rechazadas']}"
+            ))
@@ -0,0 +1,251 @@
+import json
+import os
+import resource
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+import numpy as np
+from django.conf import settings
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, connections
+from django.test import Client
+from django.test.utils import CaptureQueriesContext, override_settings
+from django.utils import timezone
+from rest_framework_simplejwt.tokens import AccessToken
+
+from api.authentication import claims_de_usuario
+from api.ingesta import get_buffer
+from api.models import DatosMeteorologicos, Usuario
+
+
+CONTRASENA = 'benchmark-123'
+
+ESCENARIOS = ['login', 'me', 'usuarios', 'lecturas', 'guardar_datos_csv']
+
+
+class Command(BaseCommand):
+    help = (
+        'Benchmark de los endpoints principales sobre una base de datos de prueba '
+        '(SQLite o MySQL según DB_ENGINE): latencias p50/p95/p99, consultas por '
+        'request y crecimiento de RSS, comparado contra una línea base'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--usuarios', type=int, default=200)
+        parser.add_argument('--lecturas', type=int, default=5000)
+        parser.add_argument('--solicitudes', type=int, default=50, help='Requests por escenario y fase')
+        parser.add_argument('--concurrencia', type=int, default=8)
+        parser.add_argument('--escenarios', nargs='+', choices=ESCENARIOS, default=ESCENARIOS)
+        parser.add_argument('--guardar-base', help='Guarda los resultados como línea base (JSON)')
+        parser.add_argument('--comparar', help='Línea base (JSON) contra la que comparar')
+        parser.add_argument(
+            '--tolerancia', type=float, default=0.25,
+            help='Aumento máximo de p95 respecto a la línea base (0.25 = 25%%)'
+        )
+
+    def handle(self, *args, **options):
+        nombre_original = connection.settings_dict['NAME']
+        connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+        try:
+            with tempfile.TemporaryDirectory() as temporal, override_settings(**_ajustes_aislados(temporal)):
+                resultados = self._ejecutar(options)
+                get_buffer().vaciar()
+        finally:
+            connections.close_all()
+            connection.creation.destroy_test_db(nombre_original, verbosity=0)
+
+        self._imprimir(resultados)
+
+        # Un escenario con errores no midió el camino real del endpoint
+        fallidos = [f"{nombre}: {r['errores']} errores" for nombre, r in resultados.items() if r['errores']]
+        if fallidos:
+            raise CommandError('Escenarios con respuestas de error:\n  ' + '\n  '.join(fallidos))
+
+        if options['guardar_base']:
+            with open(options['guardar_base'], 'w', encoding='utf-8') as f:
+                json.dump({'motor': settings.DATABASES['default']['ENGINE'], 'resultados': resultados}, f, indent=2)
+            self.stdout.write(self.style.SUCCESS(f"✅ Línea base guardada en {options['guardar_base']}"))
+
+        if options['comparar']:
+            regresiones = _comparar(resultados, options['comparar'], options['tolerancia'])
+            if regresiones:
+                raise CommandError('Regresiones de rendimiento:\n  ' + '\n  '.join(regresiones))
+            self.stdout.write(self.style.SUCCESS('✅ Sin regresiones respecto a la línea base'))
+
+    # ------------------------------------------------------------------
+    # Datos y escenarios
+    # ------------------------------------------------------------------
+
+    def _ejecutar(self, options):
+        self.stdout.write(f"🔄 Sembrando {options['usuarios']} usuarios y {options['lecturas']} lecturas")
+        usuarios = _sembrar(options['usuarios'], options['lecturas'])
+        admin = usuarios[0]
+        token = _token(admin)
+
+        escenarios = {
+            'login': lambda cliente, i: cliente.post(
+                '/api/token/',
+                {'username': usuarios[i % len(usuarios)].username, 'password': CONTRASENA},
+                content_type='application/json',
+            ),
+            'me': lambda cliente, i: cliente.get('/api/me/', HTTP_AUTHORIZATION=f'Bearer {token}'),
+            'usuarios': lambda cliente, i: cliente.get(
+                '/api/usuarios/?limite=50', HTTP_AUTHORIZATION=f'Bearer {token}'
+            ),
+            'lecturas': lambda cliente, i: cliente.get(
+                '/api/lecturas/?limite=100', HTTP_AUTHORIZATION=f'Bearer {token}'
+            ),
+            'guardar_datos_csv': lambda cliente, i: cliente.post(
+                '/api/guardar-datos-csv/',
+                {'fecha': f'2025-01-01 {i % 24:02d}:{i % 60:02d}', 'temperatura': 25, 'humedad': 70},
+                content_type='application/json', HTTP_AUTHORIZATION=f'Bearer {token}',
+            ),
+        }
+
+        resultados = {}
+        for nombre in options['escenarios']:
+            self.stdout.write(f'🔄 {nombre}')
+            resultados[nombre] = _medir(escenarios[nombre], options['solicitudes'], options['concurrencia'])
+        return resultados
+
+    def _imprimir(self, resultados):
+        self.stdout.write(
+            f"{'escenario':<20}{'p50':>9}{'p95':>9}{'p99':>9}{'conc p95':>10}{'req/s':>9}{'consultas':>11}{'RSS KiB':>10}"
+        )
+        for nombre, r in resultados.items():
+            self.stdout.write(
+                f"{nombre:<20}{r['p50']:>9.1f}{r['p95']:>9.1f}{r['p99']:>9.1f}"
+                f"{r['concurrente_p95']:>10.1f}{r['por_segundo']:>9.1f}"
+                f"{r['consultas']:>11.1f}{r['rss_kib']:>10}"
+            )
+        self.stdout.write('(latencias en ms)')
+
+
+def _ajustes_aislados(directorio):
+    """
+    Archivos del benchmark en un directorio temporal, no en los datos reales.
+    La cache de respuestas queda desactivada: cada request recorre el ORM y
+    la serialización en vez de medir aciertos de cache.
+    """
+    return {
+        'ALLOWED_HOSTS': [*settings.ALLOWED_HOSTS, 'testserver'],
+        'INGESTA': {**settings.INGESTA, 'CSV_CULTIVOS': os.path.join(directorio, 'cultivos.csv')},
+        'CACHE_COLUMNAR_DIR': os.path.join(directorio, 'cache_columnar'),
+        'CACHE_RESPUESTAS': {**settings.CACHE_RESPUESTAS, 'VERSIONES_DIR': os.path.join(directorio, 'versiones')},
+        'CACHES': {
+            **settings.CACHES,
+            'respuestas': {'BACKEND': 'django.core.cache.backends.dummy.DummyCache'},
+        },
+    }
+
+
+def _sembrar(cantidad_usuarios, cantidad_lecturas):
+    # Un solo hash: el costo de PBKDF2 se mide en el escenario de login
+    contrasena = make_password(CONTRASENA)
+    User.objects.bulk_create([
+        User(username=f'bench{i}', email=f'bench{i}@ejemplo.com', first_name=f'Bench {i}',
+             password=contrasena, is_superuser=(i == 0))
+        for i in range(cantidad_usuarios)
+    ], batch_size=500)
+    usuarios = list(User.objects.order_by('id'))
+    roles = ['administrativo', 'profesor', 'estudiante']
+    Usuario.objects.bulk_create([
+        Usuario(user=user, rol=roles[0] if i == 0 else roles[1 + i % 2])
+        for i, user in enumerate(usuarios)
+    ], batch_size=500)
+
+    inicio = timezone.now() - timedelta(minutes=cantidad_lecturas)
+    DatosMeteorologicos.objects.bulk_create([
+        DatosMeteorologicos(
+            timestamp=inicio + timedelta(minutes=i), temperatura=20 + i % 10,
+            humedad=60 + i % 30, fuente='sensor',
+        )
+        for i in range(cantidad_lecturas)
+    ], batch_size=1000)
+    return usuarios
+
+
+def _token(user):
+    token = AccessToken.for_user(user)
+    for clave, valor in claims_de_usuario(user).items():
+        token[clave] = valor
+    return str(token)
+
+
+def _rss_kib():
+    """RSS actual (Linux); si no está disponible, el máximo del proceso"""
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE') // 1024
+    except (OSError, ValueError):
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+
+def _medir(solicitud, cantidad, concurrencia):
+    """Fase secuencial (latencia y consultas) + fase concurrente (hilos)"""
+    rss_inicial = _rss_kib()
+    cliente = Client()
+    solicitud(cliente, 0)  # calentamiento
+
+    tiempos = []
+    consultas = []
+    errores = 0
+    for i in range(cantidad):
+        with CaptureQueriesContext(connection) as capturadas:
+            inicio = time.perf_counter()
+            response = solicitud(cliente, i)
+            tiempos.append((time.perf_counter() - inicio) * 1000)
+        consultas.append(len(capturadas))
+        errores += response.status_code >= 400
+
+    def hilo(indices):
+        cliente_hilo = Client()
+        medidos = []
+        try:
+            for i in indices:
+                inicio = time.perf_counter()
+                solicitud(cliente_hilo, i)
+                medidos.append((time.perf_counter() - inicio) * 1000)
+        finally:
+            connections.close_all()
+        return medidos
+
+    repartos = [range(i, cantidad, concurrencia) for i in range(concurrencia)]
+    inicio = time.perf_counter()
+    with ThreadPoolExecutor(concurrencia) as ejecutor:
+        concurrentes = [t for medidos in ejecutor.map(hilo, repartos) for t in medidos]
+    duracion = time.perf_counter() - inicio
+
+    p50, p95, p99 = np.percentile(tiempos, [50, 95, 99])
+    return {
+        'p50': round(float(p50), 2),
+        'p95': round(float(p95), 2),
+        'p99': round(float(p99), 2),
+        'concurrente_p95': round(float(np.percentile(concurrentes, 95)), 2),
+        'por_segundo': round(cantidad / duracion, 1),
+        'consultas': round(float(np.mean(consultas)), 2),
+        'errores': int(errores),
+        'rss_kib': _rss_kib() - rss_inicial,
+    }
+
+
+def _comparar(resultados, ruta_base, tolerancia):
+    with open(ruta_base, encoding='utf-8') as f:
+        base = json.load(f)['resultados']
+
+    regresiones = []
+    for nombre, actual in resultados.items():
+        anterior = base.get(nombre)
+        if anterior is None:
+            continue
+        if actual['p95'] > anterior['p95'] * (1 + tolerancia):
+            regresiones.append(f"{nombre}: p95 {anterior['p95']} ms -> {actual['p95']} ms")
+        if actual['consultas'] > anterior['consultas']:
+            regresiones.append(f"{nombre}: consultas por request {anterior['consultas']} -> {actual['consultas']}")
+        if actual['errores'] > anterior['errores']:
+            regresiones.append(f"{nombre}: errores {anterior['errores']} -> {actual['errores']}")
+    return regresiones
@@ -0,0 +1,107 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db.backends.signals import connection_created
+from django.db.utils import ConnectionHandler
+
+from api.db.pool import get_pool
+
+
+ALIAS = 'default'
+
+MOTORES_POOL = {
+    'django.db.backends.mysql': 'api.db.mysql',
+    'django.db.backends.sqlite3': 'api.db.sqlite3',
+}
+MOTORES_BASE = {pool: base for base, pool in MOTORES_POOL.items()}
+
+
+class Command(BaseCommand):
+    help = (
+        'Mide el costo de conexión por request con conexiones nuevas, persistentes '
+        '(CONN_MAX_AGE) y con el pool de api/db, contra la base configurada '
+        '(MySQL, o SQLite con DB_ENGINE=sqlite)'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--solicitudes', type=int, default=500, help='Requests por hilo')
+        parser.add_argument('--hilos', type=int, default=4)
+        parser.add_argument('--modos', nargs='+', choices=['nueva', 'persistente', 'pool'],
+                            default=['nueva', 'persistente', 'pool'])
+
+    def handle(self, *args, **options):
+        base = dict(settings.DATABASES['default'])
+        motor = MOTORES_BASE.get(base['ENGINE'], base['ENGINE'])
+        self.stdout.write(f"🔄 {motor} · {options['hilos']} hilos x {options['solicitudes']} requests")
+
+        for modo in options['modos']:
+            ajustes = {**base, 'ENGINE': motor, 'CONN_MAX_AGE': 0, 'CONN_HEALTH_CHECKS': False, 'BENCHMARK': True}
+            if modo == 'persistente':
+                ajustes.update(CONN_MAX_AGE=600, CONN_HEALTH_CHECKS=True)
+            elif modo == 'pool':
+                ajustes['ENGINE'] = MOTORES_POOL[motor]
+            resultado = _medir(ajustes, options['solicitudes'], options['hilos'])
+            self.stdout.write(self.style.SUCCESS(
+                f"{modo:>12}: {resultado['por_segundo']:8.0f} req/s, "
+                f"p50 {resultado['p50']:.3f} ms, p95 {resultado['p95']:.3f} ms, "
+                f"conexiones abiertas {resultado['conexiones']}"
+            ))
+
+
+def _medir(ajustes, solicitudes, hilos):
+    # Conexiones propias, separadas de django.db.connections
+    conexiones = ConnectionHandler({ALIAS: ajustes})
+    abiertas = []
+
+    def contar(sender, connection, **kwargs):
+        if connection.settings_dict.get('BENCHMARK'):
+            abiertas.append(1)
+
+    def hilo(_):
+        tiempos = []
+        try:
+            for _ in range(solicitudes):
+                inicio = time.perf_counter()
+                _request(conexiones)
+                tiempos.append((time.perf_counter() - inicio) * 1000)
+        finally:
+            conexiones[ALIAS].close()
+        return tiempos
+
+    connection_created.connect(contar)
+    try:
+        inicio = time.perf_counter()
+        with ThreadPoolExecutor(hilos) as ejecutor:
+            tiempos = [t for medidos in ejecutor.map(hilo, range(hilos)) for t in medidos]
+        duracion = time.perf_counter() - inicio
+    finally:
+        connection_created.disconnect(contar)
+
+    if ajustes['ENGINE'] in MOTORES_BASE:
+        # Con pool, connection_created se emite también al reutilizar
+        pool = get_pool(conexiones[ALIAS].settings_dict)
+        cantidad_abiertas = pool.estadisticas()['creadas']
+        pool.vaciar()
+    else:
+        cantidad_abiertas = len(abiertas)
+
+    p50, p95 = np.percentile(tiempos, [50, 95])
+    return {
+        'por_segundo': len(tiempos) / duracion,
+        'p50': p50,
+        'p95': p95,
+        'conexiones': cantidad_abiertas,
+    }
+
+
+def _request(conexiones):
+    """Ciclo de conexión de un request de Django (close_old_connections al inicio y al final)"""
+    conexion = conexiones[ALIAS]
+    conexion.close_if_unusable_or_obsolete()
+    with conexion.cursor() as cursor:
+        cursor.execute('SELECT 1')
+        cursor.fetchone()
+    conexion.close_if_unusable_or_obsolete()
@@ -0,0 +1,171 @@
+import asyncio
+import os
+import shutil
+import socket
+import subprocess
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import httpx
+import numpy as np
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from rest_framework_simplejwt.tokens import AccessToken
+
+from api.authentication import claims_de_usuario
+
+
+class Command(BaseCommand):
+    help = (
+        'Prueba de carga del proxy de clima en modo WSGI (hilos) y ASGI (uvicorn) '
+        'contra una API externa simulada con demora'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--modo', choices=['sync', 'async', 'ambos'], default='ambos')
+        parser.add_argument('--solicitudes', type=int, default=200)
+        parser.add_argument('--concurrencia', type=int, default=100)
+        parser.add_argument('--demora', type=float, default=1.0, help='Segundos que tarda la API simulada')
+        parser.add_argument('--usuario', help='Username para el token (por defecto el primer superusuario)')
+        parser.add_argument('--ruta', default='/api/async/clima/proxy/')
+
+    def handle(self, *args, **options):
+        token = self._token(options['usuario'])
+        upstream = _iniciar_upstream(options['demora'])
+        url_upstream = f'http://127.0.0.1:{upstream.server_port}/api_clima.php'
+        self.stdout.write(f'🔄 API simulada en {url_upstream} (demora {options["demora"]}s)')
+
+        modos = ['sync', 'async'] if options['modo'] == 'ambos' else [options['modo']]
+        resultados = {}
+        try:
+            for modo in modos:
+                puerto = _puerto_libre()
+                servidor = self._iniciar_servidor(modo, puerto, url_upstream)
+                try:
+                    _esperar_puerto(puerto)
+                    url = f'http://127.0.0.1:{puerto}{options["ruta"]}'
+                    resultados[modo] = asyncio.run(_carga(
+                        url, token, options['solicitudes'], options['concurrencia']
+                    ))
+                finally:
+                    servidor.terminate()
+                    servidor.wait(timeout=10)
+        finally:
+            upstream.shutdown()
+
+        for modo, resultado in resultados.items():
+            self.stdout.write(self.style.SUCCESS(
+                f"{modo:>5}: {resultado['ok']}/{resultado['total']} ok, "
+                f"{resultado['por_segundo']:.1f} req/s, "
+                f"p50 {resultado['p50']:.0f} ms, p95 {resultado['p95']:.0f} ms, p99 {resultado['p99']:.0f} ms"
+            ))
+
+        # Latencias de respuestas de error no sirven para comparar los modos
+        fallidos = [
+            f"{modo}: {resultado['total'] - resultado['ok']} de {resultado['total']} requests sin 200"
+            for modo, resultado in resultados.items() if resultado['ok'] < resultado['total']
+        ]
+        if fallidos:
+            raise CommandError('Requests fallidos:\n  ' + '\n  '.join(fallidos))
+
+    def _token(self, username):
+        if username:
+            user = User.objects.filter(username=username).first()
+        else:
+            user = User.objects.filter(is_superuser=True).order_by('id').first()
+        if user is None:
+            raise CommandError('No hay usuario para generar el token (usar --usuario)')
+        token = AccessToken.for_user(user)
+        for clave, valor in claims_de_usuario(user).items():
+            token[clave] = valor
+        return str(token)
+
+    def _iniciar_servidor(self, modo, puerto, url_upstream):
+        # Los requests llegan con Host: 127.0.0.1:<puerto>
+        entorno = {**os.environ, 'API_EXTERNA_URL': url_upstream, 'ALLOWED_HOSTS_EXTRA': '127.0.0.1,localhost'}
+
+        if modo == 'async':
+            comando = [sys.executable, '-m', 'uvicorn', 'config.asgi:application',
+                       '--port', str(puerto), '--log-level', 'warning']
+        elif shutil.which('gunicorn'):
+            comando = ['gunicorn', 'config.wsgi:application', '--bind', f'127.0.0.1:{puerto}',
+                       '--workers', '2', '--threads', '8', '--log-level', 'warning']
+        else:
+            # Servidor de desarrollo: un hilo por request
+            comando = [sys.executable, 'manage.py', 'runserver', f'127.0.0.1:{puerto}', '--noreload']
+
+        self.stdout.write(f'🔄 Modo {modo}: {" ".join(comando)}')
+        return subprocess.Popen(
+            comando, cwd=settings.BASE_DIR, env=entorno,
+            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+        )
+
+
+async def _carga(url, token, solicitudes, concurrencia):
+    semaforo = asyncio.Semaphore(concurrencia)
+    tiempos = []
+    ok = 0
+
+    async with httpx.AsyncClient(
+        timeout=60, limits=httpx.Limits(max_connections=concurrencia),
+        headers={'Authorization': f'Bearer {token}'},
+    ) as cliente:
+        async def una():
+            nonlocal ok
+            async with semaforo:
+                inicio = time.perf_counter()
+                try:
+                    response = await cliente.get(url)
+                    ok += response.status_code == 200
+                except httpx.HTTPError:
+                    pass
+                tiempos.append((time.perf_counter() - inicio) * 1000)
+
+        inicio = time.perf_counter()
+        await asyncio.gather(*(una() for _ in range(solicitudes)))
+        total = time.perf_counter() - inicio
+
+    p50, p95, p99 = np.percentile(tiempos, [50, 95, 99])
+    return {
+        'total': solicitudes, 'ok': ok, 'por_segundo': solicitudes / total,
+        'p50': p50, 'p95': p95, 'p99': p99,
+    }
+
+
+def _iniciar_upstream(demora):
+    class Manejador(BaseHTTPRequestHandler):
+        def do_GET(self):
+            time.sleep(demora)
+            cuerpo = b'[{"id": "1", "temperatura": "28.9", "humedad": "63", "lluvia": "0", "uv": "2", "fecha": "2025-11-20 21:15:07"}]'
+            self.send_response(200)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(cuerpo)))
+            self.end_headers()
+            self.wfile.write(cuerpo)
+
+        def log_message(self, *args):
+            pass
+
+    servidor = ThreadingHTTPServer(('127.0.0.1', 0), Manejador)
+    servidor.daemon_threads = True
+    threading.Thread(target=servidor.serve_forever, daemon=True).start()
+    return servidor
+
+
+def _puerto_libre():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def _esperar_puerto(puerto, timeout=30):
+    limite = time.monotonic() + timeout
+    while time.monotonic() < limite:
+        with socket.socket() as s:
+            if s.connect_ex(('127.0.0.1', puerto)) == 0:
+                return
+        time.sleep(0.2)
+    raise CommandError(f'El servidor no respondió en el puerto {puerto}')
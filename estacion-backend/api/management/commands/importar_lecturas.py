@@ -0,0 +1,90 @@
+import csv
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from api.cache_respuestas import incrementar_version
+from api.models import DatosMeteorologicos, ResumenLecturas
+from api.resumenes import actualizar_resumenes
+
+
+class Command(BaseCommand):
+    help = 'Importa el CSV de cultivos a la tabla datos_meteorologicos por lotes'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--archivo', default=str(settings.INGESTA['CSV_CULTIVOS']))
+        parser.add_argument('--lote', type=int, default=settings.INGESTA['TAMANO_LOTE_BD'])
+        parser.add_argument(
+            '--limpiar', action='store_true',
+            help="Elimina antes las lecturas con fuente 'csv' y sus resúmenes"
+        )
+
+    def handle(self, *args, **options):
+        tamano = options['lote']
+        total = 0
+        descartadas = 0
+        existentes = 0
+
+        if options['limpiar']:
+            with transaction.atomic():
+                DatosMeteorologicos.objects.filter(fuente='csv').delete()
+                ResumenLecturas.objects.filter(fuente='csv').delete()
+
+        # Cada lote se confirma por separado: un fallo deja lo importado hasta
+        # ahí y volver a correr el comando no lo duplica
+        try:
+            with open(options['archivo'], newline='', encoding='utf-8') as f:
+                lote = []
+                for fila in csv.DictReader(f):
+                    lectura = DatosMeteorologicos.desde_fila(fila)
+                    if lectura is None:
+                        descartadas += 1
+                        continue
+                    lote.append(lectura)
+                    if len(lote) >= tamano:
+                        guardadas = _guardar(lote)
+                        total += guardadas
+                        existentes += len(lote) - guardadas
+                        lote = []
+                if lote:
+                    guardadas = _guardar(lote)
+                    total += guardadas
+                    existentes += len(lote) - guardadas
+        finally:
+            if total or options['limpiar']:
+                incrementar_version('lecturas')
+
+        self.stdout.write(self.style.SUCCESS(
+            f'✅ {total} lecturas importadas ({existentes} ya guardadas, '
+            f'{descartadas} filas sin fecha válida)'
+        ))
+
+
+def _guardar(lote):
+    """
+    Guarda como fuente 'csv' las lecturas del lote que no estén ya en la
+    base: importadas antes (fuente 'csv') o guardadas por persistir_filas al
+    escribir el CSV, con la fuente que les dio desde_fila ('sensor' si la
+    fila no la trae). Se compara por (fuente, timestamp). Actualiza los
+    resúmenes como la ingesta.
+    """
+    fuentes = {'csv'} | {lectura.fuente for lectura in lote}
+    guardadas = set(
+        DatosMeteorologicos.objects
+        .filter(fuente__in=fuentes, timestamp__in={lectura.timestamp for lectura in lote})
+        .values_list('fuente', 'timestamp')
+    )
+    nuevas = []
+    for lectura in lote:
+        if (lectura.fuente, lectura.timestamp) in guardadas or ('csv', lectura.timestamp) in guardadas:
+            continue
+        # Filas repetidas dentro del mismo lote
+        guardadas.add(('csv', lectura.timestamp))
+        lectura.fuente = 'csv'
+        nuevas.append(lectura)
+
+    with transaction.atomic():
+        DatosMeteorologicos.objects.bulk_create(nuevas)
+        actualizar_resumenes(nuevas)
+    return len(nuevas)
@@ -0,0 +1,27 @@
+from django.core.management.base import BaseCommand
+
+from api.exportaciones import generar
+from api.models import ExportacionCSV
+
+
+class Command(BaseCommand):
+    help = 'Reanuda desde su último bloque las exportaciones CSV interrumpidas'
+
+    def handle(self, *args, **options):
+        pendientes = ExportacionCSV.objects.filter(
+            estado__in=['pendiente', 'en_proceso']
+        ).order_by('creado_en').values_list('id', flat=True)
+
+        reanudadas = 0
+        for exportacion_id in pendientes:
+            # generar() ignora las que otro proceso sigue avanzando
+            exportacion = generar(exportacion_id)
+            if exportacion is None:
+                continue
+            reanudadas += 1
+            self.stdout.write(
+                f'{exportacion.nombre_archivo}: {exportacion.get_estado_display()} '
+                f'({exportacion.cantidad_registros}/{exportacion.total_registros})'
+            )
+
+        self.stdout.write(self.style.SUCCESS(f'✅ {reanudadas} exportaciones reanudadas'))
@@ -0,0 +1,57 @@
+import os
+import time
+
+import numpy as np
+import pandas as pd
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from api.archivos import abrir_para_agregar
+from api.cache_respuestas import incrementar_version
+from api.historico import recalcular_particiones
+from api.ingesta import CAMPOS_CSV, CULTIVOS
+from api.viabilidad import METRICAS_RANGO, es_viable, puntuar
+
+
+class Command(BaseCommand):
+    help = (
+        'Recalcula las columnas de viabilidad de todo el CSV de cultivos y de las '
+        'particiones archivadas con los rangos actuales'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--archivo', default=str(settings.INGESTA['CSV_CULTIVOS']))
+
+    def handle(self, *args, **options):
+        ruta = options['archivo']
+        inicio = time.monotonic()
+
+        # Se bloquea el CSV mientras se reescribe; las escrituras que esperan
+        # detectan el reemplazo y reabren el archivo nuevo
+        with abrir_para_agregar(ruta, newline='', encoding='utf-8'):
+            with open(ruta, encoding='utf-8') as f:
+                tiene_encabezado = f.readline().startswith('date,')
+
+            frame = pd.read_csv(
+                ruta, header=None, names=CAMPOS_CSV, skiprows=1 if tiene_encabezado else 0,
+                dtype=str, keep_default_na=False,
+            )
+            columnas = {
+                metrica: pd.to_numeric(frame[metrica], errors='coerce').to_numpy(np.float64)
+                for metrica in METRICAS_RANGO
+            }
+            for cultivo, puntajes in puntuar(columnas).items():
+                frame[cultivo] = np.where(es_viable(puntajes), 'Si', 'No')
+
+            temporal = f'{ruta}.{os.getpid()}.tmp'
+            frame.to_csv(temporal, index=False)
+            os.replace(temporal, ruta)
+
+            archivadas = recalcular_particiones()
+        incrementar_version('lecturas')
+
+        resumen = ', '.join(f"{cultivo}: {int((frame[cultivo] == 'Si').sum())}" for cultivo in CULTIVOS)
+        self.stdout.write(self.style.SUCCESS(
+            f'✅ {len(frame)} lecturas recalculadas en {time.monotonic() - inicio:.2f} s ({resumen}); '
+            f'{archivadas} lecturas archivadas recalculadas'
+        ))
@@ -0,0 +1,30 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from api.ingesta import METRICAS
+from api.models import DatosMeteorologicos, ResumenLecturas
+from api.resumenes import acumular, construir_resumenes
+
+
+class Command(BaseCommand):
+    help = 'Reconstruye desde cero los resúmenes por hora y por día'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--lote', type=int, default=5000)
+
+    def handle(self, *args, **options):
+        tamano = options['lote']
+        lecturas = (
+            DatosMeteorologicos.objects
+            .order_by()
+            .only('timestamp', 'fuente', *METRICAS)
+            .iterator(chunk_size=tamano)
+        )
+        acumulado = acumular(lecturas)
+        resumenes = construir_resumenes(acumulado)
+
+        with transaction.atomic():
+            ResumenLecturas.objects.all().delete()
+            ResumenLecturas.objects.bulk_create(resumenes, batch_size=tamano)
+
+        self.stdout.write(self.style.SUCCESS(f'✅ {len(resumenes)} resúmenes reconstruidos'))
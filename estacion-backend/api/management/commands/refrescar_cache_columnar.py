@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand
+
+from api.cache_columnar import get_cache
+
+
+class Command(BaseCommand):
+    help = 'Agrega a la cache columnar las filas nuevas del CSV de cultivos'
+
+    def handle(self, *args, **options):
+        meta = get_cache().refrescar()
+        self.stdout.write(self.style.SUCCESS(
+            f"✅ Cache columnar con {meta['filas']} filas (offset {meta['offset']})"
+        ))
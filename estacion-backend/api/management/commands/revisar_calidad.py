@@ -0,0 +1,51 @@
+import signal
+import threading
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+from django.utils import timezone
+
+from api.calidad import revisar_ventana
+
+
+class Command(BaseCommand):
+    help = (
+        'Busca periódicamente picos, sensores planos y huecos en las lecturas '
+        'recientes y pone en cuarentena los valores detectados'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--horas', type=int, help='Ventana revisada (por defecto CALIDAD_VENTANA_HORAS)')
+        parser.add_argument('--fuente', help='Revisar una sola fuente')
+        parser.add_argument('--una-vez', action='store_true', help='Revisa una sola vez y termina')
+
+    def handle(self, *args, **options):
+        horas = options['horas'] or settings.CALIDAD['VENTANA_HORAS']
+
+        if options['una_vez']:
+            self._revisar(horas, options['fuente'])
+            return
+
+        detener = threading.Event()
+        for senal in (signal.SIGINT, signal.SIGTERM):
+            signal.signal(senal, lambda *args: detener.set())
+
+        self.stdout.write(f'🔄 Revisando las últimas {horas} h cada {settings.CALIDAD["INTERVALO"]} s')
+        while not detener.is_set():
+            close_old_connections()
+            try:
+                self._revisar(horas, options['fuente'])
+            except Exception as e:
+                self.stderr.write(self.style.ERROR(f'❌ Error revisando calidad: {str(e)}'))
+            detener.wait(settings.CALIDAD['INTERVALO'])
+        self.stdout.write(self.style.SUCCESS('✅ Revisión de calidad detenida'))
+
+    def _revisar(self, horas, fuente):
+        resultado = revisar_ventana(timezone.now() - timedelta(hours=horas), fuente=fuente)
+        banderas = ', '.join(f'{nombre}: {cantidad}' for nombre, cantidad in sorted(resultado['banderas'].items()))
+        self.stdout.write(self.style.SUCCESS(
+            f"✅ {resultado['lecturas']} lecturas revisadas, {resultado['marcadas']} marcadas"
+            + (f' ({banderas})' if banderas else '')
+        ))
@@ -0,0 +1,34 @@
+import signal
+import threading
+
+from django.core.management.base import BaseCommand
+
+from api.sincronizacion import ErrorSincronizacion, SincronizadorClima
+
+
+class Command(BaseCommand):
+    help = 'Sincroniza periódicamente las lecturas de la API externa de clima'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--url', help='URL de la API externa (por defecto API_EXTERNA_URL)')
+        parser.add_argument('--una-vez', action='store_true', help='Sincroniza una sola vez y termina')
+
+    def handle(self, *args, **options):
+        sincronizador = SincronizadorClima(url=options['url'])
+
+        if options['una_vez']:
+            try:
+                nuevas = sincronizador.sincronizar()
+            except ErrorSincronizacion as e:
+                self.stderr.write(self.style.ERROR(f'❌ {str(e)}'))
+                return
+            self.stdout.write(self.style.SUCCESS(f'✅ {nuevas} lecturas nuevas'))
+            return
+
+        detener = threading.Event()
+        for senal in (signal.SIGINT, signal.SIGTERM):
+            signal.signal(senal, lambda *args: detener.set())
+
+        self.stdout.write(f'🔄 Sincronizando {sincronizador.url}')
+        sincronizador.ejecutar(detener)
+        self.stdout.write(self.style.SUCCESS('✅ Sincronización detenida'))
@@ -0,0 +1,316 @@
+"""
+Métricas por ruta del proceso actual (formato de texto de Prometheus)
+
+MetricasMiddleware mide cada request: latencia (histograma), consultas SQL
+y su tiempo, y bytes de la respuesta, agrupados por método + patrón de la
+ruta (p. ej. "api/lecturas/<pk>/") y clase de estado (2xx, 4xx...).
+
+Las consultas se cuentan con un execute_wrapper que se instala en cada
+conexión al crearse; la medición activa viaja en un ContextVar, así
+también se cuentan las consultas de las vistas asíncronas que pasan por
+sync_to_async.
+
+Los agregados son por proceso: con varios workers cada uno expone los
+suyos (Prometheus los suma por instancia).
+"""
+import cProfile
+import contextvars
+import os
+import random
+import re
+import threading
+import time
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.utils import timezone
+
+
+# Límites superiores de los histogramas
+LIMITES_LATENCIA = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+LIMITES_CONSULTAS = (0, 1, 2, 5, 10, 20, 50, 100)
+
+
+class Medicion:
+    """Consultas SQL de un request en curso"""
+    __slots__ = ('consultas', 'tiempo_consultas')
+
+    def __init__(self):
+        self.consultas = 0
+        self.tiempo_consultas = 0.0
+
+
+_medicion_actual = contextvars.ContextVar('medicion_actual', default=None)
+
+
+def contar_consulta(execute, sql, params, many, context):
+    """execute_wrapper: suma la consulta a la medición del request actual"""
+    medicion = _medicion_actual.get()
+    if medicion is None:
+        return execute(sql, params, many, context)
+    inicio = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        medicion.consultas += 1
+        medicion.tiempo_consultas += time.perf_counter() - inicio
+
+
+def instalar_en_conexion(sender, connection, **kwargs):
+    """Receptor de connection_created"""
+    if contar_consulta not in connection.execute_wrappers:
+        connection.execute_wrappers.append(contar_consulta)
+
+
+class Histograma:
+    __slots__ = ('limites', 'cubetas', 'suma', 'cantidad')
+
+    def __init__(self, limites):
+        self.limites = limites
+        self.cubetas = [0] * len(limites)
+        self.suma = 0.0
+        self.cantidad = 0
+
+    def observar(self, valor):
+        for i, limite in enumerate(self.limites):
+            if valor <= limite:
+                self.cubetas[i] += 1
+                break
+        self.suma += valor
+        self.cantidad += 1
+
+    def acumuladas(self):
+        total = 0
+        for limite, cantidad in zip(self.limites, self.cubetas):
+            total += cantidad
+            yield limite, total
+
+
+class RegistroMetricas:
+    """Agregados por (método, ruta, estado), thread-safe"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._series = {}
+        self._excepciones = {}
+        self._inicio = time.time()
+
+    def registrar(self, metodo, ruta, estado, duracion, medicion, bytes_respuesta):
+        clave = (metodo, ruta, f'{estado // 100}xx')
+        with self._lock:
+            serie = self._series.get(clave)
+            if serie is None:
+                serie = self._series[clave] = {
+                    'latencia': Histograma(LIMITES_LATENCIA),
+                    'consultas': Histograma(LIMITES_CONSULTAS),
+                    'tiempo_consultas': 0.0,
+                    'bytes': 0,
+                }
+            serie['latencia'].observar(duracion)
+            serie['consultas'].observar(medicion.consultas)
+            serie['tiempo_consultas'] += medicion.tiempo_consultas
+            serie['bytes'] += bytes_respuesta
+
+    def registrar_excepcion(self, metodo, ruta, nombre):
+        clave = (metodo, ruta, nombre)
+        with self._lock:
+            self._excepciones[clave] = self._excepciones.get(clave, 0) + 1
+
+    def reiniciar(self):
+        with self._lock:
+            self._series.clear()
+            self._excepciones.clear()
+
+    def texto_prometheus(self):
+        """Exposición en formato de texto de Prometheus 0.0.4"""
+        with self._lock:
+            series = sorted(self._series.items())
+            excepciones = sorted(self._excepciones.items())
+
+        lineas = [
+            '# HELP api_inicio_proceso_segundos Inicio del proceso (epoch)',
+            '# TYPE api_inicio_proceso_segundos gauge',
+            f'api_inicio_proceso_segundos {self._inicio:.3f}',
+            '# HELP api_request_duracion_segundos Latencia de los requests por ruta',
+            '# TYPE api_request_duracion_segundos histogram',
+        ]
+        for (metodo, ruta, estado), serie in series:
+            etiquetas = _etiquetas(metodo=metodo, ruta=ruta, estado=estado)
+            lineas.extend(_histograma('api_request_duracion_segundos', etiquetas, serie['latencia']))
+
+        lineas += [
+            '# HELP api_request_consultas Consultas SQL por request',
+            '# TYPE api_request_consultas histogram',
+        ]
+        for (metodo, ruta, estado), serie in series:
+            etiquetas = _etiquetas(metodo=metodo, ruta=ruta, estado=estado)
+            lineas.extend(_histograma('api_request_consultas', etiquetas, serie['consultas']))
+
+        lineas += [
+            '# HELP api_consultas_segundos_total Tiempo total en consultas SQL',
+            '# TYPE api_consultas_segundos_total counter',
+        ]
+        for (metodo, ruta, estado), serie in series:
+            etiquetas = _etiquetas(metodo=metodo, ruta=ruta, estado=estado)
+            lineas.append(f"api_consultas_segundos_total{{{etiquetas}}} {serie['tiempo_consultas']:.6f}")
+
+        lineas += [
+            '# HELP api_respuesta_bytes_total Bytes enviados en respuestas no streaming',
+            '# TYPE api_respuesta_bytes_total counter',
+        ]
+        for (metodo, ruta, estado), serie in series:
+            etiquetas = _etiquetas(metodo=metodo, ruta=ruta, estado=estado)
+            lineas.append(f"api_respuesta_bytes_total{{{etiquetas}}} {serie['bytes']}")
+
+        lineas += [
+            '# HELP api_excepciones_total Excepciones no manejadas por las vistas',
+            '# TYPE api_excepciones_total counter',
+        ]
+        for (metodo, ruta, nombre), cantidad in excepciones:
+            lineas.append(f'api_excepciones_total{{{_etiquetas(metodo=metodo, ruta=ruta, excepcion=nombre)}}} {cantidad}')
+
+        return '\n'.join(lineas) + '\n'
+
+
+def _escapar(valor):
+    return str(valor).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _etiquetas(**valores):
+    return ','.join(f'{nombre}="{_escapar(valor)}"' for nombre, valor in valores.items())
+
+
+def _histograma(nombre, etiquetas, histograma):
+    for limite, acumulado in histograma.acumuladas():
+        yield f'{nombre}_bucket{{{etiquetas},le="{limite}"}} {acumulado}'
+    yield f'{nombre}_bucket{{{etiquetas},le="+Inf"}} {histograma.cantidad}'
+    yield f'{nombre}_sum{{{etiquetas}}} {histograma.suma:.6f}'
+    yield f'{nombre}_count{{{etiquetas}}} {histograma.cantidad}'
+
+
+registro = RegistroMetricas()
+
+
+def ruta_de(request):
+    """Patrón de la ruta resuelta; evita una serie por cada id o token"""
+    coincidencia = getattr(request, 'resolver_match', None)
+    if coincidencia is None:
+        return 'sin_ruta'
+    return coincidencia.route or coincidencia.view_name or 'sin_ruta'
+
+
+def _bytes_respuesta(response):
+    if getattr(response, 'streaming', False):
+        return 0
+    return len(response.content)
+
+
+# ----------------------------------------------------------------------
+# Perfilado con cProfile
+# ----------------------------------------------------------------------
+
+def debe_perfilar(request):
+    """
+    Solo con el header X-Perfilar, según METRICAS['PERFIL_MUESTREO'] y si
+    el token JWT es de un administrativo. El token se verifica aquí, antes
+    de activar cProfile: la autenticación de DRF ocurre dentro de la vista.
+    """
+    configuracion = settings.METRICAS
+    if not configuracion['PERFILADO'] or 'HTTP_X_PERFILAR' not in request.META:
+        return False
+    if random.random() >= configuracion['PERFIL_MUESTREO']:
+        return False
+    return _es_administrativo(request)
+
+
+def _es_administrativo(request):
+    from rest_framework.exceptions import APIException
+
+    from .authentication import JWTRolAuthentication
+    from .roles import get_user_rol
+
+    try:
+        resultado = JWTRolAuthentication().authenticate(request)
+    except APIException:
+        return False
+    return resultado is not None and get_user_rol(resultado[0]) == 'administrativo'
+
+
+def guardar_perfil(perfil, request, response):
+    """Guarda el perfil (.prof, para pstats/snakeviz) del request"""
+    directorio = settings.METRICAS['PERFILES_DIR']
+    os.makedirs(directorio, exist_ok=True)
+    coincidencia = getattr(request, 'resolver_match', None)
+    vista = re.sub(r'\W+', '_', coincidencia.view_name if coincidencia else '') or 'sin_ruta'
+    nombre = f'{timezone.now():%Y%m%d_%H%M%S_%f}_{request.method.lower()}_{vista}.prof'
+    perfil.dump_stats(os.path.join(directorio, nombre))
+    response['X-Perfil'] = nombre
+    return nombre
+
+
+class MetricasMiddleware:
+    """
+    Registra latencia, consultas SQL y tamaño de respuesta de cada request.
+
+    Con el header X-Perfilar un administrativo obtiene un perfil cProfile
+    del request (header de respuesta X-Perfil con el archivo generado en
+    METRICAS['PERFILES_DIR']). El perfilado solo aplica en modo WSGI: en
+    ASGI la vista corre en otro hilo y cProfile no la vería.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.es_async = iscoroutinefunction(get_response)
+        if self.es_async:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.es_async:
+            return self.__acall__(request)
+        medicion = Medicion()
+        token = _medicion_actual.set(medicion)
+        perfil = cProfile.Profile() if debe_perfilar(request) else None
+        inicio = time.perf_counter()
+        try:
+            if perfil is not None:
+                perfil.enable()
+            try:
+                response = self.get_response(request)
+            finally:
+                if perfil is not None:
+                    perfil.disable()
+        finally:
+            _medicion_actual.reset(token)
+        duracion = time.perf_counter() - inicio
+
+        if perfil is not None:
+            try:
+                guardar_perfil(perfil, request, response)
+            except Exception as e:
+                print(f"Error guardando perfil: {str(e)}")
+        registro.registrar(
+            request.method, ruta_de(request), response.status_code,
+            duracion, medicion, _bytes_respuesta(response),
+        )
+        return response
+
+    async def __acall__(self, request):
+        medicion = Medicion()
+        token = _medicion_actual.set(medicion)
+        inicio = time.perf_counter()
+        try:
+            response = await self.get_response(request)
+        finally:
+            _medicion_actual.reset(token)
+        # En streaming (SSE, exportaciones) mide hasta el inicio de la respuesta
+        registro.registrar(
+            request.method, ruta_de(request), response.status_code,
+            time.perf_counter() - inicio, medicion, _bytes_respuesta(response),
+        )
+        return response
+
+    def process_exception(self, request, exception):
+        registro.registrar_excepcion(request.method, ruta_de(request), type(exception).__name__)
+        return None
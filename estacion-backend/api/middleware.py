@@ -0,0 +1,29 @@
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.utils.functional import SimpleLazyObject
+
+from .roles import get_user_rol
+
+
+class RolMiddleware:
+    """
+    Agrega request.rol, resuelto una sola vez por request.
+
+    Se evalúa de forma perezosa: la autenticación JWT de DRF ocurre dentro
+    de la vista, así que el rol se calcula la primera vez que la vista lo
+    usa, con el usuario ya autenticado.
+
+    Funciona en modo WSGI y ASGI sin pasar por un hilo extra; las vistas
+    asíncronas deben evaluar request.rol con sync_to_async.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        request.rol = SimpleLazyObject(lambda: get_user_rol(request.user))
+        # En modo ASGI get_response retorna una corrutina que espera Django
+        return self.get_response(request)
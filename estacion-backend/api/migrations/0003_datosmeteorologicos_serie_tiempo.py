@@ -0,0 +1,37 @@
+# Generated by Django 4.2.7 on 2026-10-18 02:23
+
+import django.core.validators
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0002_delete_configuracionsistema_and_more'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DatosMeteorologicos',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('temperatura', models.FloatField(blank=True, help_text='Temperatura en °C', null=True, validators=[django.core.validators.MinValueValidator(-50), django.core.validators.MaxValueValidator(60)])),
+                ('humedad', models.FloatField(blank=True, help_text='Humedad relativa en %', null=True, validators=[django.core.validators.MinValueValidator(0), django.core.validators.MaxValueValidator(100)])),
+                ('humedad_suelo', models.FloatField(blank=True, help_text='Humedad del suelo en %', null=True, validators=[django.core.validators.MinValueValidator(0), django.core.validators.MaxValueValidator(100)])),
+                ('radiacion_solar', models.FloatField(blank=True, help_text='Radiación solar en W/m²', null=True, validators=[django.core.validators.MinValueValidator(0)])),
+                ('precipitacion', models.FloatField(blank=True, help_text='Precipitación en mm', null=True)),
+                ('presion', models.FloatField(blank=True, help_text='Presión atmosférica en hPa', null=True)),
+                ('velocidad_viento', models.FloatField(blank=True, help_text='Velocidad del viento en m/s', null=True)),
+                ('timestamp', models.DateTimeField(help_text='Fecha y hora del dato')),
+                ('fuente', models.CharField(choices=[('api_externa', 'API Externa'), ('csv', 'CSV Importado'), ('sensor', 'Sensor IoT'), ('manual', 'Entrada Manual')], default='sensor', help_text='Origen del dato meteorológico', max_length=50)),
+                ('creado_en', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'verbose_name': 'Datos Meteorológicos',
+                'verbose_name_plural': 'Datos Meteorológicos',
+                'db_table': 'datos_meteorologicos',
+                'ordering': ['-timestamp'],
+                'indexes': [models.Index(fields=['-timestamp'], name='datos_meteo_timesta_5a1a7a_idx'), models.Index(fields=['fuente', 'timestamp'], name='datos_meteo_fuente_ts_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,53 @@
+# Generated by Django 4.2.7 on 2026-10-18 02:24
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0003_datosmeteorologicos_serie_tiempo'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ResumenLecturas',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('granularidad', models.CharField(choices=[('hora', 'Hora'), ('dia', 'Día')], max_length=4)),
+                ('fuente', models.CharField(choices=[('api_externa', 'API Externa'), ('csv', 'CSV Importado'), ('sensor', 'Sensor IoT'), ('manual', 'Entrada Manual')], max_length=50)),
+                ('periodo', models.DateTimeField(help_text='Inicio de la hora o del día (hora local)')),
+                ('temperatura_min', models.FloatField(null=True)),
+                ('temperatura_max', models.FloatField(null=True)),
+                ('temperatura_suma', models.FloatField(default=0)),
+                ('temperatura_cantidad', models.IntegerField(default=0)),
+                ('humedad_min', models.FloatField(null=True)),
+                ('humedad_max', models.FloatField(null=True)),
+                ('humedad_suma', models.FloatField(default=0)),
+                ('humedad_cantidad', models.IntegerField(default=0)),
+                ('humedad_suelo_min', models.FloatField(null=True)),
+                ('humedad_suelo_max', models.FloatField(null=True)),
+                ('humedad_suelo_suma', models.FloatField(default=0)),
+                ('humedad_suelo_cantidad', models.IntegerField(default=0)),
+                ('radiacion_solar_min', models.FloatField(null=True)),
+                ('radiacion_solar_max', models.FloatField(null=True)),
+                ('radiacion_solar_suma', models.FloatField(default=0)),
+                ('radiacion_solar_cantidad', models.IntegerField(default=0)),
+                ('precipitacion_min', models.FloatField(null=True)),
+                ('precipitacion_max', models.FloatField(null=True)),
+                ('precipitacion_suma', models.FloatField(default=0)),
+                ('precipitacion_cantidad', models.IntegerField(default=0)),
+                ('lecturas', models.IntegerField(default=0, help_text='Lecturas incluidas en el periodo')),
+            ],
+            options={
+                'verbose_name': 'Resumen de Lecturas',
+                'verbose_name_plural': 'Resúmenes de Lecturas',
+                'db_table': 'resumenes_lecturas',
+                'ordering': ['periodo'],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='resumenlecturas',
+            constraint=models.UniqueConstraint(fields=('granularidad', 'fuente', 'periodo'), name='resumen_granularidad_fuente_periodo_uniq'),
+        ),
+    ]
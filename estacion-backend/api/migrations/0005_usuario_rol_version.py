@@ -0,0 +1,18 @@
+# Generated by Django 4.2.7 on 2026-10-18 02:28
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0004_resumenes_lecturas'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='usuario',
+            name='rol_version',
+            field=models.PositiveIntegerField(default=1, help_text='Aumenta con cada cambio de rol; invalida los tokens emitidos antes'),
+        ),
+    ]
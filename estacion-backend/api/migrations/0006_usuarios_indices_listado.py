@@ -0,0 +1,33 @@
+# Generated by Django 4.2.7 on 2026-10-18 02:28
+
+from django.db import migrations, models
+
+
+INDICE_FIRST_NAME = models.Index(fields=['first_name'], name='auth_user_first_name_idx')
+
+
+def crear_indice_first_name(apps, schema_editor):
+    User = apps.get_model('auth', 'User')
+    schema_editor.add_index(User, INDICE_FIRST_NAME)
+
+
+def eliminar_indice_first_name(apps, schema_editor):
+    User = apps.get_model('auth', 'User')
+    schema_editor.remove_index(User, INDICE_FIRST_NAME)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auth', '0012_alter_user_first_name_max_length'),
+        ('api', '0005_usuario_rol_version'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='usuario',
+            index=models.Index(fields=['rol', '-created_at'], name='usuarios_rol_created_idx'),
+        ),
+        # Búsqueda por prefijo de nombre en el listado de usuarios
+        migrations.RunPython(crear_indice_first_name, eliminar_indice_first_name),
+    ]
@@ -0,0 +1,29 @@
+# Generated by Django 4.2.7 on 2026-10-18 02:35
+
+from django.db import migrations, models
+
+
+INDICE_EMAIL = models.Index(fields=['email'], name='auth_user_email_idx')
+
+
+def crear_indice_email(apps, schema_editor):
+    User = apps.get_model('auth', 'User')
+    schema_editor.add_index(User, INDICE_EMAIL)
+
+
+def eliminar_indice_email(apps, schema_editor):
+    User = apps.get_model('auth', 'User')
+    schema_editor.remove_index(User, INDICE_EMAIL)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auth', '0012_alter_user_first_name_max_length'),
+        ('api', '0006_usuarios_indices_listado'),
+    ]
+
+    operations = [
+        # Login por email sin recorrer toda la tabla auth_user
+        migrations.RunPython(crear_indice_email, eliminar_indice_email),
+    ]
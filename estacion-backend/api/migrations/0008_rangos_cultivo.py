@@ -0,0 +1,35 @@
+# Generated by Django 4.2.7 on 2026-10-18 02:31
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0007_auth_user_email_indice'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RangoCultivo',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('cultivo', models.CharField(choices=[('tomate', 'Tomate'), ('banana', 'Banana'), ('cacao', 'Cacao'), ('arroz', 'Arroz'), ('maiz', 'Maíz')], max_length=20, unique=True)),
+                ('temperatura_min', models.FloatField(help_text='Temperatura mínima óptima en °C')),
+                ('temperatura_max', models.FloatField(help_text='Temperatura máxima óptima en °C')),
+                ('humedad_min', models.FloatField(help_text='Humedad mínima óptima en %')),
+                ('humedad_max', models.FloatField(help_text='Humedad máxima óptima en %')),
+                ('humedad_suelo_min', models.FloatField(help_text='Humedad suelo mínima óptima en %')),
+                ('humedad_suelo_max', models.FloatField(help_text='Humedad suelo máxima óptima en %')),
+                ('radiacion_solar_min', models.FloatField(help_text='Radiación solar mínima óptima en W/m²')),
+                ('radiacion_solar_max', models.FloatField(help_text='Radiación solar máxima óptima en W/m²')),
+                ('actualizado_en', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'verbose_name': 'Rango de Cultivo',
+                'verbose_name_plural': 'Rangos de Cultivo',
+                'db_table': 'rangos_cultivo',
+                'ordering': ['cultivo'],
+            },
+        ),
+    ]
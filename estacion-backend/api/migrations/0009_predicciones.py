@@ -0,0 +1,35 @@
+# Generated by Django 4.2.7 on 2026-10-18 02:34
+
+import django.core.validators
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0008_rangos_cultivo'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Prediccion',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('cultivo', models.CharField(help_text='Tipo de cultivo para la predicción', max_length=100)),
+                ('viabilidad', models.FloatField(help_text='Viabilidad del cultivo en %', validators=[django.core.validators.MinValueValidator(0), django.core.validators.MaxValueValidator(100)])),
+                ('confianza', models.FloatField(help_text='Confianza de la predicción en %', validators=[django.core.validators.MinValueValidator(0), django.core.validators.MaxValueValidator(100)])),
+                ('modelo_version', models.CharField(default='1.0', help_text='Versión del modelo ML utilizado', max_length=50)),
+                ('clave_entrada', models.CharField(help_text='Hash de la ventana de entrada', max_length=40)),
+                ('generado_en', models.DateTimeField(auto_now_add=True)),
+                ('datos', models.ForeignKey(blank=True, help_text='Última lectura de la ventana usada', null=True, on_delete=django.db.models.deletion.SET_NULL, to='api.datosmeteorologicos')),
+            ],
+            options={
+                'verbose_name': 'Predicción',
+                'verbose_name_plural': 'Predicciones',
+                'db_table': 'predicciones',
+                'ordering': ['-generado_en'],
+                'indexes': [models.Index(fields=['clave_entrada', 'modelo_version'], name='predicciones_clave_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,27 @@
+# Generated by Django 4.2.7 on 2026-10-18 02:35
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0009_predicciones'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='datosmeteorologicos',
+            name='id_externo',
+            field=models.CharField(blank=True, help_text='Identificador del registro en la API externa', max_length=64, null=True),
+        ),
+        migrations.AddField(
+            model_name='datosmeteorologicos',
+            name='indice_uv',
+            field=models.FloatField(blank=True, help_text='Índice UV', null=True),
+        ),
+        migrations.AddConstraint(
+            model_name='datosmeteorologicos',
+            constraint=models.UniqueConstraint(fields=('fuente', 'id_externo'), name='datos_meteo_id_externo_uniq'),
+        ),
+    ]
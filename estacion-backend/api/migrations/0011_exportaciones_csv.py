@@ -0,0 +1,48 @@
+# Generated by Django 4.2.7 on 2026-10-18 02:44
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+import django.utils.timezone
+import uuid
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('api', '0010_datosmeteorologicos_id_externo'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ExportacionCSV',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('nombre_archivo', models.CharField(help_text='Nombre del archivo CSV exportado', max_length=255)),
+                ('ruta', models.CharField(help_text='Ruta donde se guardó el archivo', max_length=500)),
+                ('estado', models.CharField(choices=[('pendiente', 'Pendiente'), ('en_proceso', 'En proceso'), ('completado', 'Completado'), ('error', 'Error')], default='pendiente', max_length=20)),
+                ('filtros', models.JSONField(default=dict, help_text='Filtros de la exportación (query string normalizada)')),
+                ('clave', models.CharField(db_index=True, help_text='Hash de los filtros', max_length=40)),
+                ('fecha_inicio', models.DateTimeField(blank=True, help_text='Fecha inicio de los datos exportados', null=True)),
+                ('fecha_fin', models.DateTimeField(blank=True, help_text='Fecha fin de los datos exportados', null=True)),
+                ('id_maximo', models.BigIntegerField(default=0)),
+                ('total_registros', models.IntegerField(default=0)),
+                ('cantidad_registros', models.IntegerField(default=0, help_text='Número de registros en el CSV')),
+                ('bytes_escritos', models.BigIntegerField(default=0)),
+                ('ultimo_timestamp', models.DateTimeField(blank=True, null=True)),
+                ('ultimo_id', models.BigIntegerField(blank=True, null=True)),
+                ('error', models.TextField(blank=True)),
+                ('creado_en', models.DateTimeField(auto_now_add=True)),
+                ('actualizado_en', models.DateTimeField(default=django.utils.timezone.now)),
+                ('completado_en', models.DateTimeField(blank=True, null=True)),
+                ('creado_por', models.ForeignKey(blank=True, help_text='Usuario que realizó la exportación', null=True, on_delete=django.db.models.deletion.SET_NULL, to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'Exportación CSV',
+                'verbose_name_plural': 'Exportaciones CSV',
+                'db_table': 'exportaciones_csv',
+                'ordering': ['-creado_en'],
+            },
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 4.2.7 on 2026-10-18 02:57
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0011_exportaciones_csv'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='datosmeteorologicos',
+            name='calidad',
+            field=models.PositiveSmallIntegerField(default=0, help_text='Banderas del control de calidad (api/calidad.py); 0 = sin observaciones'),
+        ),
+    ]
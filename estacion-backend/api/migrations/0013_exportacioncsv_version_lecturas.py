@@ -0,0 +1,18 @@
+# Generated by Django 4.2.7 on 2026-10-18 03:15
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0012_datosmeteorologicos_calidad'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='exportacioncsv',
+            name='version_lecturas',
+            field=models.PositiveIntegerField(default=0, help_text="Versión de datos 'lecturas' al iniciar (cambios en el lugar)"),
+        ),
+    ]
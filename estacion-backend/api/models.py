@@ -1,5 +1,11 @@
+import uuid
+from datetime import datetime, time, timedelta
+
 from django.db import models
 from django.contrib.auth.models import User
+from django.core.validators import MinValueValidator, MaxValueValidator
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
 
 
 class Usuario(models.Model):
@@ -12,6 +18,7 @@ class Usuario(models.Model):
         ('profesor', 'Profesor'),
         ('administrativo', 'Administrativo'),
     )
+    ROLES_DISPLAY = dict(ROLES)
     
     user = models.OneToOneField(
         User, 
@@ -25,6 +32,10 @@ class Usuario(models.Model):
         default='estudiante',
         help_text='Rol del usuario en el sistema'
     )
+    rol_version = models.PositiveIntegerField(
+        default=1,
+        help_text='Aumenta con cada cambio de rol; invalida los tokens emitidos antes'
+    )
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     
@@ -33,10 +44,358 @@ class Usuario(models.Model):
         ordering = ['-created_at']
         verbose_name = 'Usuario'
         verbose_name_plural = 'Usuarios'
+        indexes = [
+            models.Index(fields=['rol', '-created_at'], name='usuarios_rol_created_idx'),
+        ]
     
     def __str__(self):
         return f"{self.user.get_full_name() or self.user.username} ({self.get_rol_display()})"
     
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._rol_original = instance.__dict__.get('rol')
+        return instance
+    
+    def save(self, *args, **kwargs):
+        rol_original = getattr(self, '_rol_original', None)
+        if self.pk and rol_original is not None and rol_original != self.rol:
+            self.rol_version += 1
+            if kwargs.get('update_fields') is not None:
+                kwargs['update_fields'] = set(kwargs['update_fields']) | {'rol_version'}
+        super().save(*args, **kwargs)
+        self._rol_original = self.rol
+    
     def get_rol_display(self):
         """Retorna el rol con capitalización"""
-        return dict(self.ROLES).get(self.rol, self.rol)
\ No newline at end of file
+        return self.ROLES_DISPLAY.get(self.rol, self.rol)
+
+class LecturaQuerySet(models.QuerySet):
+    """Consultas por rango de tiempo servidas desde el índice (fuente, timestamp)"""
+
+    def rango(self, desde=None, hasta=None, fuente=None):
+        qs = self
+        if fuente:
+            qs = qs.filter(fuente=fuente)
+        if desde:
+            qs = qs.filter(timestamp__gte=desde)
+        if hasta:
+            qs = qs.filter(timestamp__lt=hasta)
+        return qs
+
+    def ultimas_horas(self, horas, fuente=None):
+        """Lecturas de las últimas N horas, opcionalmente de una sola fuente"""
+        desde = timezone.now() - timedelta(hours=horas)
+        return self.rango(desde=desde, fuente=fuente).order_by('-timestamp')
+
+
+class DatosMeteorologicos(models.Model):
+    """
+    Lecturas de la estación como serie de tiempo
+    Se llenan por lotes desde la ingesta del CSV de cultivos
+    """
+    FUENTES = (
+        ('api_externa', 'API Externa'),
+        ('csv', 'CSV Importado'),
+        ('sensor', 'Sensor IoT'),
+        ('manual', 'Entrada Manual'),
+    )
+
+    temperatura = models.FloatField(
+        null=True, blank=True,
+        validators=[MinValueValidator(-50), MaxValueValidator(60)],
+        help_text='Temperatura en °C'
+    )
+    humedad = models.FloatField(
+        null=True, blank=True,
+        validators=[MinValueValidator(0), MaxValueValidator(100)],
+        help_text='Humedad relativa en %'
+    )
+    humedad_suelo = models.FloatField(
+        null=True, blank=True,
+        validators=[MinValueValidator(0), MaxValueValidator(100)],
+        help_text='Humedad del suelo en %'
+    )
+    radiacion_solar = models.FloatField(
+        null=True, blank=True,
+        validators=[MinValueValidator(0)],
+        help_text='Radiación solar en W/m²'
+    )
+    precipitacion = models.FloatField(null=True, blank=True, help_text='Precipitación en mm')
+    presion = models.FloatField(null=True, blank=True, help_text='Presión atmosférica en hPa')
+    velocidad_viento = models.FloatField(null=True, blank=True, help_text='Velocidad del viento en m/s')
+    indice_uv = models.FloatField(null=True, blank=True, help_text='Índice UV')
+    timestamp = models.DateTimeField(help_text='Fecha y hora del dato')
+    fuente = models.CharField(
+        max_length=50,
+        choices=FUENTES,
+        default='sensor',
+        help_text='Origen del dato meteorológico'
+    )
+    id_externo = models.CharField(
+        max_length=64,
+        null=True, blank=True,
+        help_text='Identificador del registro en la API externa'
+    )
+    calidad = models.PositiveSmallIntegerField(
+        default=0,
+        help_text='Banderas del control de calidad (api/calidad.py); 0 = sin observaciones'
+    )
+    creado_en = models.DateTimeField(auto_now_add=True)
+
+    objects = LecturaQuerySet.as_manager()
+
+    class Meta:
+        db_table = 'datos_meteorologicos'
+        ordering = ['-timestamp']
+        verbose_name = 'Datos Meteorológicos'
+        verbose_name_plural = 'Datos Meteorológicos'
+        indexes = [
+            models.Index(fields=['-timestamp'], name='datos_meteo_timesta_5a1a7a_idx'),
+            models.Index(fields=['fuente', 'timestamp'], name='datos_meteo_fuente_ts_idx'),
+        ]
+        constraints = [
+            models.UniqueConstraint(fields=['fuente', 'id_externo'], name='datos_meteo_id_externo_uniq'),
+        ]
+
+    def __str__(self):
+        return f"{timezone.localtime(self.timestamp):%Y-%m-%d %H:%M} ({self.fuente})"
+
+    @classmethod
+    def desde_fila(cls, fila):
+        """
+        Construye una lectura (sin guardar) desde una fila del CSV de cultivos.
+        Retorna None si la fila no tiene una fecha válida.
+        """
+        timestamp = parsear_fecha(fila.get('date'))
+        if timestamp is None:
+            return None
+
+        fuente = fila.get('fuente')
+        if fuente not in dict(cls.FUENTES):
+            fuente = 'sensor'
+
+        return cls(
+            temperatura=parsear_numero(fila.get('temperatura')),
+            humedad=parsear_numero(fila.get('humedad')),
+            humedad_suelo=parsear_numero(fila.get('humedad_suelo')),
+            radiacion_solar=parsear_numero(fila.get('radiacion_solar')),
+            precipitacion=parsear_numero(fila.get('precipitacion')),
+            timestamp=timestamp,
+            fuente=fuente,
+            calidad=fila.get('calidad') or 0,
+        )
+
+
+def parsear_fecha(valor):
+    """Convierte 'YYYY-MM-DD[ HH:MM[:SS]]' en datetime con zona horaria"""
+    if not valor:
+        return None
+    valor = str(valor).strip()
+    fecha = parse_datetime(valor)
+    if fecha is None:
+        dia = parse_date(valor)
+        if dia is None:
+            return None
+        fecha = datetime.combine(dia, time.min)
+    if timezone.is_naive(fecha):
+        fecha = timezone.make_aware(fecha)
+    return fecha
+
+
+def parsear_numero(valor):
+    """Convierte un valor del CSV en float (None si está vacío o no es numérico)"""
+    if valor in (None, ''):
+        return None
+    try:
+        return float(valor)
+    except (TypeError, ValueError):
+        return None
+
+
+class ResumenLecturas(models.Model):
+    """
+    Resumen por hora o por día de las lecturas de una fuente
+    Guarda min/max/suma/cantidad por métrica; se actualiza en cada lote
+    """
+    GRANULARIDADES = (
+        ('hora', 'Hora'),
+        ('dia', 'Día'),
+    )
+
+    granularidad = models.CharField(max_length=4, choices=GRANULARIDADES)
+    fuente = models.CharField(max_length=50, choices=DatosMeteorologicos.FUENTES)
+    periodo = models.DateTimeField(help_text='Inicio de la hora o del día (hora local)')
+
+    temperatura_min = models.FloatField(null=True)
+    temperatura_max = models.FloatField(null=True)
+    temperatura_suma = models.FloatField(default=0)
+    temperatura_cantidad = models.IntegerField(default=0)
+
+    humedad_min = models.FloatField(null=True)
+    humedad_max = models.FloatField(null=True)
+    humedad_suma = models.FloatField(default=0)
+    humedad_cantidad = models.IntegerField(default=0)
+
+    humedad_suelo_min = models.FloatField(null=True)
+    humedad_suelo_max = models.FloatField(null=True)
+    humedad_suelo_suma = models.FloatField(default=0)
+    humedad_suelo_cantidad = models.IntegerField(default=0)
+
+    radiacion_solar_min = models.FloatField(null=True)
+    radiacion_solar_max = models.FloatField(null=True)
+    radiacion_solar_suma = models.FloatField(default=0)
+    radiacion_solar_cantidad = models.IntegerField(default=0)
+
+    precipitacion_min = models.FloatField(null=True)
+    precipitacion_max = models.FloatField(null=True)
+    precipitacion_suma = models.FloatField(default=0)
+    precipitacion_cantidad = models.IntegerField(default=0)
+
+    lecturas = models.IntegerField(default=0, help_text='Lecturas incluidas en el periodo')
+
+    class Meta:
+        db_table = 'resumenes_lecturas'
+        ordering = ['periodo']
+        verbose_name = 'Resumen de Lecturas'
+        verbose_name_plural = 'Resúmenes de Lecturas'
+        constraints = [
+            models.UniqueConstraint(
+                fields=['granularidad', 'fuente', 'periodo'],
+                name='resumen_granularidad_fuente_periodo_uniq'
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.granularidad} {timezone.localtime(self.periodo):%Y-%m-%d %H:%M} ({self.fuente})"
+
+
+class RangoCultivo(models.Model):
+    """
+    Rangos óptimos de un cultivo para calcular su viabilidad
+    Reemplaza los umbrales globales del antiguo ConfiguracionSistema
+    """
+    CULTIVOS = (
+        ('tomate', 'Tomate'),
+        ('banana', 'Banana'),
+        ('cacao', 'Cacao'),
+        ('arroz', 'Arroz'),
+        ('maiz', 'Maíz'),
+    )
+
+    cultivo = models.CharField(max_length=20, choices=CULTIVOS, unique=True)
+    temperatura_min = models.FloatField(help_text='Temperatura mínima óptima en °C')
+    temperatura_max = models.FloatField(help_text='Temperatura máxima óptima en °C')
+    humedad_min = models.FloatField(help_text='Humedad mínima óptima en %')
+    humedad_max = models.FloatField(help_text='Humedad máxima óptima en %')
+    humedad_suelo_min = models.FloatField(help_text='Humedad suelo mínima óptima en %')
+    humedad_suelo_max = models.FloatField(help_text='Humedad suelo máxima óptima en %')
+    radiacion_solar_min = models.FloatField(help_text='Radiación solar mínima óptima en W/m²')
+    radiacion_solar_max = models.FloatField(help_text='Radiación solar máxima óptima en W/m²')
+    actualizado_en = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        db_table = 'rangos_cultivo'
+        ordering = ['cultivo']
+        verbose_name = 'Rango de Cultivo'
+        verbose_name_plural = 'Rangos de Cultivo'
+
+    def __str__(self):
+        return self.get_cultivo_display()
+
+
+class Prediccion(models.Model):
+    """Viabilidad predicha por el modelo ML para un cultivo y una ventana de lecturas"""
+    cultivo = models.CharField(max_length=100, help_text='Tipo de cultivo para la predicción')
+    viabilidad = models.FloatField(
+        validators=[MinValueValidator(0), MaxValueValidator(100)],
+        help_text='Viabilidad del cultivo en %'
+    )
+    confianza = models.FloatField(
+        validators=[MinValueValidator(0), MaxValueValidator(100)],
+        help_text='Confianza de la predicción en %'
+    )
+    modelo_version = models.CharField(max_length=50, default='1.0', help_text='Versión del modelo ML utilizado')
+    clave_entrada = models.CharField(max_length=40, help_text='Hash de la ventana de entrada')
+    datos = models.ForeignKey(
+        DatosMeteorologicos,
+        null=True, blank=True,
+        on_delete=models.SET_NULL,
+        help_text='Última lectura de la ventana usada'
+    )
+    generado_en = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        db_table = 'predicciones'
+        ordering = ['-generado_en']
+        verbose_name = 'Predicción'
+        verbose_name_plural = 'Predicciones'
+        indexes = [
+            models.Index(fields=['clave_entrada', 'modelo_version'], name='predicciones_clave_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.cultivo}: {self.viabilidad:.1f}% ({self.modelo_version})"
+
+
+class ExportacionCSV(models.Model):
+    """
+    Exportación de lecturas a CSV generada en segundo plano por bloques
+    Guarda el cursor del último bloque escrito para poder reanudarla
+    """
+    ESTADOS = (
+        ('pendiente', 'Pendiente'),
+        ('en_proceso', 'En proceso'),
+        ('completado', 'Completado'),
+        ('error', 'Error'),
+    )
+
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    nombre_archivo = models.CharField(max_length=255, help_text='Nombre del archivo CSV exportado')
+    ruta = models.CharField(max_length=500, help_text='Ruta donde se guardó el archivo')
+    estado = models.CharField(max_length=20, choices=ESTADOS, default='pendiente')
+    filtros = models.JSONField(default=dict, help_text='Filtros de la exportación (query string normalizada)')
+    clave = models.CharField(max_length=40, db_index=True, help_text='Hash de los filtros')
+    fecha_inicio = models.DateTimeField(null=True, blank=True, help_text='Fecha inicio de los datos exportados')
+    fecha_fin = models.DateTimeField(null=True, blank=True, help_text='Fecha fin de los datos exportados')
+
+    # Instantánea de los datos al iniciar: lecturas con id <= id_maximo
+    id_maximo = models.BigIntegerField(default=0)
+    total_registros = models.IntegerField(default=0)
+    version_lecturas = models.PositiveIntegerField(
+        default=0, help_text="Versión de datos 'lecturas' al iniciar (cambios en el lugar)"
+    )
+
+    # Progreso y cursor (timestamp, id) del último bloque escrito
+    cantidad_registros = models.IntegerField(default=0, help_text='Número de registros en el CSV')
+    bytes_escritos = models.BigIntegerField(default=0)
+    ultimo_timestamp = models.DateTimeField(null=True, blank=True)
+    ultimo_id = models.BigIntegerField(null=True, blank=True)
+    error = models.TextField(blank=True)
+
+    creado_por = models.ForeignKey(
+        User,
+        null=True, blank=True,
+        on_delete=models.SET_NULL,
+        help_text='Usuario que realizó la exportación'
+    )
+    creado_en = models.DateTimeField(auto_now_add=True)
+    actualizado_en = models.DateTimeField(default=timezone.now)
+    completado_en = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        db_table = 'exportaciones_csv'
+        ordering = ['-creado_en']
+        verbose_name = 'Exportación CSV'
+        verbose_name_plural = 'Exportaciones CSV'
+
+    def __str__(self):
+        return f"{self.nombre_archivo} ({self.get_estado_display()})"
+
+    @property
+    def progreso(self):
+        if self.estado == 'completado':
+            return 100.0
+        if not self.total_registros:
+            return 0.0
+        return round(min(self.cantidad_registros / self.total_registros, 1) * 100, 1)
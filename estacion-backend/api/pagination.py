@@ -0,0 +1,17 @@
+from rest_framework.pagination import CursorPagination
+
+
+class LecturaCursorPagination(CursorPagination):
+    """Paginación por cursor (keyset) sobre timestamp"""
+    page_size = 100
+    page_size_query_param = 'limite'
+    max_page_size = 1000
+    ordering = ('-timestamp', '-id')
+
+
+class UsuarioCursorPagination(CursorPagination):
+    """Paginación por cursor del listado de usuarios"""
+    page_size = 50
+    page_size_query_param = 'limite'
+    max_page_size = 500
+    ordering = ('-created_at', '-id')
@@ -0,0 +1,226 @@
+"""
+Servicio de predicción con un modelo ML compartido
+
+El modelo se deserializa una vez por proceso (o antes del fork, con
+ML['PRECARGAR'] y gunicorn --preload, quedando compartido en memoria).
+Las solicitudes concurrentes se agrupan en lotes pequeños para hacer una
+sola llamada vectorizada a predict(), y los resultados se cachean por
+(ventana de entrada, versión del modelo).
+
+Contrato del modelo (pickle en settings.ML_MODEL_PATH):
+    - un objeto con predict(X) o un dict {'modelo': objeto, 'version': '1.2'}
+    - X tiene forma (n, 5): promedio de METRICAS en la ventana
+    - predict(X) retorna (n, 5): viabilidad 0-100 por cada cultivo de CULTIVOS
+    - opcional confianza(X) -> (n, 5) en 0-100
+Sin archivo de modelo se usa el motor de reglas de viabilidad.
+"""
+import hashlib
+import os
+import pickle
+import queue
+import threading
+import time
+import warnings
+from collections import OrderedDict
+from concurrent.futures import Future
+
+import numpy as np
+from django.conf import settings
+
+from .ingesta import CULTIVOS, METRICAS
+
+
+class ModeloReglas:
+    """Modelo de respaldo: puntaje del motor de viabilidad sobre los promedios"""
+
+    @property
+    def version(self):
+        # Puntúa con los RangoCultivo actuales: cambia con la versión 'rangos'
+        from .cache_respuestas import version_datos
+        return f"reglas-{version_datos('rangos')}"
+
+    def predict(self, X):
+        from .viabilidad import puntuar
+        columnas = {metrica: X[:, i] for i, metrica in enumerate(METRICAS)}
+        puntajes = puntuar(columnas)
+        return np.column_stack([np.nan_to_num(puntajes[cultivo]) for cultivo in CULTIVOS])
+
+
+class ServicioPrediccion:
+    """Modelo cargado una vez por proceso + agrupador de solicitudes + cache"""
+
+    def __init__(self, ruta=None):
+        self.ruta = str(ruta or settings.ML_MODEL_PATH)
+        self.modelo = None
+        self._version = None
+        self._lock_carga = threading.Lock()
+        self._cola = queue.Queue()
+        self._hilo = None
+        self._cache = OrderedDict()
+        self._lock_cache = threading.Lock()
+
+        # Estadísticas del proceso
+        self.lotes = 0
+        self.predicciones = 0
+        self.aciertos_cache = 0
+
+    # ------------------------------------------------------------------
+    # Carga del modelo
+    # ------------------------------------------------------------------
+
+    def cargar(self):
+        """Deserializa el modelo (solo la primera vez)"""
+        if self.modelo is not None:
+            return self.modelo
+        with self._lock_carga:
+            if self.modelo is None:
+                if os.path.exists(self.ruta):
+                    with open(self.ruta, 'rb') as f:
+                        contenido = pickle.load(f)
+                    if isinstance(contenido, dict):
+                        modelo = contenido['modelo']
+                        version = contenido.get('version')
+                    else:
+                        modelo = contenido
+                        version = getattr(contenido, 'version', None)
+                    version = str(version or f'archivo-{int(os.path.getmtime(self.ruta))}')
+                    print(f'✅ Modelo ML cargado: {self.ruta} (versión {version})')
+                else:
+                    modelo = ModeloReglas()
+                    version = None
+                self._version = version
+                self.modelo = modelo
+        return self.modelo
+
+    @property
+    def version(self):
+        """Versión del modelo; la del modelo de reglas sigue a los rangos"""
+        if isinstance(self.modelo, ModeloReglas):
+            return self.modelo.version
+        return self._version
+
+    # ------------------------------------------------------------------
+    # Predicción
+    # ------------------------------------------------------------------
+
+    def predecir(self, entrada):
+        """
+        Predice la viabilidad de cada cultivo para un vector de entrada.
+
+        Retorna (resultado, desde_cache); resultado es
+        {'viabilidad': [..], 'confianza': [..]} en el orden de CULTIVOS.
+        """
+        self.cargar()
+        entrada = np.asarray(entrada, dtype=np.float64)
+        clave = (clave_entrada(entrada), self.version)
+
+        with self._lock_cache:
+            if clave in self._cache:
+                self._cache.move_to_end(clave)
+                self.aciertos_cache += 1
+                return self._cache[clave], True
+
+        futuro = Future()
+        self._asegurar_hilo()
+        self._cola.put((entrada, futuro))
+        resultado = futuro.result(timeout=settings.ML['TIMEOUT'])
+
+        with self._lock_cache:
+            self._cache[clave] = resultado
+            while len(self._cache) > settings.ML['CACHE_MAXIMO']:
+                self._cache.popitem(last=False)
+        return resultado, False
+
+    def _asegurar_hilo(self):
+        if self._hilo is None or not self._hilo.is_alive():
+            with self._lock_carga:
+                if self._hilo is None or not self._hilo.is_alive():
+                    self._hilo = threading.Thread(
+                        target=self._atender, name='prediccion-lotes', daemon=True
+                    )
+                    self._hilo.start()
+
+    def _atender(self):
+        """Agrupa solicitudes durante ML['ESPERA_MS'] o hasta ML['LOTE_MAXIMO']"""
+        espera = settings.ML['ESPERA_MS'] / 1000
+        maximo = settings.ML['LOTE_MAXIMO']
+        while True:
+            lote = [self._cola.get()]
+            limite = time.monotonic() + espera
+            while len(lote) < maximo:
+                restante = limite - time.monotonic()
+                if restante <= 0:
+                    break
+                try:
+                    lote.append(self._cola.get(timeout=restante))
+                except queue.Empty:
+                    break
+            self._procesar(lote)
+
+    def _procesar(self, lote):
+        X = np.vstack([entrada for entrada, _ in lote])
+        try:
+            viabilidad = np.clip(np.asarray(self.modelo.predict(X), dtype=np.float64), 0, 100)
+            if hasattr(self.modelo, 'confianza'):
+                confianza = np.clip(np.asarray(self.modelo.confianza(X), dtype=np.float64), 0, 100)
+            else:
+                # Sin estimación del modelo: proporción de métricas disponibles
+                completas = np.mean(~np.isnan(X), axis=1, keepdims=True) * 100
+                confianza = np.repeat(completas, len(CULTIVOS), axis=1)
+        except Exception as e:
+            for _, futuro in lote:
+                futuro.set_exception(e)
+            return
+
+        self.lotes += 1
+        self.predicciones += len(lote)
+        for i, (_, futuro) in enumerate(lote):
+            futuro.set_result({
+                'viabilidad': [round(float(v), 2) for v in viabilidad[i]],
+                'confianza': [round(float(c), 2) for c in confianza[i]],
+            })
+
+    def estadisticas(self):
+        return {
+            'modelo_version': self.version,
+            'lotes': self.lotes,
+            'predicciones': self.predicciones,
+            'promedio_por_lote': round(self.predicciones / self.lotes, 2) if self.lotes else None,
+            'aciertos_cache': self.aciertos_cache,
+        }
+
+
+def entrada_desde_lecturas(filas):
+    """
+    Vector de entrada del modelo: promedio de cada métrica en la ventana.
+    filas es una lista de dicts o de tuplas en el orden de METRICAS.
+    """
+    if filas and isinstance(filas[0], dict):
+        filas = [[lectura.get(metrica) for metrica in METRICAS] for lectura in filas]
+    matriz = np.array(
+        [[np.nan if valor in (None, '') else valor for valor in fila] for fila in filas],
+        dtype=np.float64,
+    ).reshape(-1, len(METRICAS))
+    # nanmean avisa con RuntimeWarning cuando una métrica no tiene datos
+    with warnings.catch_warnings():
+        warnings.simplefilter('ignore', RuntimeWarning)
+        return np.nanmean(matriz, axis=0)
+
+
+def clave_entrada(entrada):
+    """Hash estable de la ventana de entrada (redondeada a 4 decimales)"""
+    return hashlib.sha1(np.round(entrada, 4).tobytes()).hexdigest()
+
+
+_servicio = None
+_servicio_lock = threading.Lock()
+
+
+def get_servicio():
+    """Retorna el servicio de predicción del proceso actual"""
+    global _servicio
+    if _servicio is None:
+        with _servicio_lock:
+            if _servicio is None:
+                _servicio = ServicioPrediccion()
+    return _servicio
@@ -0,0 +1,16 @@
+"""
+Inicialización de procesos hijo creados con 'spawn'
+
+El proceso hijo importa este módulo para ejecutar el initializer antes de
+configurar Django: no debe importar modelos ni nada que los importe.
+"""
+import os
+
+import django
+
+
+def iniciar_proceso_hash():
+    """Configura Django en un proceso que solo hashea contraseñas"""
+    # No necesita el modelo ML: evita cargarlo en cada proceso hijo
+    os.environ['ML_PRECARGAR'] = 'False'
+    django.setup()
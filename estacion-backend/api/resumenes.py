@@ -0,0 +1,150 @@
+"""
+Resúmenes por hora y por día de las lecturas
+
+Cada lote ingerido se agrupa en memoria por (granularidad, fuente, periodo)
+y se suma a las filas de resumen con UPDATE atómicos, así varios workers
+pueden actualizar el mismo periodo sin perder datos.
+"""
+from django.db import IntegrityError, transaction
+from django.db.models import F, FloatField, Value
+from django.db.models.functions import Coalesce, Greatest, Least
+from django.utils import timezone
+
+from .ingesta import METRICAS
+from .models import ResumenLecturas
+
+
+GRANULARIDADES = [clave for clave, _ in ResumenLecturas.GRANULARIDADES]
+
+
+def inicio_periodo(timestamp, granularidad):
+    """Inicio de la hora o del día (hora local) que contiene al timestamp"""
+    local = timezone.localtime(timestamp)
+    if granularidad == 'hora':
+        return local.replace(minute=0, second=0, microsecond=0)
+    return local.replace(hour=0, minute=0, second=0, microsecond=0)
+
+
+def acumular(lecturas, acumulado=None):
+    """
+    Agrupa lecturas por (granularidad, fuente, periodo).
+
+    Retorna {clave: {'lecturas': n, metrica: [min, max, suma, cantidad]}}
+    """
+    acumulado = {} if acumulado is None else acumulado
+    for lectura in lecturas:
+        for granularidad in GRANULARIDADES:
+            clave = (granularidad, lectura.fuente, inicio_periodo(lectura.timestamp, granularidad))
+            grupo = acumulado.get(clave)
+            if grupo is None:
+                grupo = acumulado[clave] = {'lecturas': 0}
+                for metrica in METRICAS:
+                    grupo[metrica] = [None, None, 0.0, 0]
+            grupo['lecturas'] += 1
+
+            for metrica in METRICAS:
+                valor = getattr(lectura, metrica)
+                if valor is None:
+                    continue
+                agregado = grupo[metrica]
+                agregado[0] = valor if agregado[0] is None else min(agregado[0], valor)
+                agregado[1] = valor if agregado[1] is None else max(agregado[1], valor)
+                agregado[2] += valor
+                agregado[3] += 1
+    return acumulado
+
+
+def _valores_iniciales(grupo):
+    valores = {'lecturas': grupo['lecturas']}
+    for metrica in METRICAS:
+        minimo, maximo, suma, cantidad = grupo[metrica]
+        valores.update({
+            f'{metrica}_min': minimo,
+            f'{metrica}_max': maximo,
+            f'{metrica}_suma': suma,
+            f'{metrica}_cantidad': cantidad,
+        })
+    return valores
+
+
+def _incrementos(grupo):
+    cambios = {'lecturas': F('lecturas') + grupo['lecturas']}
+    for metrica in METRICAS:
+        minimo, maximo, suma, cantidad = grupo[metrica]
+        if not cantidad:
+            continue
+        minimo = Value(minimo, output_field=FloatField())
+        maximo = Value(maximo, output_field=FloatField())
+        cambios.update({
+            f'{metrica}_min': Least(Coalesce(F(f'{metrica}_min'), minimo), minimo),
+            f'{metrica}_max': Greatest(Coalesce(F(f'{metrica}_max'), maximo), maximo),
+            f'{metrica}_suma': F(f'{metrica}_suma') + suma,
+            f'{metrica}_cantidad': F(f'{metrica}_cantidad') + cantidad,
+        })
+    return cambios
+
+
+def actualizar_resumenes(lecturas):
+    """Suma un lote de lecturas a los resúmenes por hora y por día"""
+    for (granularidad, fuente, periodo), grupo in acumular(lecturas).items():
+        filtro = ResumenLecturas.objects.filter(
+            granularidad=granularidad, fuente=fuente, periodo=periodo
+        )
+        if filtro.update(**_incrementos(grupo)):
+            continue
+        try:
+            with transaction.atomic():
+                ResumenLecturas.objects.create(
+                    granularidad=granularidad, fuente=fuente, periodo=periodo,
+                    **_valores_iniciales(grupo)
+                )
+        except IntegrityError:
+            # Otro worker creó el periodo entre el UPDATE y el INSERT
+            filtro.update(**_incrementos(grupo))
+
+
+def construir_resumenes(acumulado):
+    """Crea (sin guardar) las filas de resumen de un acumulado completo"""
+    return [
+        ResumenLecturas(
+            granularidad=granularidad, fuente=fuente, periodo=periodo,
+            **_valores_iniciales(grupo)
+        )
+        for (granularidad, fuente, periodo), grupo in acumulado.items()
+    ]
+
+
+def resumen_como_dict(resumenes):
+    """
+    Combina filas de resumen del mismo periodo (varias fuentes) y calcula
+    el promedio de cada métrica.
+    """
+    periodos = {}
+    for resumen in resumenes:
+        grupo = periodos.setdefault(resumen.periodo, {'lecturas': 0})
+        grupo['lecturas'] += resumen.lecturas
+        for metrica in METRICAS:
+            actual = grupo.setdefault(metrica, [None, None, 0.0, 0])
+            minimo = getattr(resumen, f'{metrica}_min')
+            maximo = getattr(resumen, f'{metrica}_max')
+            if minimo is not None:
+                actual[0] = minimo if actual[0] is None else min(actual[0], minimo)
+            if maximo is not None:
+                actual[1] = maximo if actual[1] is None else max(actual[1], maximo)
+            actual[2] += getattr(resumen, f'{metrica}_suma')
+            actual[3] += getattr(resumen, f'{metrica}_cantidad')
+
+    resultado = []
+    for periodo, grupo in sorted(periodos.items()):
+        fila = {'periodo': timezone.localtime(periodo).isoformat(), 'lecturas': grupo['lecturas']}
+        for metrica in METRICAS:
+            minimo, maximo, suma, cantidad = grupo[metrica]
+            fila[metrica] = {
+                'min': minimo,
+                'max': maximo,
+                'promedio': round(suma / cantidad, 2) if cantidad else None,
+                'suma': round(suma, 2),
+                'cantidad': cantidad,
+            }
+        resultado.append(fila)
+    return resultado
@@ -0,0 +1,108 @@
+"""
+Resolución del rol de usuario con cache LRU por proceso
+
+El rol se guarda por user_id con un tiempo de vida (TTL). Guardar o
+eliminar un Usuario invalida su entrada en el proceso que hizo el cambio;
+en los demás workers la entrada expira al cumplirse el TTL.
+La misma cache valida la versión de rol de los tokens JWT.
+"""
+import threading
+import time
+from collections import OrderedDict, namedtuple
+
+from django.conf import settings
+from django.contrib.auth.models import User
+
+
+EntradaRol = namedtuple('EntradaRol', ['rol', 'version', 'is_superuser', 'is_active'])
+
+
+class CacheRoles:
+    """
+    Cache LRU con TTL de user_id -> EntradaRol
+
+    Cada entrada guarda el rol, la versión del rol y el estado del usuario;
+    alcanza para autorizar un token sin volver a la base de datos.
+    """
+
+    def __init__(self, maximo=None, ttl=None):
+        self.maximo = maximo or settings.CACHE_ROLES['MAXIMO']
+        self.ttl = ttl if ttl is not None else settings.CACHE_ROLES['TTL']
+        self._datos = OrderedDict()
+        self._lock = threading.Lock()
+        self.aciertos = 0
+        self.fallos = 0
+
+    def obtener(self, user_id):
+        """Retorna el rol del usuario, consultando la BD solo si no está en cache"""
+        entrada = self.obtener_entrada(user_id)
+        return entrada.rol if entrada else 'estudiante'
+
+    def obtener_entrada(self, user_id):
+        """Retorna la EntradaRol del usuario (None si el usuario no existe)"""
+        ahora = time.monotonic()
+        with self._lock:
+            entrada = self._datos.get(user_id)
+            if entrada is not None and entrada[1] > ahora:
+                self._datos.move_to_end(user_id)
+                self.aciertos += 1
+                return entrada[0]
+            self.fallos += 1
+
+        fila = (
+            User.objects.filter(pk=user_id)
+            .values_list('is_active', 'is_superuser', 'usuario_perfil__rol', 'usuario_perfil__rol_version')
+            .first()
+        )
+        entrada = None
+        if fila is not None:
+            activo, superusuario, rol, version = fila
+            entrada = EntradaRol(
+                rol='administrativo' if superusuario else (rol or 'estudiante'),
+                version=version or 0,
+                is_superuser=superusuario,
+                is_active=activo,
+            )
+
+        with self._lock:
+            self._datos[user_id] = (entrada, ahora + self.ttl)
+            self._datos.move_to_end(user_id)
+            while len(self._datos) > self.maximo:
+                self._datos.popitem(last=False)
+        return entrada
+
+    def invalidar(self, user_id=None):
+        """Elimina la entrada de un usuario (o todas si user_id es None)"""
+        with self._lock:
+            if user_id is None:
+                self._datos.clear()
+            else:
+                self._datos.pop(user_id, None)
+
+    def estadisticas(self):
+        with self._lock:
+            total = self.aciertos + self.fallos
+            return {
+                'entradas': len(self._datos),
+                'maximo': self.maximo,
+                'ttl': self.ttl,
+                'aciertos': self.aciertos,
+                'fallos': self.fallos,
+                'tasa_aciertos': round(self.aciertos / total, 4) if total else None,
+            }
+
+
+cache_roles = CacheRoles()
+
+
+def get_user_rol(user):
+    """Obtiene el rol del usuario"""
+    if not user or not user.is_authenticated:
+        return None
+    # Usuarios autenticados por JWT traen el rol en el token
+    rol = getattr(user, 'rol', None)
+    if rol:
+        return rol
+    if user.is_superuser:
+        return 'administrativo'
+    return cache_roles.obtener(user.pk)
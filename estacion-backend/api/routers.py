@@ -0,0 +1,137 @@
+"""
+Lecturas en la réplica de la base de datos (opcional)
+
+Si DATABASES tiene el alias REPLICA['ALIAS'], ReplicaMiddleware marca los
+requests de solo lectura (GET/HEAD/OPTIONS) y ReplicaRouter manda sus
+consultas a la réplica: listados, historia, resúmenes y analítica dejan
+de competir con la ingesta y el alta de usuarios en la primaria.
+
+Lee-tus-escrituras:
+- Dentro de un request, después de la primera escritura todas las
+  lecturas van a la primaria, y también dentro de un transaction.atomic().
+- Un request que escribió deja la cookie REPLICA['COOKIE'] por
+  REPLICA['PEGAJOSIDAD'] segundos (el retraso tolerado de la
+  replicación); mientras esté vigente ese cliente lee de la primaria.
+
+Fuera de un request (comandos, hilos de ingesta y exportación) todo va
+a la primaria.
+"""
+import contextvars
+import time
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections
+
+
+METODOS_LECTURA = ('GET', 'HEAD', 'OPTIONS')
+
+
+class EstadoReplica:
+    """Ruteo del request en curso"""
+    __slots__ = ('leer_de_replica', 'escribio', 'uso_replica')
+
+    def __init__(self, leer_de_replica):
+        self.leer_de_replica = leer_de_replica
+        self.escribio = False
+        self.uso_replica = False
+
+
+_estado_actual = contextvars.ContextVar('estado_replica', default=None)
+
+
+def alias_replica():
+    """Alias de la réplica, o None si no está configurada"""
+    alias = settings.REPLICA['ALIAS']
+    return alias if alias in settings.DATABASES else None
+
+
+def uso_replica():
+    """True si el request en curso ya leyó algo de la réplica"""
+    estado = _estado_actual.get()
+    return estado is not None and estado.uso_replica
+
+
+class ReplicaRouter:
+    def db_for_read(self, model, **hints):
+        estado = _estado_actual.get()
+        if estado is None or not estado.leer_de_replica or estado.escribio:
+            return None
+        alias = alias_replica()
+        if alias is None or connections[DEFAULT_DB_ALIAS].in_atomic_block:
+            return None
+        estado.uso_replica = True
+        return alias
+
+    def db_for_write(self, model, **hints):
+        estado = _estado_actual.get()
+        if estado is not None:
+            estado.escribio = True
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Primaria y réplica tienen los mismos datos
+        alias = {DEFAULT_DB_ALIAS, alias_replica()}
+        if obj1._state.db in alias and obj2._state.db in alias:
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # La réplica recibe el esquema por replicación
+        if db == alias_replica():
+            return False
+        return None
+
+
+def puede_leer_de_replica(request):
+    if request.method not in METODOS_LECTURA or alias_replica() is None:
+        return False
+    try:
+        primaria_hasta = float(request.COOKIES.get(settings.REPLICA['COOKIE'], 0))
+    except ValueError:
+        primaria_hasta = 0
+    return primaria_hasta <= time.time()
+
+
+def marcar_escritura(response, estado):
+    if not estado.escribio or alias_replica() is None:
+        return
+    pegajosidad = settings.REPLICA['PEGAJOSIDAD']
+    response.set_cookie(
+        settings.REPLICA['COOKIE'], str(int(time.time()) + pegajosidad),
+        max_age=pegajosidad, httponly=True, samesite='Lax',
+    )
+
+
+class ReplicaMiddleware:
+    """Habilita la réplica en los requests de lectura y marca a quien escribió"""
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.es_async = iscoroutinefunction(get_response)
+        if self.es_async:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.es_async:
+            return self.__acall__(request)
+        estado = EstadoReplica(puede_leer_de_replica(request))
+        token = _estado_actual.set(estado)
+        try:
+            response = self.get_response(request)
+        finally:
+            _estado_actual.reset(token)
+        marcar_escritura(response, estado)
+        return response
+
+    async def __acall__(self, request):
+        estado = EstadoReplica(puede_leer_de_replica(request))
+        token = _estado_actual.set(estado)
+        try:
+            response = await self.get_response(request)
+        finally:
+            _estado_actual.reset(token)
+        marcar_escritura(response, estado)
+        return response
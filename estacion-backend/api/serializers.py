@@ -1,6 +1,6 @@
 from rest_framework import serializers
 from django.contrib.auth.models import User
-from .models import Usuario
+from .models import DatosMeteorologicos, ExportacionCSV, RangoCultivo, Usuario
 
 
 class UsuarioSerializer(serializers.ModelSerializer):
@@ -60,4 +60,47 @@ class UsuarioCreateSerializer(serializers.Serializer):
             rol=rol
         )
         
-        return usuario
\ No newline at end of file
+        return usuario
+
+class DatosMeteorologicosSerializer(serializers.ModelSerializer):
+    """Serializer para lecturas de la estación (READ ONLY)"""
+    
+    class Meta:
+        model = DatosMeteorologicos
+        fields = ['id', 'timestamp', 'fuente', 'temperatura', 'humedad', 'humedad_suelo',
+                  'radiacion_solar', 'precipitacion', 'presion', 'velocidad_viento', 'calidad']
+        read_only_fields = fields
+
+
+
+class RangoCultivoSerializer(serializers.ModelSerializer):
+    """Serializer para los rangos óptimos de cada cultivo"""
+    
+    class Meta:
+        model = RangoCultivo
+        fields = ['cultivo', 'temperatura_min', 'temperatura_max', 'humedad_min', 'humedad_max',
+                  'humedad_suelo_min', 'humedad_suelo_max', 'radiacion_solar_min',
+                  'radiacion_solar_max', 'actualizado_en']
+        read_only_fields = ['actualizado_en']
+    
+    def validate(self, attrs):
+        for metrica in ('temperatura', 'humedad', 'humedad_suelo', 'radiacion_solar'):
+            minimo = attrs.get(f'{metrica}_min', getattr(self.instance, f'{metrica}_min', None))
+            maximo = attrs.get(f'{metrica}_max', getattr(self.instance, f'{metrica}_max', None))
+            if minimo is not None and maximo is not None and minimo > maximo:
+                raise serializers.ValidationError(
+                    {f'{metrica}_min': 'El mínimo no puede ser mayor que el máximo'}
+                )
+        return attrs
+
+
+class ExportacionCSVSerializer(serializers.ModelSerializer):
+    """Serializer para el estado de una exportación (READ ONLY)"""
+    progreso = serializers.FloatField(read_only=True)
+    
+    class Meta:
+        model = ExportacionCSV
+        fields = ['id', 'nombre_archivo', 'estado', 'filtros', 'fecha_inicio', 'fecha_fin',
+                  'total_registros', 'cantidad_registros', 'progreso', 'bytes_escritos',
+                  'error', 'creado_en', 'completado_en']
+        read_only_fields = fields
@@ -0,0 +1,45 @@
+from django.contrib.auth.models import User
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .cache_respuestas import incrementar_version
+from .difusion import evento_desde_fila, get_difusor
+from .ingesta import lote_guardado
+from .models import RangoCultivo, Usuario
+from .roles import cache_roles
+from .viabilidad import invalidar_rangos
+
+
+@receiver(lote_guardado)
+def difundir_lote(sender, filas, **kwargs):
+    """Publica las lecturas nuevas a los clientes del feed"""
+    get_difusor().publicar([evento_desde_fila(fila) for fila in filas])
+
+
+@receiver(lote_guardado)
+def invalidar_respuestas_lecturas(sender, filas, **kwargs):
+    # También cambia la cache columnar del CSV, aunque no haya lecturas válidas
+    incrementar_version('lecturas')
+
+
+@receiver(post_save, sender=Usuario)
+@receiver(post_delete, sender=Usuario)
+def invalidar_rol_usuario(sender, instance, **kwargs):
+    cache_roles.invalidar(instance.user_id)
+    incrementar_version('usuarios')
+
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def invalidar_rol_user(sender, instance, update_fields=None, **kwargs):
+    cache_roles.invalidar(instance.pk)
+    # El login solo actualiza last_login, que no aparece en ninguna respuesta
+    if update_fields is None or set(update_fields) != {'last_login'}:
+        incrementar_version('usuarios')
+
+
+@receiver(post_save, sender=RangoCultivo)
+@receiver(post_delete, sender=RangoCultivo)
+def invalidar_rangos_cultivo(sender, **kwargs):
+    invalidar_rangos()
+    incrementar_version('rangos')
@@ -0,0 +1,280 @@
+"""
+Sincronización periódica con la API externa de clima
+
+Un solo proceso (manage.py sincronizar_clima) consulta la API cada
+SINCRONIZACION['INTERVALO'] segundos y guarda los registros nuevos en
+DatosMeteorologicos con fuente='api_externa'. Los clientes leen lo ya
+sincronizado desde /api/clima/ sin esperar a la API externa.
+
+- Una sola requests.Session con pool de conexiones (keep-alive)
+- Peticiones condicionales con ETag / Last-Modified (304 = sin cambios)
+- Reintentos con backoff exponencial y jitter ante fallos
+- Los ids externos ya vistos se descartan antes de tocar la base de datos
+"""
+import json
+import os
+import random
+import threading
+from collections import OrderedDict
+
+import requests
+from django.conf import settings
+from django.db import close_old_connections, transaction
+from django.utils import timezone
+from requests.adapters import HTTPAdapter
+
+from .cache_respuestas import incrementar_version
+from .calidad import revisar_lecturas
+from .models import DatosMeteorologicos, parsear_fecha, parsear_numero
+from .resumenes import actualizar_resumenes
+
+
+FUENTE = 'api_externa'
+
+# Campo de la API externa -> campo de DatosMeteorologicos
+CAMPOS_EXTERNOS = {
+    'temperatura': 'temperatura',
+    'humedad': 'humedad',
+    'lluvia': 'precipitacion',
+    'uv': 'indice_uv',
+}
+
+
+class ErrorSincronizacion(Exception):
+    """Fallo al consultar la API externa; espera sugerida en segundos"""
+
+    def __init__(self, mensaje, espera=None):
+        super().__init__(mensaje)
+        self.espera = espera
+
+
+class SincronizadorClima:
+    """Consulta la API externa y guarda los registros que no se han visto"""
+
+    def __init__(self, url=None, api_key=None, timeout=None, ruta_estado=None):
+        self.url = url or settings.API_EXTERNA['URL']
+        self.timeout = timeout or settings.API_EXTERNA['TIMEOUT']
+        self.ruta_estado = str(ruta_estado or settings.SINCRONIZACION['ESTADO'])
+
+        self.sesion = requests.Session()
+        adaptador = HTTPAdapter(pool_connections=1, pool_maxsize=2)
+        self.sesion.mount('http://', adaptador)
+        self.sesion.mount('https://', adaptador)
+        self.sesion.headers['Accept'] = 'application/json'
+        api_key = api_key if api_key is not None else settings.API_EXTERNA['KEY']
+        if api_key:
+            self.sesion.headers['X-API-Key'] = api_key
+
+        self.estado = self._leer_estado()
+        self._validadores = {}
+        self._vistos = OrderedDict()
+        self._recordar(
+            DatosMeteorologicos.objects
+            .filter(fuente=FUENTE, id_externo__isnull=False)
+            .order_by('-timestamp')
+            .values_list('id_externo', flat=True)[:settings.SINCRONIZACION['IDS_RECORDADOS']]
+        )
+
+    # ------------------------------------------------------------------
+    # Consulta
+    # ------------------------------------------------------------------
+
+    def consultar(self):
+        """
+        Descarga los registros de la API externa.
+        Retorna None si no cambiaron desde la última consulta (304).
+        """
+        encabezados = {}
+        if self.estado.get('etag'):
+            encabezados['If-None-Match'] = self.estado['etag']
+        if self.estado.get('last_modified'):
+            encabezados['If-Modified-Since'] = self.estado['last_modified']
+
+        try:
+            respuesta = self.sesion.get(self.url, headers=encabezados, timeout=self.timeout)
+        except requests.RequestException as e:
+            raise ErrorSincronizacion(f'Error de conexión: {str(e)}')
+
+        if respuesta.status_code == 304:
+            return None
+        if respuesta.status_code in (429, 503):
+            raise ErrorSincronizacion(
+                f'API externa no disponible ({respuesta.status_code})',
+                espera=_segundos_retry_after(respuesta.headers.get('Retry-After')),
+            )
+        if respuesta.status_code >= 400:
+            raise ErrorSincronizacion(f'API externa respondió {respuesta.status_code}')
+
+        try:
+            datos = respuesta.json()
+        except ValueError:
+            raise ErrorSincronizacion('La API externa no retornó JSON')
+        if isinstance(datos, dict):
+            datos = datos.get('datos', [])
+        if not isinstance(datos, list):
+            raise ErrorSincronizacion('Formato de respuesta inesperado')
+
+        # Se confirman en sincronizar() solo si los registros se guardaron,
+        # si no la próxima consulta recibiría 304 y se perderían
+        self._validadores = {
+            'etag': respuesta.headers.get('ETag'),
+            'last_modified': respuesta.headers.get('Last-Modified'),
+        }
+        return datos
+
+    # ------------------------------------------------------------------
+    # Guardado
+    # ------------------------------------------------------------------
+
+    def guardar(self, registros):
+        """Guarda los registros nuevos; retorna la cantidad guardada"""
+        candidatos = {}
+        for registro in registros:
+            lectura = lectura_desde_registro(registro)
+            if lectura is not None and lectura.id_externo not in self._vistos:
+                candidatos[lectura.id_externo] = lectura
+        if not candidatos:
+            return 0
+
+        # Registros guardados por una ejecución anterior que ya no se recuerdan
+        existentes = set(
+            DatosMeteorologicos.objects
+            .filter(fuente=FUENTE, id_externo__in=list(candidatos))
+            .values_list('id_externo', flat=True)
+        )
+        nuevas = [lectura for clave, lectura in candidatos.items() if clave not in existentes]
+
+        if nuevas and settings.CALIDAD['REVISAR_EN_INGESTA']:
+            revisar_lecturas(nuevas)
+
+        if nuevas:
+            with transaction.atomic():
+                DatosMeteorologicos.objects.bulk_create(
+                    nuevas, batch_size=settings.INGESTA['TAMANO_LOTE_BD']
+                )
+                actualizar_resumenes(nuevas)
+                incrementar_version('lecturas')
+
+        self._recordar(candidatos)
+        return len(nuevas)
+
+    def _recordar(self, ids):
+        for id_externo in ids:
+            self._vistos[id_externo] = True
+            self._vistos.move_to_end(id_externo)
+        while len(self._vistos) > settings.SINCRONIZACION['IDS_RECORDADOS']:
+            self._vistos.popitem(last=False)
+
+    # ------------------------------------------------------------------
+    # Ciclo
+    # ------------------------------------------------------------------
+
+    def sincronizar(self):
+        """Una consulta + guardado. Retorna la cantidad de lecturas nuevas."""
+        self._validadores = {}
+        try:
+            registros = self.consultar()
+            nuevas = self.guardar(registros) if registros else 0
+        except Exception as e:
+            self.estado['ultimo_error'] = str(e)
+            self._guardar_estado()
+            raise
+
+        self.estado.update(self._validadores)
+        self.estado['ultima_sincronizacion'] = timezone.now().isoformat()
+        self.estado['ultimo_error'] = None
+        self._guardar_estado()
+        return nuevas
+
+    def ejecutar(self, detener=None, iteraciones=None):
+        """
+        Sincroniza cada INTERVALO segundos hasta que se active detener
+        (threading.Event) o se completen las iteraciones indicadas.
+        """
+        detener = detener or threading.Event()
+        fallos = 0
+        realizadas = 0
+
+        while not detener.is_set():
+            # Proceso de larga duración: descarta conexiones caídas o vencidas (CONN_MAX_AGE)
+            close_old_connections()
+            try:
+                nuevas = self.sincronizar()
+                fallos = 0
+                espera = settings.SINCRONIZACION['INTERVALO']
+                print(f'✅ Sincronización de clima: {nuevas} lecturas nuevas')
+            except Exception as e:
+                fallos += 1
+                espera = max(calcular_backoff(fallos), getattr(e, 'espera', None) or 0)
+                print(f'❌ Error sincronizando clima ({fallos} seguidos): {str(e)}. '
+                      f'Reintento en {espera:.1f}s')
+
+            realizadas += 1
+            if iteraciones is not None and realizadas >= iteraciones:
+                break
+            detener.wait(espera)
+
+    # ------------------------------------------------------------------
+    # Estado persistente (sobrevive reinicios del comando)
+    # ------------------------------------------------------------------
+
+    def _leer_estado(self):
+        try:
+            with open(self.ruta_estado, encoding='utf-8') as f:
+                return json.load(f)
+        except (FileNotFoundError, ValueError):
+            return {}
+
+    def _guardar_estado(self):
+        os.makedirs(os.path.dirname(self.ruta_estado), exist_ok=True)
+        temporal = f'{self.ruta_estado}.{os.getpid()}.tmp'
+        with open(temporal, 'w', encoding='utf-8') as f:
+            json.dump(self.estado, f)
+        os.replace(temporal, self.ruta_estado)
+
+
+def lectura_desde_registro(registro):
+    """
+    Construye una lectura (sin guardar) desde un registro de la API externa:
+    {"id": "2933", "temperatura": "28.9", "humedad": "63", "lluvia": "0",
+     "uv": "28.08", "fecha": "2025-11-20 21:15:07"}
+    Retorna None si el registro no tiene id o fecha válidos.
+    """
+    if not isinstance(registro, dict) or registro.get('id') in (None, ''):
+        return None
+    timestamp = parsear_fecha(registro.get('fecha'))
+    if timestamp is None:
+        return None
+
+    lectura = DatosMeteorologicos(
+        timestamp=timestamp,
+        fuente=FUENTE,
+        id_externo=str(registro['id']),
+    )
+    for externo, campo in CAMPOS_EXTERNOS.items():
+        setattr(lectura, campo, parsear_numero(registro.get(externo)))
+    return lectura
+
+
+def calcular_backoff(fallos):
+    """Backoff exponencial con jitter: entre la mitad y el total de base * 2^(fallos-1)"""
+    base = settings.SINCRONIZACION['BACKOFF_BASE']
+    maximo = settings.SINCRONIZACION['BACKOFF_MAXIMO']
+    espera = min(maximo, base * 2 ** (fallos - 1))
+    return espera / 2 + random.uniform(0, espera / 2)
+
+
+def _segundos_retry_after(valor):
+    try:
+        return float(valor)
+    except (TypeError, ValueError):
+        return None
+
+
+def leer_estado():
+    """Estado de la última sincronización (para /api/clima/)"""
+    try:
+        with open(settings.SINCRONIZACION['ESTADO'], encoding='utf-8') as f:
+            return json.load(f)
+    except (FileNotFoundError, ValueError):
+        return {}
@@ -1,3 +1,797 @@
-from django.test import TestCase
+import json
+import os
+import tempfile
+import threading
+import time
+import unittest
+from datetime import datetime, timezone as dt_timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from io import StringIO
+from unittest import mock
 
-# Create your tests here.
+from django.conf import settings
+import numpy as np
+import pandas as pd
+from django.contrib.auth.hashers import check_password
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.db import DatabaseError, connections, transaction
+from django.http import HttpResponse
+from django.test import RequestFactory, SimpleTestCase, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from rest_framework_simplejwt.tokens import AccessToken
+
+from .authentication import claims_de_usuario
+from .cache_columnar import CacheColumnar
+from .cache_respuestas import _incrementar
+from .calidad import (
+    PICO, PLANO, _entrada_cuarentena, aplicar_cuarentena, detectar_huecos, detectar_picos, detectar_planos,
+    registrar_cuarentena,
+)
+from .db.pool import PoolConexiones, get_pool
+from .db.sqlite3.base import DatabaseWrapper as SQLiteEnPool
+from .difusion import Difusor
+from .estadisticas import agrupar, promedio_movil
+from .exportaciones import respuesta_archivo
+from . import inscripcion
+from .ingesta import BufferIngesta, construir_fila, escribir_filas
+from .models import DatosMeteorologicos, Usuario
+from .prediccion import ServicioPrediccion
+from .routers import ReplicaMiddleware, ReplicaRouter
+from .sincronizacion import SincronizadorClima
+
+
+ENCABEZADO_CSV = 'date,temperatura,radiacion_solar,humedad_suelo,humedad,precipitacion,tomate,banana,cacao,arroz,maiz\n'
+
+
+def crear_usuario(username, rol='estudiante'):
+    user = User.objects.create_user(username=username, email=f'{username}@ejemplo.com', password='clave-123')
+    Usuario.objects.create(user=user, rol=rol)
+    return user
+
+
+def cabecera_jwt(user):
+    token = AccessToken.for_user(user)
+    for clave, valor in claims_de_usuario(user).items():
+        token[clave] = valor
+    return {'HTTP_AUTHORIZATION': f'Bearer {token}'}
+
+
+class DirectorioTemporalMixin:
+    """Datos (versiones, cache de respuestas, exportaciones) en un directorio temporal"""
+
+    def setUp(self):
+        super().setUp()
+        temporal = tempfile.TemporaryDirectory()
+        self.addCleanup(temporal.cleanup)
+        self.temporal = temporal.name
+        ajustes = override_settings(
+            CACHE_RESPUESTAS={**settings.CACHE_RESPUESTAS, 'VERSIONES_DIR': os.path.join(self.temporal, 'versiones')},
+            CACHES={**settings.CACHES, 'respuestas': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}},
+            EXPORTACION={**settings.EXPORTACION, 'DIR': os.path.join(self.temporal, 'exportaciones')},
+        )
+        ajustes.enable()
+        self.addCleanup(ajustes.disable)
+
+
+class CacheColumnarTests(SimpleTestCase):
+    def setUp(self):
+        self.directorio = tempfile.TemporaryDirectory()
+        self.addCleanup(self.directorio.cleanup)
+        self.ruta_csv = os.path.join(self.directorio.name, 'cultivos.csv')
+
+    def escribir(self, *lineas):
+        with open(self.ruta_csv, 'a', encoding='utf-8') as f:
+            if f.tell() == 0:
+                f.write(ENCABEZADO_CSV)
+            for linea in lineas:
+                f.write(linea + '\n')
+
+    def cache(self):
+        return CacheColumnar(self.ruta_csv, os.path.join(self.directorio.name, 'cache'))
+
+    def test_fechas_con_y_sin_zona_en_el_mismo_csv(self):
+        self.escribir(
+            '2025-01-01 10:00,20,500,70,70,0,Si,No,No,No,No',
+            '2025-01-01T11:00:00Z,21,500,70,70,0,Si,No,No,No,No',
+        )
+        frame = self.cache().frame()
+
+        # Sin zona es hora local (TIME_ZONE, UTC-5); con 'Z' es UTC
+        self.assertEqual(
+            [fecha.isoformat() for fecha in frame.index.tz_convert('UTC')],
+            ['2025-01-01T15:00:00+00:00', '2025-01-01T11:00:00+00:00'],
+        )
+
+    def test_refresco_despues_de_una_fecha_con_offset(self):
+        cache = self.cache()
+        self.escribir('2025-01-01 10:00,20,500,70,70,0,Si,No,No,No,No')
+        self.assertEqual(len(cache.frame()), 1)
+
+        self.escribir(
+            '2025-01-01T11:00:00-03:00,21,500,70,70,0,Si,No,No,No,No',
+            '2025-01-01 12:00,22,500,70,70,0,Si,No,No,No,No',
+        )
+        frame = cache.frame()
+        self.assertEqual(frame['temperatura'].tolist(), [20.0, 21.0, 22.0])
+
+    def test_fechas_invalidas_se_descartan(self):
+        self.escribir(
+            'no es fecha,20,500,70,70,0,Si,No,No,No,No',
+            '2025-01-01T11:00:00+00:00,21,500,70,70,0,Si,No,No,No,No',
+        )
+        self.assertEqual(self.cache().frame()['temperatura'].tolist(), [21.0])
+
+
+@mock.patch('api.exportaciones.iniciar_en_segundo_plano')
+class ExportacionReutilizadaTests(DirectorioTemporalMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        self.ana = crear_usuario('ana', 'profesor')
+        self.beto = crear_usuario('beto', 'profesor')
+        self.admin = crear_usuario('admin', 'administrativo')
+
+    def exportar(self, user):
+        response = self.client.post(
+            '/api/exportaciones/', {'fuente': 'sensor'}, content_type='application/json', **cabecera_jwt(user)
+        )
+        return response.status_code, response.json()
+
+    def test_no_reutiliza_la_exportacion_de_otro_usuario(self, iniciar):
+        _, de_ana = self.exportar(self.ana)
+        codigo, de_beto = self.exportar(self.beto)
+
+        self.assertEqual(codigo, 202)
+        self.assertFalse(de_beto['reutilizada'])
+        self.assertNotEqual(de_beto['id'], de_ana['id'])
+        self.assertEqual(
+            self.client.get(f"/api/exportaciones/{de_beto['id']}/", **cabecera_jwt(self.beto)).status_code, 200
+        )
+
+    def test_reutiliza_la_propia_y_un_administrativo_cualquiera(self, iniciar):
+        _, primera = self.exportar(self.ana)
+        codigo, segunda = self.exportar(self.ana)
+        self.assertEqual((codigo, segunda['reutilizada'], segunda['id']), (200, True, primera['id']))
+
+        _, del_admin = self.exportar(self.admin)
+        self.assertTrue(del_admin['reutilizada'])
+
+    def test_un_cambio_en_el_lugar_invalida_la_reutilizacion(self, iniciar):
+        _, primera = self.exportar(self.ana)
+        _incrementar('lecturas')  # p. ej. la cuarentena de calidad
+        _, segunda = self.exportar(self.ana)
+
+        self.assertFalse(segunda['reutilizada'])
+        self.assertNotEqual(segunda['id'], primera['id'])
+
+
+class ModeloReglasVersionTests(DirectorioTemporalMixin, TestCase):
+    def test_un_cambio_de_rangos_invalida_la_cache_de_predicciones(self):
+        servicio = ServicioPrediccion(ruta=os.path.join(self.temporal, 'no_existe.pkl'))
+        entrada = [25, 500, 70, 75, 0]
+
+        _, desde_cache = servicio.predecir(entrada)
+        version = servicio.version
+        self.assertFalse(desde_cache)
+        self.assertTrue(servicio.predecir(entrada)[1])
+
+        _incrementar('rangos')
+        _, desde_cache = servicio.predecir(entrada)
+        self.assertFalse(desde_cache)
+        self.assertNotEqual(servicio.version, version)
+
+
+@mock.patch('api.ingesta.escribir_filas', side_effect=lambda filas, ruta=None: len(filas))
+class DiarioIngestaTests(SimpleTestCase):
+    def setUp(self):
+        directorio = tempfile.TemporaryDirectory()
+        self.addCleanup(directorio.cleanup)
+        self.diario_dir = directorio.name
+
+    def buffer(self):
+        buffer = BufferIngesta(tamano_lote=100, intervalo=0, diario_dir=self.diario_dir)
+        self.addCleanup(buffer._diario.close)
+        return buffer
+
+    def lineas_diario(self, buffer):
+        with open(buffer._diario.name, encoding='utf-8') as f:
+            return f.readlines()
+
+    def test_lo_encolado_sobrevive_a_la_caida_del_proceso(self, escribir):
+        caido = self.buffer()
+        caido.encolar([{'date': '2025-01-01 10:00'}, {'date': '2025-01-01 10:05'}])
+        self.assertEqual(len(self.lineas_diario(caido)), 2)
+        caido._diario.close()  # el proceso muere sin vaciar la cola
+
+        nuevo = self.buffer()
+        self.assertEqual(nuevo.pendientes(), 2)
+        self.assertEqual(os.listdir(self.diario_dir), [os.path.basename(nuevo._diario.name)])
+
+        self.assertEqual(nuevo.vaciar(), 2)
+        escribir.assert_called_with([{'date': '2025-01-01 10:00'}, {'date': '2025-01-01 10:05'}], None)
+        self.assertEqual(self.lineas_diario(nuevo), [])
+
+    def test_no_adopta_el_diario_de_un_proceso_vivo(self, escribir):
+        vivo = self.buffer()
+        vivo.encolar([{'date': '2025-01-01 10:00'}])
+
+        self.assertEqual(self.buffer().pendientes(), 0)
+        self.assertEqual(len(self.lineas_diario(vivo)), 1)
+
+    def test_un_lote_fallido_sigue_en_el_diario(self, escribir):
+        buffer = self.buffer()
+        buffer.encolar([{'date': '2025-01-01 10:00'}])
+        escribir.side_effect = OSError('disco lleno')
+
+        self.assertEqual(buffer.vaciar(), 0)
+        self.assertEqual(buffer.pendientes(), 1)
+        self.assertEqual(len(self.lineas_diario(buffer)), 1)
+
+    def test_cerrar_sin_pendientes_borra_el_diario(self, escribir):
+        buffer = self.buffer()
+        buffer.encolar([{'date': '2025-01-01 10:00'}])
+        buffer.cerrar()
+        self.assertEqual(os.listdir(self.diario_dir), [])
+
+
+class PendientesBaseDeDatosTests(DirectorioTemporalMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        self.ruta_csv = os.path.join(self.temporal, 'cultivos.csv')
+        self.pendientes = os.path.join(self.temporal, 'pendientes_bd.jsonl')
+        ajustes = override_settings(
+            INGESTA={**settings.INGESTA, 'PENDIENTES_BD': self.pendientes},
+            CALIDAD={**settings.CALIDAD, 'REVISAR_EN_INGESTA': False},
+        )
+        ajustes.enable()
+        self.addCleanup(ajustes.disable)
+
+    def fila(self, hora):
+        return construir_fila({'fecha': f'2025-01-01T{hora}:00:00-05:00', 'temperatura': 20, 'fuente': 'sensor'})
+
+    def test_un_lote_que_la_base_rechaza_se_guarda_con_el_siguiente(self):
+        with mock.patch('api.ingesta.persistir_filas', side_effect=DatabaseError('base caída')):
+            self.assertEqual(escribir_filas([self.fila('10')], self.ruta_csv), 1)
+        self.assertEqual(DatosMeteorologicos.objects.count(), 0)
+        with open(self.pendientes, encoding='utf-8') as f:
+            self.assertEqual(len(f.readlines()), 1)
+
+        escribir_filas([self.fila('11')], self.ruta_csv)
+
+        self.assertEqual(DatosMeteorologicos.objects.filter(fuente='sensor').count(), 2)
+        self.assertEqual(os.path.getsize(self.pendientes), 0)
+        with open(self.ruta_csv, encoding='utf-8') as f:
+            self.assertEqual(len(f.readlines()), 3)  # encabezado y cada fila una sola vez
+
+
+class ImportarLecturasTests(DirectorioTemporalMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        self.ruta_csv = os.path.join(self.temporal, 'cultivos.csv')
+        with open(self.ruta_csv, 'w', encoding='utf-8') as f:
+            f.write(ENCABEZADO_CSV)
+            f.write('2025-01-01 10:00,20,500,70,70,0,Si,No,No,No,No\n')
+            f.write('2025-01-01 11:00,21,500,70,70,0,Si,No,No,No,No\n')
+            f.write('2025-01-01 11:00,21,500,70,70,0,Si,No,No,No,No\n')
+            f.write('2025-01-01 12:00,22,500,70,70,0,Si,No,No,No,No\n')
+        # La ingesta ya guardó la de las 10:00 (sin fuente en la fila: 'sensor')
+        persistida = DatosMeteorologicos.desde_fila({'date': '2025-01-01 10:00', 'temperatura': '20'})
+        persistida.save()
+
+    def importar(self):
+        call_command('importar_lecturas', archivo=self.ruta_csv, lote=2, stdout=StringIO())
+
+    def test_no_duplica_lo_guardado_por_la_ingesta_ni_filas_repetidas(self):
+        self.importar()
+
+        self.assertEqual(DatosMeteorologicos.objects.filter(fuente='sensor').count(), 1)
+        self.assertEqual(
+            sorted(t.hour for t in DatosMeteorologicos.objects.filter(fuente='csv').values_list('timestamp', flat=True)),
+            [16, 17],  # 11:00 y 12:00 en UTC-5
+        )
+
+    def test_volver_a_importar_no_agrega_nada(self):
+        self.importar()
+        self.importar()
+        self.assertEqual(DatosMeteorologicos.objects.count(), 3)
+
+
+class CuarentenaAlLeerTests(SimpleTestCase):
+    def setUp(self):
+        directorio = tempfile.TemporaryDirectory()
+        self.addCleanup(directorio.cleanup)
+        ajustes = override_settings(CALIDAD={
+            **settings.CALIDAD, 'CUARENTENA': os.path.join(directorio.name, 'cuarentena.jsonl'),
+        })
+        ajustes.enable()
+        self.addCleanup(ajustes.disable)
+
+        self.fechas = pd.date_range('2025-01-01 10:00', periods=3, freq='5min', tz='America/Guayaquil')
+        self.frame = pd.DataFrame({'temperatura': [20.0, 80.0, 21.0], 'humedad': [70.0, 70.0, 70.0]}, index=self.fechas)
+
+    def test_sin_cuarentena_retorna_el_mismo_frame(self):
+        self.assertIs(aplicar_cuarentena(self.frame), self.frame)
+
+    def test_quita_los_valores_anotados_por_fecha_y_metrica(self):
+        # La fecha se anota en hora local; el frame puede venir en cualquier zona
+        registrar_cuarentena([_entrada_cuarentena(self.fechas[1].to_pydatetime(), 'sensor', 'temperatura', 80.0, PICO)])
+
+        limpio = aplicar_cuarentena(self.frame.tz_convert('UTC'))
+        self.assertEqual(limpio['temperatura'].isna().tolist(), [False, True, False])
+        self.assertFalse(limpio['humedad'].isna().any())
+        self.assertEqual(self.frame['temperatura'].tolist(), [20.0, 80.0, 21.0])
+
+        # Una entrada nueva se ve sin reiniciar el proceso
+        registrar_cuarentena([
+            _entrada_cuarentena(datetime(2025, 1, 1, 15, 10, tzinfo=dt_timezone.utc), 'sensor', 'humedad', 70.0, PLANO)
+        ])
+        self.assertEqual(aplicar_cuarentena(self.frame)['humedad'].isna().tolist(), [False, False, True])
+
+
+class ApiClimaSimulada(ThreadingHTTPServer):
+    """API externa en un hilo que responde una lista de (codigo, encabezados, cuerpo)"""
+
+    daemon_threads = True
+
+    def __init__(self, respuestas):
+        self.respuestas = list(respuestas)
+        self.recibidos = []
+
+        class Manejador(BaseHTTPRequestHandler):
+            def do_GET(manejador):
+                self.recibidos.append(dict(manejador.headers))
+                codigo, encabezados, cuerpo = self.respuestas.pop(0)
+                cuerpo = json.dumps(cuerpo).encode() if cuerpo is not None else b''
+                manejador.send_response(codigo)
+                for clave, valor in encabezados.items():
+                    manejador.send_header(clave, valor)
+                manejador.send_header('Content-Length', str(len(cuerpo)))
+                manejador.end_headers()
+                manejador.wfile.write(cuerpo)
+
+            def log_message(manejador, *args):
+                pass
+
+        super().__init__(('127.0.0.1', 0), Manejador)
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+
+    @property
+    def url(self):
+        return f'http://127.0.0.1:{self.server_port}/api_clima.php'
+
+
+class Esperas:
+    """Reemplaza al threading.Event de ejecutar() y anota cada espera"""
+
+    def __init__(self):
+        self.esperas = []
+
+    def is_set(self):
+        return False
+
+    def wait(self, segundos):
+        self.esperas.append(segundos)
+
+
+REGISTROS_CLIMA = [
+    {'id': '1', 'temperatura': '28.9', 'humedad': '63', 'lluvia': '0', 'uv': '2', 'fecha': '2025-11-20 21:15:07'},
+    {'id': '2', 'temperatura': '29.1', 'humedad': '62', 'lluvia': '0', 'uv': '3', 'fecha': '2025-11-20 21:20:07'},
+    {'id': '2', 'temperatura': '29.1', 'humedad': '62', 'lluvia': '0', 'uv': '3', 'fecha': '2025-11-20 21:20:07'},
+]
+
+
+@override_settings(CALIDAD={**settings.CALIDAD, 'REVISAR_EN_INGESTA': False})
+@mock.patch('api.sincronizacion.close_old_connections')
+class SincronizadorClimaTests(DirectorioTemporalMixin, TestCase):
+    def sincronizador(self, api, estado='estado.json'):
+        return SincronizadorClima(url=api.url, api_key='', timeout=5, ruta_estado=os.path.join(self.temporal, estado))
+
+    def api(self, respuestas):
+        api = ApiClimaSimulada(respuestas)
+        self.addCleanup(api.server_close)
+        self.addCleanup(api.shutdown)
+        return api
+
+    def test_backoff_retry_after_y_peticion_condicional(self, cerrar_conexiones):
+        api = self.api([
+            (503, {'Retry-After': '30'}, None),
+            (500, {}, None),
+            (200, {'ETag': '"v1"'}, REGISTROS_CLIMA),
+            (304, {}, None),
+        ])
+        esperas = Esperas()
+        with override_settings(SINCRONIZACION={**settings.SINCRONIZACION, 'BACKOFF_BASE': 5, 'INTERVALO': 300}):
+            self.sincronizador(api).ejecutar(detener=esperas, iteraciones=4)
+
+        self.assertEqual(esperas.esperas[0], 30)  # Retry-After manda sobre el backoff
+        self.assertTrue(5 <= esperas.esperas[1] <= 10)  # segundo fallo seguido: base * 2 con jitter
+        self.assertEqual(esperas.esperas[2], 300)
+        self.assertEqual(api.recibidos[3].get('If-None-Match'), '"v1"')
+        self.assertEqual(cerrar_conexiones.call_count, 4)
+        self.assertEqual(DatosMeteorologicos.objects.filter(fuente='api_externa').count(), 2)
+
+    def test_no_guarda_dos_veces_el_mismo_id_externo(self, cerrar_conexiones):
+        api = self.api([(200, {}, REGISTROS_CLIMA), (200, {}, REGISTROS_CLIMA), (200, {}, REGISTROS_CLIMA)])
+
+        sincronizador = self.sincronizador(api)
+        self.assertEqual(sincronizador.sincronizar(), 2)
+        self.assertEqual(sincronizador.sincronizar(), 0)
+        # Un proceso nuevo (sin ids recordados ni validadores) tampoco los repite
+        self.assertEqual(self.sincronizador(api, 'otro_estado.json').sincronizar(), 0)
+        self.assertEqual(DatosMeteorologicos.objects.filter(fuente='api_externa').count(), 2)
+
+
+class DifusorTests(SimpleTestCase):
+    def test_buffer_vacio_solo_acepta_el_id_actual(self):
+        difusor = Difusor(capacidad=2)
+        actual = difusor.ultimo_id
+
+        self.assertEqual(difusor.desde(actual), ([], True))
+        # Id de antes de reiniciar el proceso: lo publicado entre medio se perdió
+        self.assertEqual(difusor.desde(actual - 5), ([], False))
+        # Id de otro proceso, más nuevo que este
+        self.assertEqual(difusor.desde(actual + 5), ([], False))
+
+    def test_eventos_que_salieron_del_buffer(self):
+        difusor = Difusor(capacidad=2)
+        inicio = difusor.ultimo_id
+        difusor.publicar([{'n': 1}, {'n': 2}, {'n': 3}])
+
+        eventos, completo = difusor.desde(inicio + 1)
+        self.assertEqual(([datos['n'] for _, datos in eventos], completo), ([2, 3], True))
+        self.assertFalse(difusor.desde(inicio)[1])
+        self.assertEqual(difusor.desde(inicio + 3), ([], True))
+        self.assertFalse(difusor.desde(inicio + 4)[1])
+
+
+@mock.patch('api.routers.alias_replica', return_value='replica')
+class ReplicaRouterTests(TransactionTestCase):
+    """Decisiones del router sin una réplica real (TransactionTestCase: fuera de atomic)"""
+
+    def rutear(self, request, escribir=False):
+        router = ReplicaRouter()
+        alias = []
+
+        def vista(request):
+            if escribir:
+                router.db_for_write(DatosMeteorologicos)
+            alias.append(router.db_for_read(DatosMeteorologicos))
+            return HttpResponse()
+
+        response = ReplicaMiddleware(vista)(request)
+        return alias[0] or 'default', response
+
+    def test_get_lee_de_la_replica(self, alias_replica):
+        self.assertEqual(self.rutear(RequestFactory().get('/api/clima/'))[0], 'replica')
+
+    def test_post_y_lectura_despues_de_escribir_van_a_la_primaria(self, alias_replica):
+        self.assertEqual(self.rutear(RequestFactory().post('/api/clima/'))[0], 'default')
+
+        alias, response = self.rutear(RequestFactory().get('/api/clima/'), escribir=True)
+        self.assertEqual(alias, 'default')
+        self.assertIn(settings.REPLICA['COOKIE'], response.cookies)
+
+    def test_la_cookie_mantiene_al_cliente_en_la_primaria(self, alias_replica):
+        request = RequestFactory().get('/api/clima/')
+        request.COOKIES[settings.REPLICA['COOKIE']] = str(int(time.time()) + 60)
+        self.assertEqual(self.rutear(request)[0], 'default')
+
+        request.COOKIES[settings.REPLICA['COOKIE']] = str(int(time.time()) - 1)
+        self.assertEqual(self.rutear(request)[0], 'replica')
+
+    def test_dentro_de_atomic_lee_de_la_primaria(self, alias_replica):
+        with transaction.atomic():
+            self.assertEqual(self.rutear(RequestFactory().get('/api/clima/'))[0], 'default')
+
+    def test_fuera_de_un_request_todo_va_a_la_primaria(self, alias_replica):
+        self.assertIsNone(ReplicaRouter().db_for_read(DatosMeteorologicos))
+
+
+HAY_REPLICA = 'replica' in settings.DATABASES
+
+
+@unittest.skipUnless(HAY_REPLICA, 'Sin réplica configurada (DB_REPLICA_NAME o DB_REPLICA_HOST)')
+class ReplicaEnRequestsTests(DirectorioTemporalMixin, TransactionTestCase):
+    """Con la réplica configurada (en los tests es espejo de la primaria)"""
+
+    # El runner prepara las bases de todos los tests, también de los omitidos
+    databases = {'default', 'replica'} if HAY_REPLICA else {'default'}
+
+    def consultas(self, alias, funcion):
+        with CaptureQueriesContext(connections[alias]) as capturadas:
+            funcion()
+        return len(capturadas)
+
+    def get_clima(self, limite):
+        return self.client.get(f'/api/clima/?limite={limite}')
+
+    def test_lecturas_en_la_replica_y_escrituras_en_la_primaria(self):
+        self.assertGreater(self.consultas('replica', lambda: self.get_clima(1)), 0)
+
+        admin = crear_usuario('admin', 'administrativo')
+        crear = lambda: self.client.post(
+            '/api/crear-usuario/',
+            {'nombre': 'Ana', 'email': 'ana@ejemplo.com', 'password': 'clave-12345'},
+            content_type='application/json', **cabecera_jwt(admin),
+        )
+        self.assertEqual(self.consultas('replica', crear), 0)
+        self.assertIn(settings.REPLICA['COOKIE'], self.client.cookies)
+
+        # La cookie de pegajosidad: el mismo cliente lee de la primaria
+        self.assertEqual(self.consultas('replica', lambda: self.get_clima(2)), 0)
+
+        self.client.cookies.pop(settings.REPLICA['COOKIE'])
+        with transaction.atomic():
+            self.assertEqual(self.consultas('replica', lambda: self.get_clima(3)), 0)
+
+
+class RespuestaArchivoTests(SimpleTestCase):
+    def setUp(self):
+        directorio = tempfile.TemporaryDirectory()
+        self.addCleanup(directorio.cleanup)
+        self.ruta = os.path.join(directorio.name, 'lecturas.csv')
+        with open(self.ruta, 'wb') as f:
+            f.write(b'0123456789')
+
+    def pedir(self, **encabezados):
+        response = respuesta_archivo(RequestFactory().get('/', **encabezados), self.ruta, 'lecturas.csv')
+        self.addCleanup(response.close)
+        return response
+
+    def cuerpo(self, response):
+        return b''.join(response.streaming_content) if response.streaming else response.content
+
+    def test_sin_range_envia_todo(self):
+        response = self.pedir()
+        self.assertEqual((response.status_code, self.cuerpo(response)), (200, b'0123456789'))
+        self.assertEqual(response['Accept-Ranges'], 'bytes')
+
+    def test_rangos_de_un_tramo(self):
+        for rango, porcion, content_range in [
+            ('bytes=2-4', b'234', 'bytes 2-4/10'),
+            ('bytes=7-', b'789', 'bytes 7-9/10'),
+            ('bytes=-3', b'789', 'bytes 7-9/10'),
+            ('bytes=8-50', b'89', 'bytes 8-9/10'),
+        ]:
+            with self.subTest(rango=rango):
+                response = self.pedir(HTTP_RANGE=rango)
+                self.assertEqual(response.status_code, 206)
+                self.assertEqual(self.cuerpo(response), porcion)
+                self.assertEqual(response['Content-Range'], content_range)
+                self.assertEqual(response['Content-Length'], str(len(porcion)))
+
+    def test_rango_fuera_del_archivo_responde_416(self):
+        for rango in ('bytes=10-', 'bytes=5-2', 'bytes=-0'):
+            with self.subTest(rango=rango):
+                response = self.pedir(HTTP_RANGE=rango)
+                self.assertEqual(response.status_code, 416)
+                self.assertEqual(response['Content-Range'], 'bytes */10')
+
+    def test_varios_rangos_envian_el_archivo_completo(self):
+        self.assertEqual(self.pedir(HTTP_RANGE='bytes=0-1,4-5').status_code, 200)
+
+    def test_if_range(self):
+        etag = self.pedir()['ETag']
+        self.assertEqual(self.pedir(HTTP_RANGE='bytes=0-1', HTTP_IF_RANGE=etag).status_code, 206)
+
+        # Otra versión del archivo: se reenvía completo
+        response = self.pedir(HTTP_RANGE='bytes=0-1', HTTP_IF_RANGE='"otro"')
+        self.assertEqual((response.status_code, self.cuerpo(response)), (200, b'0123456789'))
+
+
+HORA_NS = 3600 * 10 ** 9
+
+
+class AgregacionTests(SimpleTestCase):
+    def setUp(self):
+        dia = pd.Timestamp('2025-01-01').value
+        # 00:10, 00:20 y 02:30: la cubeta de la 01:00 queda vacía
+        self.fechas = np.array([dia + HORA_NS // 6, dia + HORA_NS // 3, dia + 5 * HORA_NS // 2], dtype=np.int64)
+        self.valores = np.array([[1.0, np.nan], [3.0, 4.0], [5.0, np.nan]])
+        self.dia = dia
+
+    def test_agrupar_por_hora(self):
+        inicio, resultado = agrupar(self.fechas, self.valores, HORA_NS)
+
+        self.assertEqual(inicio, self.dia)
+        np.testing.assert_array_equal(resultado['cantidad'], [[2, 1], [0, 0], [1, 0]])
+        np.testing.assert_array_equal(resultado['promedio'], [[2.0, 4.0], [np.nan, np.nan], [5.0, np.nan]])
+        np.testing.assert_array_equal(resultado['minimo'], [[1.0, 4.0], [np.nan, np.nan], [5.0, np.nan]])
+        np.testing.assert_array_equal(resultado['maximo'], [[3.0, 4.0], [np.nan, np.nan], [5.0, np.nan]])
+        np.testing.assert_array_equal(resultado['suma'], [[4.0, 4.0], [np.nan, np.nan], [5.0, np.nan]])
+
+    def test_agrupar_sin_filas(self):
+        inicio, resultado = agrupar(np.array([], dtype=np.int64), np.empty((0, 2)), HORA_NS)
+        self.assertIsNone(inicio)
+        self.assertEqual(resultado['promedio'].shape, (0, 2))
+
+    def test_agrupar_limita_los_intervalos(self):
+        with override_settings(ESTADISTICAS={**settings.ESTADISTICAS, 'MAXIMO_INTERVALOS': 2}):
+            with self.assertRaises(ValueError):
+                agrupar(self.fechas, self.valores, HORA_NS)
+
+    def test_promedio_movil_ignora_cubetas_vacias(self):
+        valores = np.array([[1.0, np.nan], [np.nan, np.nan], [3.0, np.nan], [5.0, 2.0]])
+        np.testing.assert_array_equal(
+            promedio_movil(valores, 2),
+            [[1.0, np.nan], [1.0, np.nan], [3.0, np.nan], [4.0, 2.0]],
+        )
+
+
+MINUTO_NS = 60 * 10 ** 9
+
+
+class DetectoresCalidadTests(SimpleTestCase):
+    def test_picos(self):
+        valores = np.array([20.0, 20.5, 20.2, 20.4, 20.1, 35.0, 20.3, 20.6, 20.2, 20.4, 20.5])
+        np.testing.assert_array_equal(np.flatnonzero(detectar_picos(valores, 5, 4, 3)), [5])
+        # Bajo el mínimo absoluto de la métrica no es pico
+        self.assertFalse(detectar_picos(valores, 5, 4, 20).any())
+
+    def test_planos(self):
+        fechas = np.arange(6, dtype=np.int64) * 10 * MINUTO_NS
+        valores = np.array([20.0, 21.0, 21.0, 21.0, 21.0, 22.0])
+
+        # 21.0 desde el minuto 10 al 40: se marca todo salvo la primera
+        np.testing.assert_array_equal(np.flatnonzero(detectar_planos(fechas, valores, 30)), [2, 3, 4])
+        self.assertFalse(detectar_planos(fechas, valores, 31).any())
+        # NaN nunca cuenta como valor repetido
+        self.assertFalse(detectar_planos(fechas, np.full(6, np.nan), 10).any())
+
+    def test_huecos(self):
+        fechas = np.array([0, 5, 10, 45, 50], dtype=np.int64) * MINUTO_NS
+        np.testing.assert_array_equal(np.flatnonzero(detectar_huecos(fechas, 30)), [3])
+        self.assertFalse(detectar_huecos(fechas, 35).any())
+
+
+class ConexionFalsa:
+    def __init__(self):
+        self.cerrada = False
+
+    def close(self):
+        self.cerrada = True
+
+
+class PoolConexionesTests(SimpleTestCase):
+    def test_devuelve_hasta_el_tamano_y_descarta_el_resto(self):
+        pool = PoolConexiones(tamano=1, edad_maxima=60, ping_inactiva=30)
+        primera, segunda = ConexionFalsa(), ConexionFalsa()
+        pool.registrar(primera)
+        pool.registrar(segunda)
+
+        self.assertTrue(pool.devolver(primera))
+        self.assertFalse(pool.devolver(segunda))
+        self.assertTrue(segunda.cerrada)
+        self.assertIs(pool.tomar(lambda conexion: True), primera)
+        self.assertIsNone(pool.tomar(lambda conexion: True))
+
+    def test_descarta_las_viejas_y_las_que_no_responden(self):
+        pool = PoolConexiones(tamano=5, edad_maxima=0, ping_inactiva=30)
+        vieja = ConexionFalsa()
+        pool.registrar(vieja)
+        self.assertFalse(pool.devolver(vieja))
+        self.assertTrue(vieja.cerrada)
+
+        pool = PoolConexiones(tamano=5, edad_maxima=60, ping_inactiva=0)
+        caida = ConexionFalsa()
+        pool.registrar(caida)
+        pool.devolver(caida)
+        self.assertIsNone(pool.tomar(lambda conexion: False))
+        self.assertTrue(caida.cerrada)
+        self.assertEqual(pool.estadisticas()['descartadas'], 1)
+
+    def test_no_devuelve_conexiones_no_registradas(self):
+        pool = PoolConexiones(tamano=5, edad_maxima=60, ping_inactiva=30)
+        self.assertFalse(pool.devolver(ConexionFalsa()))
+
+
+@override_settings(DB_POOL={**settings.DB_POOL, 'TAMANO': 2})
+class ConexionEnPoolTests(SimpleTestCase):
+    def setUp(self):
+        directorio = tempfile.TemporaryDirectory()
+        self.addCleanup(directorio.cleanup)
+        ajustes = {**connections['default'].settings_dict, 'NAME': os.path.join(directorio.name, 'pool.sqlite3')}
+        self.base = SQLiteEnPool(ajustes, alias='pool_prueba')
+        self.pool = get_pool(self.base.settings_dict)
+        self.addCleanup(self.pool.vaciar)
+        self.addCleanup(self.base.close)
+
+    def cerrar_con(self, **estado):
+        """Ejecuta _close con el estado indicado; retorna la conexión cruda"""
+        self.base.ensure_connection()
+        cruda = self.base.connection
+        for atributo, valor in estado.items():
+            setattr(self.base, atributo, valor)
+        try:
+            self.base._close()
+        finally:
+            self.base.connection = None
+            self.base.in_atomic_block = False
+            self.base.errors_occurred = False
+        return cruda
+
+    def sigue_abierta(self, cruda):
+        try:
+            cruda.execute('SELECT 1')
+        except Exception:
+            return False
+        return True
+
+    def test_la_conexion_vuelve_al_pool_y_se_reutiliza(self):
+        cruda = self.cerrar_con()
+        self.assertTrue(self.sigue_abierta(cruda))
+        self.assertEqual(self.pool.estadisticas()['inactivas'], 1)
+
+        self.base.ensure_connection()
+        self.assertIs(self.base.connection, cruda)
+        self.assertEqual(self.pool.estadisticas()['reutilizadas'], 1)
+
+    def test_se_descartan_en_transaccion_con_errores_o_sin_autocommit(self):
+        for estado in ({'in_atomic_block': True}, {'errors_occurred': True}, {'autocommit': False}):
+            with self.subTest(**estado):
+                cruda = self.cerrar_con(**estado)
+                self.assertFalse(self.sigue_abierta(cruda))
+                self.assertEqual(self.pool.estadisticas()['inactivas'], 0)
+                self.base.autocommit = True
+
+    @override_settings(DB_POOL={**settings.DB_POOL, 'TAMANO': 0})
+    def test_sin_pool_cierra_como_django(self):
+        cruda = self.cerrar_con()
+        self.assertFalse(self.sigue_abierta(cruda))
+        self.assertEqual(self.pool.estadisticas()['creadas'], 0)
+
+
+class EjecutorEnHilo:
+    """Sustituto de ProcessPoolExecutor: map en el mismo proceso"""
+
+    creados = 0
+
+    def __init__(self, **kwargs):
+        EjecutorEnHilo.creados += 1
+
+    def map(self, funcion, iterable, chunksize=1):
+        return map(funcion, iterable)
+
+    def shutdown(self, wait=True, cancel_futures=False):
+        pass
+
+
+@override_settings(
+    INSCRIPCION={**settings.INSCRIPCION, 'PROCESOS': 2, 'MINIMO_PARA_POOL': 2},
+    PASSWORD_HASHERS=['django.contrib.auth.hashers.MD5PasswordHasher'],
+)
+@mock.patch('api.inscripcion.ProcessPoolExecutor', EjecutorEnHilo)
+class PoolHashTests(SimpleTestCase):
+    def setUp(self):
+        EjecutorEnHilo.creados = 0
+        inscripcion._descartar_pool_hash()
+        self.addCleanup(inscripcion._descartar_pool_hash)
+
+    def test_el_pool_se_crea_una_vez_por_proceso(self):
+        for _ in range(3):
+            hashes = inscripcion.hashear_contrasenas(['clave-123', 'clave-456'])
+        self.assertEqual(EjecutorEnHilo.creados, 1)
+        self.assertTrue(check_password('clave-456', hashes[1]))
+
+    def test_un_pool_roto_se_reemplaza(self):
+        with mock.patch.object(EjecutorEnHilo, 'map', side_effect=inscripcion.BrokenProcessPool('murió')):
+            hashes = inscripcion.hashear_contrasenas(['clave-123', 'clave-456'])
+        self.assertTrue(check_password('clave-123', hashes[0]))
+
+        inscripcion.hashear_contrasenas(['clave-123', 'clave-456'])
+        self.assertEqual(EjecutorEnHilo.creados, 2)
+
+
+class MeTests(DirectorioTemporalMixin, TestCase):
+    def test_refleja_cambios_de_nombre_y_email_sin_nuevo_token(self):
+        user = crear_usuario('ana', 'profesor')
+        cabecera = cabecera_jwt(user)
+        self.assertEqual(self.client.get('/api/me/', **cabecera).json()['email'], 'ana@ejemplo.com')
+
+        with self.captureOnCommitCallbacks(execute=True):
+            user.email = 'ana.perez@ejemplo.com'
+            user.first_name = 'Ana'
+            user.save()
+
+        datos = self.client.get('/api/me/', **cabecera).json()
+        self.assertEqual((datos['email'], datos['first_name'], datos['rol']), ('ana.perez@ejemplo.com', 'Ana', 'profesor'))
@@ -1,10 +1,13 @@
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
 from rest_framework_simplejwt.views import TokenRefreshView
-from . import views
+from . import views, vistas_async
 
 router = DefaultRouter()
 router.register(r'usuarios', views.UsuarioViewSet, basename='usuario')
+router.register(r'lecturas', views.LecturaViewSet, basename='lectura')
+router.register(r'rangos-cultivo', views.RangoCultivoViewSet, basename='rango-cultivo')
+router.register(r'exportaciones', views.ExportacionViewSet, basename='exportacion')
 
 app_name = 'api'
 
@@ -17,14 +20,33 @@ urlpatterns = [
     
     # Usuarios
     path('crear-usuario/', views.crear_usuario_endpoint, name='crear-usuario'),
+    path('crear-usuarios-lote/', views.crear_usuarios_lote, name='crear-usuarios-lote'),
+    path('cache-roles/', views.estadisticas_cache_roles, name='cache-roles'),
+    path('metricas/', views.metricas_prometheus, name='metricas'),
     
     # CSV
     path('guardar-datos-csv/', views.guardar_datos_csv, name='guardar-datos-csv'),
+    path('guardar-datos-csv/lote/', views.guardar_datos_csv_lote, name='guardar-datos-csv-lote'),
     # path('api/proxy-clima/', views.proxy_clima, name='proxy-clima'),
     
+    # Lecturas
+    path('resumenes/', views.resumenes, name='resumenes'),
+    path('viabilidad/', views.viabilidad, name='viabilidad'),
+    path('estadisticas/', views.estadisticas, name='estadisticas'),
+    path('prediccion/', views.prediccion, name='prediccion'),
+    
+    # Clima (sincronizado desde la API externa)
+    path('clima/', views.obtener_clima, name='obtener_clima'),
+    
+    # Vistas asíncronas (modo ASGI: uvicorn config.asgi:application)
+    path('async/clima/proxy/', vistas_async.proxy_clima, name='async-proxy-clima'),
+    path('async/lecturas/exportar/', vistas_async.exportar_lecturas, name='async-exportar-lecturas'),
+    path('async/guardar-datos-csv/lote/', vistas_async.guardar_datos_lote, name='async-guardar-datos-csv-lote'),
+    path('async/lecturas/feed/', vistas_async.feed_lecturas, name='async-feed-lecturas'),
+    path('async/lecturas/nuevas/', vistas_async.nuevas_lecturas, name='async-nuevas-lecturas'),
+    
     # User profile
     path('me/', views.me, name='me'),
-     #path('clima/', views.obtener_clima, name='obtener_clima'),
 ]
 
 # from django.urls import path, include
@@ -0,0 +1,132 @@
+"""
+Motor de viabilidad de cultivos
+
+Cada métrica suma 1 si está dentro del rango óptimo del cultivo y baja
+linealmente hasta 0 cuando se aleja del rango una distancia igual a su
+ancho. El puntaje del cultivo es el promedio de las métricas disponibles
+(0 a 100). Todo se calcula con NumPy sobre arreglos completos: una
+ventana de lecturas se evalúa para todos los cultivos en una sola pasada.
+"""
+import threading
+
+import numpy as np
+from django.conf import settings
+
+from .cache_respuestas import version_datos
+from .ingesta import CULTIVOS
+from .models import RangoCultivo
+
+
+METRICAS_RANGO = ['temperatura', 'humedad', 'humedad_suelo', 'radiacion_solar']
+
+RANGOS_POR_DEFECTO = {
+    'tomate': {'temperatura': (18, 27), 'humedad': (60, 80), 'humedad_suelo': (60, 80), 'radiacion_solar': (400, 800)},
+    'banana': {'temperatura': (26, 30), 'humedad': (75, 90), 'humedad_suelo': (60, 80), 'radiacion_solar': (600, 1000)},
+    'cacao': {'temperatura': (21, 32), 'humedad': (70, 90), 'humedad_suelo': (60, 80), 'radiacion_solar': (400, 800)},
+    'arroz': {'temperatura': (20, 35), 'humedad': (70, 90), 'humedad_suelo': (70, 100), 'radiacion_solar': (600, 1000)},
+    'maiz': {'temperatura': (18, 30), 'humedad': (50, 80), 'humedad_suelo': (50, 75), 'radiacion_solar': (600, 1000)},
+}
+
+_rangos = None  # (version, minimos, maximos)
+_rangos_lock = threading.Lock()
+
+
+def cargar_rangos():
+    """
+    Retorna (minimos, maximos) con forma (cultivos, métricas).
+    Se cachean en el proceso bajo la versión de datos 'rangos', compartida
+    por todos los workers: guardar un RangoCultivo en cualquiera de ellos
+    hace que los demás los vuelvan a leer.
+    """
+    global _rangos
+    version = version_datos('rangos')
+    with _rangos_lock:
+        if _rangos is None or _rangos[0] != version:
+            configurados = {rango.cultivo: rango for rango in RangoCultivo.objects.all()}
+            minimos = np.empty((len(CULTIVOS), len(METRICAS_RANGO)))
+            maximos = np.empty_like(minimos)
+            for i, cultivo in enumerate(CULTIVOS):
+                rango = configurados.get(cultivo)
+                for j, metrica in enumerate(METRICAS_RANGO):
+                    if rango is not None:
+                        minimos[i, j] = getattr(rango, f'{metrica}_min')
+                        maximos[i, j] = getattr(rango, f'{metrica}_max')
+                    else:
+                        minimos[i, j], maximos[i, j] = RANGOS_POR_DEFECTO[cultivo][metrica]
+            _rangos = (version, minimos, maximos)
+        return _rangos[1:]
+
+
+def invalidar_rangos():
+    """Descarta los rangos de este proceso sin esperar al cambio de versión"""
+    global _rangos
+    with _rangos_lock:
+        _rangos = None
+
+
+def puntuar(columnas, rangos=None):
+    """
+    Calcula el puntaje de viabilidad (0-100) de cada cultivo.
+
+    columnas: {metrica: arreglo} con la misma longitud n
+    Retorna {cultivo: arreglo float de n} (NaN si no hay ninguna métrica)
+    """
+    minimos, maximos = rangos or cargar_rangos()
+    valores = np.column_stack([
+        np.asarray(columnas[metrica], dtype=np.float64) for metrica in METRICAS_RANGO
+    ])  # (n, métricas)
+
+    ancho = np.maximum(maximos - minimos, 1e-9)  # (cultivos, métricas)
+    v = valores[:, None, :]  # (n, 1, métricas)
+    distancia = np.maximum(minimos - v, 0) + np.maximum(v - maximos, 0)
+    puntaje_metrica = np.clip(1 - distancia / ancho, 0, 1)  # (n, cultivos, métricas)
+    puntaje_metrica[np.isnan(np.broadcast_to(v, puntaje_metrica.shape))] = np.nan
+
+    disponibles = np.sum(~np.isnan(puntaje_metrica), axis=2)
+    suma = np.nansum(puntaje_metrica, axis=2)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        puntajes = np.where(disponibles > 0, suma / disponibles * 100, np.nan)  # (n, cultivos)
+
+    return {cultivo: puntajes[:, i] for i, cultivo in enumerate(CULTIVOS)}
+
+
+def es_viable(puntajes):
+    """Arreglo booleano: puntaje >= VIABILIDAD['UMBRAL'] (NaN no es viable)"""
+    with np.errstate(invalid='ignore'):
+        return np.nan_to_num(puntajes, nan=-1) >= settings.VIABILIDAD['UMBRAL']
+
+
+def asignar_viabilidad(filas):
+    """Completa tomate/banana/cacao/arroz/maiz ('Si'/'No') de un lote de filas del CSV"""
+    if not filas:
+        return filas
+    columnas = {
+        metrica: np.array([_numero(fila.get(metrica)) for fila in filas], dtype=np.float64)
+        for metrica in METRICAS_RANGO
+    }
+    for cultivo, puntajes in puntuar(columnas).items():
+        viables = es_viable(puntajes)
+        for fila, viable in zip(filas, viables):
+            fila[cultivo] = 'Si' if viable else 'No'
+    return filas
+
+
+def resumen_viabilidad(columnas):
+    """Porcentaje de lecturas viables y puntaje promedio por cultivo"""
+    resultado = {}
+    for cultivo, puntajes in puntuar(columnas).items():
+        validos = ~np.isnan(puntajes)
+        total = int(validos.sum())
+        resultado[cultivo] = {
+            'lecturas': total,
+            'porcentaje_viable': round(float(es_viable(puntajes).sum()) / total * 100, 2) if total else None,
+            'puntaje_promedio': round(float(np.nanmean(puntajes)), 2) if total else None,
+        }
+    return resultado
+
+
+def _numero(valor):
+    try:
+        return float(valor)
+    except (TypeError, ValueError):
+        return np.nan
@@ -1,24 +1,52 @@
 import csv
+import hmac
 import requests
 import os
 import json
 from pathlib import Path
 
+import numpy as np
+
 from django.conf import settings
 from django.contrib.auth.models import User
-from django.http import JsonResponse, FileResponse
+from django.db import IntegrityError
+from django.db.models import Q
+from django.utils import timezone
+from django.utils.decorators import method_decorator
+from django.http import HttpResponse, JsonResponse, FileResponse, StreamingHttpResponse
 from django.views.decorators.http import require_http_methods
 from django.views.decorators.csrf import csrf_exempt
 
 from rest_framework import viewsets, status
-from rest_framework.decorators import api_view, permission_classes
+from rest_framework.decorators import action, api_view, permission_classes
+from rest_framework.exceptions import Throttled
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated, AllowAny
 from rest_framework_simplejwt.views import TokenObtainPairView
 from rest_framework_simplejwt.serializers import TokenObtainPairSerializer
 
-from .models import Usuario
-from .serializers import UsuarioSerializer
+from .authentication import claims_de_usuario
+from .backends import contador_fallos
+from .estadisticas import estadisticas_ventana, parsear_intervalo
+from .exportaciones import normalizar_filtros, respuesta_archivo, solicitar_exportacion
+from .historico import frame_completo
+from .inscripcion import inscribir_usuarios
+from .ingesta import (
+    CULTIVOS, METRICAS, construir_fila, get_buffer, leer_csv, leer_ndjson, procesar_carga_masiva
+)
+from .metricas import registro as registro_metricas
+from .lecturas import filtrar_lecturas, generar_csv, generar_jsonl, iterar_por_bloques
+from .cache_respuestas import cache_respuesta
+from .models import DatosMeteorologicos, ExportacionCSV, Prediccion, RangoCultivo, ResumenLecturas, Usuario, parsear_fecha
+from .prediccion import clave_entrada, entrada_desde_lecturas, get_servicio
+from .pagination import LecturaCursorPagination, UsuarioCursorPagination
+from .resumenes import GRANULARIDADES, resumen_como_dict
+from .roles import cache_roles, get_user_rol  # noqa: F401
+from .serializers import (
+    DatosMeteorologicosSerializer, ExportacionCSVSerializer, RangoCultivoSerializer, UsuarioSerializer
+)
+from .sincronizacion import FUENTE as FUENTE_CLIMA, leer_estado as leer_estado_sincronizacion
+from .viabilidad import METRICAS_RANGO, RANGOS_POR_DEFECTO, resumen_viabilidad
 
 
 # ============================================================================
@@ -28,16 +56,22 @@ from .serializers import UsuarioSerializer
 class CustomTokenObtainPairSerializer(TokenObtainPairSerializer):
     """Permite login con email o username"""
     
+    @classmethod
+    def get_token(cls, user):
+        """Agrega rol e is_superuser al token para autorizar sin consultar la BD"""
+        token = super().get_token(user)
+        for claim, valor in claims_de_usuario(user).items():
+            token[claim] = valor
+        return token
+    
     def validate(self, attrs):
-        username_or_email = attrs.get('username')
-        password = attrs.get('password')
-        
-        # Intentar buscar por email
-        try:
-            user = User.objects.get(email=username_or_email)
-            attrs['username'] = user.username
-        except User.DoesNotExist:
-            pass
+        # EmailOUsernameBackend resuelve email o username en una sola consulta
+        espera = contador_fallos.espera(attrs.get('username'))
+        if espera:
+            raise Throttled(
+                wait=espera,
+                detail='Demasiados intentos fallidos, intenta más tarde'
+            )
         
         return super().validate(attrs)
 
@@ -51,15 +85,8 @@ class CustomTokenObtainPairView(TokenObtainPairView):
 # FUNCIÓN AUXILIAR
 # ============================================================================
 
-def get_user_rol(user):
-    """Obtiene el rol del usuario"""
-    if user.is_superuser:
-        return 'administrativo'
-    try:
-        usuario = Usuario.objects.get(user=user)
-        return usuario.rol
-    except Usuario.DoesNotExist:
-        return 'estudiante'
+# get_user_rol vive en roles.py (cache LRU); se reexporta por compatibilidad.
+# Dentro de las vistas se usa request.rol (RolMiddleware), resuelto una vez por request.
 
 
 # ============================================================================
@@ -67,23 +94,45 @@ def get_user_rol(user):
 # ============================================================================
 
 class UsuarioViewSet(viewsets.ReadOnlyModelViewSet):
-    """API para ver usuarios"""
+    """
+    API para ver usuarios
+
+    GET /api/usuarios/?rol=estudiante&nombre=ana&limite=100
+    Paginado por cursor; nombre filtra por prefijo de nombre o username.
+    """
     queryset = Usuario.objects.all()
     serializer_class = UsuarioSerializer
     permission_classes = [IsAuthenticated]
+    pagination_class = UsuarioCursorPagination
+    
+    @method_decorator(cache_respuesta('rol', ['usuarios']))
+    def list(self, request, *args, **kwargs):
+        return super().list(request, *args, **kwargs)
     
     def get_queryset(self):
-        rol = get_user_rol(self.request.user)
+        rol = self.request.rol
+        queryset = Usuario.objects.select_related('user')
         
         if rol == 'estudiante':
-            return Usuario.objects.filter(user=self.request.user)
+            return queryset.filter(user_id=self.request.user.id)
         elif rol == 'profesor':
-            return Usuario.objects.filter(rol='estudiante')
-        return Usuario.objects.all()
+            queryset = queryset.filter(rol='estudiante')
+        
+        filtro_rol = self.request.query_params.get('rol')
+        if filtro_rol:
+            queryset = queryset.filter(rol=filtro_rol)
+        
+        # Prefijo (LIKE 'texto%') para que use los índices de first_name y username
+        nombre = self.request.query_params.get('nombre', '').strip()
+        if nombre:
+            queryset = queryset.filter(
+                Q(user__first_name__istartswith=nombre) | Q(user__username__istartswith=nombre)
+            )
+        return queryset
     
     def destroy(self, request, pk=None):
         """Elimina un usuario (solo para administrativos)"""
-        rol = get_user_rol(request.user)
+        rol = request.rol
         if rol != 'administrativo':
             return Response(
                 {'error': 'Solo administradores pueden eliminar usuarios'},
@@ -125,38 +174,48 @@ class UsuarioViewSet(viewsets.ReadOnlyModelViewSet):
 # ⭐ CLIMA - ENDPOINTS
 # ============================================================================
 
-# ❌ COMENTADO - Endpoint ngrok expirado
-# @api_view(['GET'])
-# @permission_classes([AllowAny])
-# def obtener_clima(request):
-#     """
-#     Obtiene datos del clima desde el endpoint externo
-#     
-#     GET /api/clima/
-#     
-#     Retorna los datos sin problemas de CORS
-#     """
-#     try:
-#         print('🔄 Consumiendo endpoint clima...')
-#         
-#         response = requests.get(
-#             'https://86b6d4e6c656.ngrok-free.app/api_clima.php',
-#             timeout=10,
-#             headers={'Accept': 'application/json'}
-#         )
-#         
-#         response.raise_for_status()
-#         datos = response.json()
-#         
-#         print(f'✅ Datos recibidos: {len(datos)} registros')
-#         return Response(datos, status=status.HTTP_200_OK)
-#         
-#     except Exception as e:
-#         print(f'❌ Error: {str(e)}')
-#         return Response(
-#             {'error': f'Error al obtener datos: {str(e)}'},
-#             status=status.HTTP_502_BAD_GATEWAY
-#         )
+@api_view(['GET'])
+@permission_classes([AllowAny])
+@cache_respuesta('publico', ['lecturas'])
+def obtener_clima(request):
+    """
+    Últimas lecturas de la API externa de clima
+    
+    GET /api/clima/?limite=50
+    
+    Se sirven desde la base de datos (las sincroniza el comando
+    sincronizar_clima), sin consultar la API externa en cada solicitud.
+    Mantiene el formato de la API externa.
+    """
+    try:
+        limite = min(int(request.query_params.get('limite', 50)), 1000)
+    except ValueError:
+        return Response({'error': 'limite debe ser un entero'}, status=status.HTTP_400_BAD_REQUEST)
+    
+    lecturas = (
+        DatosMeteorologicos.objects
+        .filter(fuente=FUENTE_CLIMA)
+        .order_by('-timestamp')
+        .values_list('id_externo', 'temperatura', 'humedad', 'precipitacion', 'indice_uv', 'timestamp')
+        [:max(limite, 0)]
+    )
+    datos = [
+        {
+            'id': id_externo,
+            'temperatura': temperatura,
+            'humedad': humedad,
+            'lluvia': lluvia,
+            'uv': uv,
+            'fecha': timezone.localtime(timestamp).strftime('%Y-%m-%d %H:%M:%S'),
+        }
+        for id_externo, temperatura, humedad, lluvia, uv, timestamp in lecturas
+    ]
+    
+    response = Response(datos, status=status.HTTP_200_OK)
+    estado = leer_estado_sincronizacion()
+    if estado.get('ultima_sincronizacion'):
+        response['X-Ultima-Sincronizacion'] = estado['ultima_sincronizacion']
+    return response
 
 
 # @api_view(['POST'])
@@ -326,7 +385,7 @@ class UsuarioViewSet(viewsets.ReadOnlyModelViewSet):
 @permission_classes([IsAuthenticated])
 def crear_usuario_endpoint(request):
     """Crea un nuevo usuario (solo para admin)"""
-    rol = get_user_rol(request.user)
+    rol = request.rol
     if rol != 'administrativo':
         return Response(
             {'error': 'Solo administradores pueden crear usuarios'},
@@ -388,13 +447,74 @@ def crear_usuario_endpoint(request):
         )
 
 
+@api_view(['POST'])
+@permission_classes([IsAuthenticated])
+def crear_usuarios_lote(request):
+    """
+    Inscripción masiva de usuarios (solo para admin)
+
+    POST /api/crear-usuarios-lote/
+    Content-Type: application/json -> [{"nombre", "email", "password", "rol"}, ...]
+    Content-Type: text/csv         -> CSV con encabezados nombre,email,password,rol
+
+    Retorna un resultado por fila (creado o errores).
+    """
+    if request.rol != 'administrativo':
+        return Response(
+            {'error': 'Solo administradores pueden crear usuarios'},
+            status=status.HTTP_403_FORBIDDEN
+        )
+    
+    try:
+        if 'csv' in (request.content_type or ''):
+            if request.stream is None:
+                filas = []
+            else:
+                filas = leer_csv(linea.decode('utf-8-sig') for linea in request.stream)
+        else:
+            datos = request.data
+            if isinstance(datos, dict):
+                datos = datos.get('usuarios', [])
+            if not isinstance(datos, list):
+                return Response(
+                    {'error': 'Se espera una lista de usuarios'},
+                    status=status.HTTP_400_BAD_REQUEST
+                )
+            filas = enumerate(datos, start=1)
+        
+        creados, resultados = inscribir_usuarios(filas)
+        
+        return Response({
+            'success': creados > 0,
+            'mensaje': f'✅ {creados} usuarios creados',
+            'creados': creados,
+            'rechazados': len(resultados) - creados,
+            'resultados': resultados,
+        }, status=status.HTTP_201_CREATED if creados else status.HTTP_400_BAD_REQUEST)
+        
+    except IntegrityError:
+        return Response(
+            {'error': 'Otro proceso creó alguno de estos usuarios; reintenta la carga'},
+            status=status.HTTP_409_CONFLICT
+        )
+    except Exception as e:
+        return Response(
+            {'error': f'Error: {str(e)}'},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+
+
 @api_view(['POST'])
 @permission_classes([IsAuthenticated])
 def guardar_datos_csv(request):
     """
     Guarda datos en el CSV de cultivos
+
+    Acepta una lectura (objeto JSON) o una lista de lecturas.
+    Las lecturas quedan en el diario de ingesta antes de responder y
+    se escriben en el CSV por lotes.
     """
-    rol = get_user_rol(request.user)
+    rol = request.rol
     if rol not in ['profesor', 'administrativo']:
         return Response(
             {'error': 'No tienes permiso'},
@@ -403,11 +523,20 @@ def guardar_datos_csv(request):
     
     try:
         datos = request.data
-        guardar_en_csv(datos)
+        lecturas = datos if isinstance(datos, list) else [datos]
+        if not lecturas:
+            return Response(
+                {'error': 'No hay datos para guardar'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        filas_escritas = guardar_en_csv(lecturas)
         
         return Response({
             'success': True,
-            'mensaje': '✅ Datos guardados en CSV'
+            'mensaje': '✅ Datos guardados en CSV' if filas_escritas else '✅ Datos encolados para el CSV',
+            'encolados': len(lecturas),
+            'filas_escritas': filas_escritas,
         }, status=status.HTTP_201_CREATED)
         
     except Exception as e:
@@ -417,60 +546,441 @@ def guardar_datos_csv(request):
         )
 
 
-def guardar_en_csv(datos):
-    """Guarda los datos en el CSV de cultivos"""
+@api_view(['POST'])
+@permission_classes([IsAuthenticated])
+def guardar_datos_csv_lote(request):
+    """
+    Carga masiva de lecturas (recuperación de estaciones sin conexión)
+
+    POST /api/guardar-datos-csv/lote/
+    Content-Type: application/x-ndjson  -> una lectura JSON por línea
+    Content-Type: text/csv              -> CSV con encabezados (fecha o date)
+
+    El cuerpo se procesa línea por línea sin cargarlo entero en memoria.
+    Retorna las filas escritas y los errores por línea.
+    """
+    rol = request.rol
+    if rol not in ['profesor', 'administrativo']:
+        return Response(
+            {'error': 'No tienes permiso'},
+            status=status.HTTP_403_FORBIDDEN
+        )
+    
+    if request.stream is None:
+        return Response(
+            {'error': 'No hay datos para guardar'},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+    
     try:
-        csv_path = Path(settings.BASE_DIR) / 'cultivos_viabilidad_FINAL.csv'
+        lineas = (linea.decode('utf-8-sig') for linea in request.stream)
+        if 'csv' in (request.content_type or ''):
+            lecturas = leer_csv(lineas)
+        else:
+            lecturas = leer_ndjson(lineas)
         
-        fila = {
-            'date': datos.get('fecha'),
-            'temperatura': datos.get('temperatura'),
-            'radiacion_solar': datos.get('radiacion_solar'),
-            'humedad_suelo': datos.get('humedad_suelo'),
-            'humedad': datos.get('humedad'),
-            'precipitacion': datos.get('precipitacion'),
-            'tomate': datos.get('tomate', 'No'),
-            'banana': datos.get('banana', 'No'),
-            'cacao': datos.get('cacao', 'No'),
-            'arroz': datos.get('arroz', 'No'),
-            'maiz': datos.get('maiz', 'No'),
-        }
+        filas_escritas, errores = procesar_carga_masiva(lecturas)
         
-        fieldnames = ['date', 'temperatura', 'radiacion_solar', 'humedad_suelo', 
-                      'humedad', 'precipitacion', 'tomate', 'banana', 'cacao', 'arroz', 'maiz']
+        return Response({
+            'success': not errores,
+            'mensaje': f'✅ {filas_escritas} lecturas guardadas en CSV',
+            'filas_escritas': filas_escritas,
+            'rechazadas': len(errores),
+            'errores': errores,
+        }, status=status.HTTP_201_CREATED if filas_escritas else status.HTTP_400_BAD_REQUEST)
         
-        with open(csv_path, 'a', newline='', encoding='utf-8') as f:
-            writer = csv.DictWriter(f, fieldnames=fieldnames)
-            writer.writerow(fila)
-            
     except Exception as e:
-        print(f"Error guardando CSV: {str(e)}")
+        return Response(
+            {'error': f'Error: {str(e)}'},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+
+
+def guardar_en_csv(datos):
+    """
+    Encola los datos para el CSV de cultivos
+
+    Recibe una lectura o una lista de lecturas. Retorna las filas escritas
+    si esta llamada disparó la escritura de un lote (0 si quedaron en cola).
+    """
+    lecturas = datos if isinstance(datos, list) else [datos]
+    filas = [construir_fila(lectura) for lectura in lecturas]
+    return get_buffer().encolar(filas)
 
 
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
-def me(request):
-    """Obtiene información del usuario autenticado"""
-    user = request.user
+def estadisticas_cache_roles(request):
+    """Aciertos y fallos de la cache de roles de este proceso (solo administrativos)"""
+    if request.rol != 'administrativo':
+        return Response(
+            {'error': 'No tienes permiso'},
+            status=status.HTTP_403_FORBIDDEN
+        )
+    return Response(cache_roles.estadisticas())
+
+
+@api_view(['GET'])
+@permission_classes([AllowAny])
+def metricas_prometheus(request):
+    """
+    Métricas por ruta de este proceso en formato de texto de Prometheus
+
+    GET /api/metricas/
+    Header X-Metricas-Token (METRICAS['TOKEN']) para el scraper, o un
+    token JWT de un administrativo.
+    """
+    token = settings.METRICAS['TOKEN']
+    enviado = request.META.get('HTTP_X_METRICAS_TOKEN', '')
+    autorizado_por_token = bool(token) and hmac.compare_digest(enviado.encode(), token.encode())
+    if not autorizado_por_token and request.rol != 'administrativo':
+        return Response(
+            {'error': 'No tienes permiso'},
+            status=status.HTTP_403_FORBIDDEN
+        )
+    return HttpResponse(
+        registro_metricas.texto_prometheus(),
+        content_type='text/plain; version=0.0.4; charset=utf-8'
+    )
+
+
+# ============================================================================
+# LECTURAS - CONSULTAS
+# ============================================================================
+
+class LecturaViewSet(viewsets.ReadOnlyModelViewSet):
+    """
+    API para consultar lecturas
+
+    GET /api/lecturas/?desde=2025-01-01&hasta=2025-02-01&fuente=sensor&temperatura_min=20
+        -> paginado por cursor (?cursor=...&limite=500)
+    GET /api/lecturas/?formato=jsonl | ?formato=csv
+        -> exportación en streaming, en orden cronológico
+    """
+    queryset = DatosMeteorologicos.objects.all()
+    serializer_class = DatosMeteorologicosSerializer
+    permission_classes = [IsAuthenticated]
+    pagination_class = LecturaCursorPagination
+    
+    def get_queryset(self):
+        return filtrar_lecturas(DatosMeteorologicos.objects.all(), self.request.query_params)
+    
+    @method_decorator(cache_respuesta('publico', ['lecturas']))
+    def list(self, request, *args, **kwargs):
+        formato = request.query_params.get('formato')
+        if formato is None:
+            return super().list(request, *args, **kwargs)
+        
+        filas = iterar_por_bloques(self.get_queryset())
+        if formato == 'jsonl':
+            return StreamingHttpResponse(generar_jsonl(filas), content_type='application/x-ndjson')
+        if formato == 'csv':
+            response = StreamingHttpResponse(generar_csv(filas), content_type='text/csv')
+            response['Content-Disposition'] = 'attachment; filename="lecturas.csv"'
+            return response
+        
+        return Response(
+            {'error': 'formato debe ser jsonl o csv'},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+
+
+class ExportacionViewSet(viewsets.ReadOnlyModelViewSet):
+    """
+    Exportaciones de lecturas a CSV en segundo plano
+
+    POST /api/exportaciones/  {"desde": "2024-01-01", "hasta": "2025-01-01", "fuente": "sensor"}
+        -> 202 con la exportación nueva, o 200 si se reutiliza una igual
+    GET  /api/exportaciones/<id>/            -> estado y progreso
+    GET  /api/exportaciones/<id>/descargar/  -> archivo (admite Range para reanudar)
+    """
+    serializer_class = ExportacionCSVSerializer
+    permission_classes = [IsAuthenticated]
+    
+    def get_queryset(self):
+        queryset = ExportacionCSV.objects.all()
+        if self.request.rol != 'administrativo':
+            queryset = queryset.filter(creado_por_id=self.request.user.id)
+        return queryset
+    
+    def create(self, request):
+        filtros = normalizar_filtros(request.data if isinstance(request.data, dict) else {})
+        exportacion, reutilizada = solicitar_exportacion(
+            filtros, request.user.id, reutilizar_ajenas=request.rol == 'administrativo'
+        )
+        return Response(
+            {**self.get_serializer(exportacion).data, 'reutilizada': reutilizada},
+            status=status.HTTP_200_OK if reutilizada else status.HTTP_202_ACCEPTED
+        )
+    
+    @action(detail=True, methods=['get'])
+    def descargar(self, request, pk=None):
+        exportacion = self.get_object()
+        if exportacion.estado != 'completado' or not os.path.exists(exportacion.ruta):
+            return Response(
+                {'error': 'La exportación no está lista', 'estado': exportacion.estado,
+                 'progreso': exportacion.progreso},
+                status=status.HTTP_409_CONFLICT
+            )
+        return respuesta_archivo(request, exportacion.ruta, exportacion.nombre_archivo)
+
+
+class RangoCultivoViewSet(viewsets.ModelViewSet):
+    """
+    Rangos óptimos por cultivo (lectura para todos, edición solo administrativos)
+
+    Después de cambiarlos, `manage.py recalcular_viabilidad` reescribe el historial.
+    """
+    queryset = RangoCultivo.objects.all()
+    serializer_class = RangoCultivoSerializer
+    permission_classes = [IsAuthenticated]
+    lookup_field = 'cultivo'
+    
+    @method_decorator(cache_respuesta('publico', ['rangos']))
+    def list(self, request, *args, **kwargs):
+        configurados = {rango['cultivo']: rango for rango in self.get_serializer(self.get_queryset(), many=True).data}
+        datos = []
+        for cultivo in CULTIVOS:
+            if cultivo in configurados:
+                datos.append(configurados[cultivo])
+            else:
+                rango = {'cultivo': cultivo, 'actualizado_en': None}
+                for metrica, (minimo, maximo) in RANGOS_POR_DEFECTO[cultivo].items():
+                    rango[f'{metrica}_min'] = minimo
+                    rango[f'{metrica}_max'] = maximo
+                datos.append(rango)
+        return Response(datos)
+    
+    def check_permissions(self, request):
+        super().check_permissions(request)
+        if request.method not in ('GET', 'HEAD', 'OPTIONS') and request.rol != 'administrativo':
+            self.permission_denied(request, message='Solo administradores pueden cambiar los rangos')
+
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+@cache_respuesta('publico', ['lecturas', 'rangos'])
+def viabilidad(request):
+    """
+    Viabilidad de cada cultivo en una ventana de lecturas
+
+    GET /api/viabilidad/?desde=2024-01-01&hasta=2025-01-01
+
+    Evalúa todas las lecturas del CSV de cultivos en la ventana con los
+    rangos actuales (vectorizado sobre el archivo histórico y la cache columnar).
+    """
+    try:
+        desde = _fecha_parametro(request, 'desde')
+        hasta = _fecha_parametro(request, 'hasta')
+    except ValueError as e:
+        return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+    
+    frame = frame_completo(desde=desde, hasta=hasta, columnas=METRICAS_RANGO)
+    return Response({
+        'desde': frame.index[0].isoformat() if len(frame) else None,
+        'hasta': frame.index[-1].isoformat() if len(frame) else None,
+        'umbral': settings.VIABILIDAD['UMBRAL'],
+        'cultivos': resumen_viabilidad({metrica: frame[metrica].to_numpy() for metrica in METRICAS_RANGO}),
+    })
+
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+@cache_respuesta('publico', ['lecturas'])
+def estadisticas(request):
+    """
+    Estadísticas de las métricas del CSV de cultivos por intervalos
+
+    GET /api/estadisticas/?desde=2024-01-01&hasta=2025-01-01&intervalo=15min&ventana=4&base=10
+
+    Promedio, mínimo, máximo y promedio móvil (sobre `ventana` intervalos)
+    de cada métrica, lluvia por intervalo y acumulada, y grados-día por
+    cultivo (base por cultivo, o `base` para todos). Formato columnar:
+    la posición i de cada serie es el intervalo que empieza en
+    `inicio` + i * `intervalo_segundos` (hora local).
+    """
+    try:
+        desde = _fecha_parametro(request, 'desde')
+        hasta = _fecha_parametro(request, 'hasta')
+        intervalo = parsear_intervalo(request.query_params.get('intervalo', '1h'))
+    except ValueError as e:
+        return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+    
+    try:
+        ventana = int(request.query_params.get('ventana', settings.ESTADISTICAS['VENTANA_MOVIL']))
+        base = request.query_params.get('base')
+        bases = float(base) if base not in (None, '') else None
+    except ValueError:
+        return Response(
+            {'error': 'ventana debe ser un entero y base un número'},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+    if ventana < 1:
+        return Response({'error': 'ventana debe ser mayor a 0'}, status=status.HTTP_400_BAD_REQUEST)
     
-    if user.is_superuser:
-        rol = 'administrativo'
-        rol_display = 'Administrativo'
+    try:
+        return Response(estadisticas_ventana(desde, hasta, intervalo, ventana, bases))
+    except ValueError as e:
+        return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+
+def _fecha_parametro(request, parametro):
+    valor = request.query_params.get(parametro)
+    if not valor:
+        return None
+    fecha = parsear_fecha(valor)
+    if fecha is None:
+        raise ValueError(f'{parametro} inválido: {valor}')
+    return fecha
+
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+@cache_respuesta('publico', ['lecturas'])
+def resumenes(request):
+    """
+    Promedios, mínimos y máximos por hora o por día
+
+    GET /api/resumenes/?granularidad=dia&desde=2025-01-01&hasta=2025-07-01&fuente=sensor
+
+    Se calcula desde las tablas de resumen, sin leer las lecturas.
+    """
+    granularidad = request.query_params.get('granularidad', 'hora')
+    if granularidad not in GRANULARIDADES:
+        return Response(
+            {'error': f'granularidad debe ser una de: {", ".join(GRANULARIDADES)}'},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+    
+    filtros = {'granularidad': granularidad}
+    for parametro, lookup in (('desde', 'periodo__gte'), ('hasta', 'periodo__lt')):
+        valor = request.query_params.get(parametro)
+        if valor:
+            fecha = parsear_fecha(valor)
+            if fecha is None:
+                return Response(
+                    {'error': f'{parametro} inválido: {valor}'},
+                    status=status.HTTP_400_BAD_REQUEST
+                )
+            filtros[lookup] = fecha
+    
+    fuente = request.query_params.get('fuente')
+    if fuente:
+        filtros['fuente'] = fuente
+    
+    datos = resumen_como_dict(ResumenLecturas.objects.filter(**filtros))
+    return Response({
+        'granularidad': granularidad,
+        'total': len(datos),
+        'datos': datos,
+    })
+
+
+@api_view(['GET', 'POST'])
+@permission_classes([IsAuthenticated])
+def prediccion(request):
+    """
+    Viabilidad predicha por el modelo ML para cada cultivo
+
+    GET  /api/prediccion/?horas=24&fuente=sensor   (ventana desde la BD)
+    POST /api/prediccion/  {"lecturas": [{...}, ...]}
+
+    Las solicitudes concurrentes se agrupan en una sola llamada al
+    modelo; una ventana ya evaluada con la misma versión del modelo se
+    responde desde la cache del proceso.
+    """
+    ultima = None
+    if request.method == 'POST':
+        lecturas = request.data.get('lecturas') if isinstance(request.data, dict) else request.data
+        if not isinstance(lecturas, list) or not lecturas:
+            return Response(
+                {'error': 'Se requiere una lista de lecturas'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        try:
+            entrada = entrada_desde_lecturas(lecturas)
+        except (TypeError, ValueError) as e:
+            return Response({'error': f'Lecturas inválidas: {str(e)}'}, status=status.HTTP_400_BAD_REQUEST)
     else:
         try:
-            usuario = Usuario.objects.get(user=user)
-            rol = usuario.rol
-            rol_display = usuario.get_rol_display()
-        except Usuario.DoesNotExist:
-            rol = 'estudiante'
-            rol_display = 'Estudiante'
+            horas = float(request.query_params.get('horas', settings.ML['HORAS_VENTANA']))
+        except ValueError:
+            return Response({'error': 'horas debe ser numérico'}, status=status.HTTP_400_BAD_REQUEST)
+        ventana = DatosMeteorologicos.objects.ultimas_horas(horas, request.query_params.get('fuente'))
+        filas = list(ventana.values_list('id', *METRICAS))
+        if not filas:
+            return Response(
+                {'error': 'No hay lecturas en la ventana solicitada'},
+                status=status.HTTP_404_NOT_FOUND
+            )
+        ultima = filas[0][0]
+        entrada = entrada_desde_lecturas([fila[1:] for fila in filas])
+    
+    if np.isnan(entrada).all():
+        return Response({'error': 'La ventana no tiene métricas'}, status=status.HTTP_400_BAD_REQUEST)
+    
+    servicio = get_servicio()
+    try:
+        resultado, desde_cache = servicio.predecir(entrada)
+    except Exception as e:
+        print(f"Error en predicción: {str(e)}")
+        return Response({'error': 'Error en predicción'}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+    
+    predicciones = [
+        {
+            'cultivo': cultivo,
+            'viabilidad': resultado['viabilidad'][i],
+            'viable': resultado['viabilidad'][i] >= settings.VIABILIDAD['UMBRAL'],
+            'confianza': resultado['confianza'][i],
+        }
+        for i, cultivo in enumerate(CULTIVOS)
+    ]
+    
+    if not desde_cache:
+        clave = clave_entrada(entrada)
+        Prediccion.objects.bulk_create([
+            Prediccion(
+                cultivo=p['cultivo'], viabilidad=p['viabilidad'], confianza=p['confianza'],
+                modelo_version=servicio.version, clave_entrada=clave, datos_id=ultima,
+            )
+            for p in predicciones
+        ])
+    
+    return Response({
+        'modelo_version': servicio.version,
+        'cache': desde_cache,
+        'entrada': {metrica: None if np.isnan(v) else round(float(v), 2) for metrica, v in zip(METRICAS, entrada)},
+        'predicciones': predicciones,
+    })
+
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+@cache_respuesta('usuario', ['usuarios'])
+def me(request):
+    """Obtiene información del usuario autenticado"""
+    # Nombre y email de la BD: los claims del token no cambian al editar el
+    # usuario (la respuesta se cachea con la versión 'usuarios')
+    user = (
+        User.objects
+        .filter(pk=request.user.id)
+        .values('id', 'username', 'email', 'first_name', 'last_name')
+        .first()
+    )
+    if user is None:
+        return Response(
+            {'error': 'Usuario no encontrado'},
+            status=status.HTTP_404_NOT_FOUND
+        )
+    rol = str(request.rol)
+    rol_display = dict(Usuario.ROLES).get(rol, rol)
     
     return Response({
-        'id': user.id,
-        'username': user.username,
-        'email': user.email,
-        'first_name': user.first_name or user.username,
-        'last_name': user.last_name or '',
+        'id': user['id'],
+        'username': user['username'],
+        'email': user['email'],
+        'first_name': user['first_name'] or user['username'],
+        'last_name': user['last_name'] or '',
         'rol': rol,
         'rol_display': rol_display,
     })
\ No newline at end of file
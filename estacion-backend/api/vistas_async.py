@@ -0,0 +1,338 @@
+"""
+Vistas asíncronas para endpoints limitados por E/S (modo ASGI)
+
+Con `uvicorn config.asgi:application` un solo proceso atiende cientos de
+conexiones lentas (API externa lenta, clientes lentos) sin un hilo por
+request. En modo WSGI (PythonAnywhere) Django las ejecuta con
+async_to_sync ocupando un hilo, y StreamingHttpResponse convierte un
+iterador asíncrono en una lista antes de enviar nada. Por eso:
+
+- la exportación usa en WSGI los generadores síncronos de /api/lecturas/
+  (sigue enviando por bloques, sin cargar todo en memoria);
+- el feed SSE responde 501 en WSGI: usar el long-poll de
+  /api/async/lecturas/nuevas/, que no depende del streaming.
+
+DRF 3.14 no soporta vistas asíncronas: la autenticación JWT se hace a
+mano con la misma clase configurada en REST_FRAMEWORK.
+"""
+import asyncio
+import json
+import time
+import weakref
+
+import httpx
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.handlers.asgi import ASGIRequest
+from django.http import JsonResponse, StreamingHttpResponse
+from rest_framework.exceptions import APIException, ValidationError
+
+from .authentication import JWTRolAuthentication
+from .difusion import get_difusor
+from .ingesta import leer_csv, leer_ndjson, procesar_carga_masiva
+from .lecturas import (
+    CAMPOS_EXPORTACION, escritor_csv, filtrar_lecturas, generar_csv, generar_jsonl, iterar_por_bloques,
+    iterar_por_bloques_async, linea_csv, linea_jsonl
+)
+from .models import DatosMeteorologicos
+
+
+# Un cliente HTTP (con su pool de conexiones) por event loop
+_clientes = weakref.WeakKeyDictionary()
+
+
+def get_cliente():
+    """Cliente httpx compartido por todas las vistas del event loop actual"""
+    loop = asyncio.get_running_loop()
+    cliente = _clientes.get(loop)
+    if cliente is None:
+        cliente = httpx.AsyncClient(
+            timeout=settings.API_EXTERNA['TIMEOUT'],
+            limits=httpx.Limits(
+                max_connections=settings.API_EXTERNA['MAX_CONEXIONES_ASYNC'],
+                max_keepalive_connections=20,
+            ),
+            headers={'Accept': 'application/json'},
+        )
+        _clientes[loop] = cliente
+    return cliente
+
+
+def _es_asgi(request):
+    """True si el request llegó por el servidor ASGI"""
+    return isinstance(request, ASGIRequest)
+
+
+async def _autenticar(request, roles=None, token_en_url=False):
+    """
+    Autentica el JWT del header Authorization.
+    Retorna None si está autorizado, o la JsonResponse de error.
+
+    token_en_url: acepta también ?token= (solo para EventSource, que no
+    permite enviar headers; en la URL el token queda en los logs).
+    """
+    if token_en_url and 'HTTP_AUTHORIZATION' not in request.META and request.GET.get('token'):
+        request.META['HTTP_AUTHORIZATION'] = f"Bearer {request.GET['token']}"
+    try:
+        resultado = await sync_to_async(JWTRolAuthentication().authenticate)(request)
+    except APIException as e:
+        return JsonResponse({'error': str(e.detail)}, status=e.status_code)
+    if resultado is None:
+        return JsonResponse({'error': 'Se requiere autenticación'}, status=401)
+
+    request.user, request.auth = resultado
+    if roles is not None:
+        rol = await sync_to_async(str)(request.rol)
+        if rol not in roles:
+            return JsonResponse({'error': 'No tienes permiso'}, status=403)
+    return None
+
+
+async def proxy_clima(request):
+    """
+    Consulta en vivo la API externa de clima
+
+    GET /api/async/clima/proxy/
+
+    Para lecturas frecuentes usar /api/clima/ (datos ya sincronizados).
+    Mientras espera a la API externa no ocupa ningún hilo.
+    """
+    if request.method != 'GET':
+        return JsonResponse({'error': 'Método no permitido'}, status=405)
+    error = await _autenticar(request)
+    if error:
+        return error
+
+    try:
+        response = await get_cliente().get(settings.API_EXTERNA['URL'])
+        response.raise_for_status()
+        datos = response.json()
+    except (httpx.HTTPError, ValueError) as e:
+        print(f'❌ Error consultando API externa: {str(e)}')
+        return JsonResponse({'error': f'Error al obtener datos: {str(e)}'}, status=502)
+
+    return JsonResponse(datos, safe=False)
+
+
+async def exportar_lecturas(request):
+    """
+    Exportación en streaming de lecturas
+
+    GET /api/async/lecturas/exportar/?formato=jsonl|csv&desde=...&hasta=...
+
+    Mismos filtros que /api/lecturas/. En ASGI un cliente lento solo
+    retiene una corrutina, no un hilo del servidor; en WSGI se usa el
+    streaming síncrono de /api/lecturas/.
+    """
+    if request.method != 'GET':
+        return JsonResponse({'error': 'Método no permitido'}, status=405)
+    error = await _autenticar(request)
+    if error:
+        return error
+
+    formato = request.GET.get('formato', 'jsonl')
+    if formato not in ('jsonl', 'csv'):
+        return JsonResponse({'error': 'formato debe ser jsonl o csv'}, status=400)
+    try:
+        queryset = filtrar_lecturas(DatosMeteorologicos.objects.all(), request.GET)
+    except ValidationError as e:
+        return JsonResponse(e.detail, status=400)
+
+    if _es_asgi(request):
+        filas = iterar_por_bloques_async(queryset)
+        a_jsonl, a_csv = _generar_jsonl, _generar_csv
+    else:
+        # WSGI consumiría un iterador asíncrono completo antes de enviarlo
+        filas = iterar_por_bloques(queryset)
+        a_jsonl, a_csv = generar_jsonl, generar_csv
+
+    if formato == 'jsonl':
+        return StreamingHttpResponse(a_jsonl(filas), content_type='application/x-ndjson')
+
+    response = StreamingHttpResponse(a_csv(filas), content_type='text/csv')
+    response['Content-Disposition'] = 'attachment; filename="lecturas.csv"'
+    return response
+
+
+async def _generar_jsonl(filas):
+    async for fila in filas:
+        yield linea_jsonl(fila)
+
+
+async def _generar_csv(filas):
+    writer = escritor_csv()
+    yield writer.writerow(CAMPOS_EXPORTACION)
+    async for fila in filas:
+        yield linea_csv(writer, fila)
+
+
+async def guardar_datos_lote(request):
+    """
+    Carga masiva de lecturas (igual que /api/guardar-datos-csv/lote/)
+
+    POST /api/async/guardar-datos-csv/lote/
+
+    El servidor ASGI recibe el cuerpo sin bloquear un hilo; la validación
+    y la escritura del CSV se ejecutan en el hilo de código síncrono.
+    """
+    if request.method != 'POST':
+        return JsonResponse({'error': 'Método no permitido'}, status=405)
+    error = await _autenticar(request, roles=('profesor', 'administrativo'))
+    if error:
+        return error
+
+    def procesar():
+        lineas = (linea.decode('utf-8-sig') for linea in request)
+        if 'csv' in (request.content_type or ''):
+            return procesar_carga_masiva(leer_csv(lineas))
+        return procesar_carga_masiva(leer_ndjson(lineas))
+
+    try:
+        filas_escritas, errores = await sync_to_async(procesar)()
+    except Exception as e:
+        return JsonResponse({'error': f'Error: {str(e)}'}, status=400)
+
+    return JsonResponse({
+        'success': not errores,
+        'mensaje': f'✅ {filas_escritas} lecturas guardadas en CSV',
+        'filas_escritas': filas_escritas,
+        'rechazadas': len(errores),
+        'errores': errores,
+    }, status=201 if filas_escritas else 400)
+
+
+def _ultimo_id(request):
+    valor = request.META.get('HTTP_LAST_EVENT_ID') or request.GET.get('ultimo_id')
+    try:
+        return int(valor) if valor not in (None, '') else None
+    except ValueError:
+        return None
+
+
+async def feed_lecturas(request):
+    """
+    Feed de lecturas nuevas con Server-Sent Events
+
+    GET /api/async/lecturas/feed/   (Accept: text/event-stream)
+
+    Al reconectarse, EventSource envía Last-Event-ID y se reenvían las
+    lecturas perdidas desde el buffer del difusor. Si ya no están en el
+    buffer se envía un evento 'reinicio': el cliente debe recargar desde
+    /api/lecturas/. Solo en modo ASGI: en WSGI responde 501 (el stream no
+    se enviaría hasta terminar la conexión).
+    """
+    if request.method != 'GET':
+        return JsonResponse({'error': 'Método no permitido'}, status=405)
+    if not _es_asgi(request):
+        return JsonResponse(
+            {'error': 'El feed SSE requiere el servidor ASGI; usar /api/async/lecturas/nuevas/'},
+            status=501,
+        )
+    error = await _autenticar(request, token_en_url=True)
+    if error:
+        return error
+
+    response = StreamingHttpResponse(
+        _generar_eventos(get_difusor(), _ultimo_id(request)),
+        content_type='text/event-stream',
+    )
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'  # nginx no debe acumular el stream
+    return response
+
+
+async def _generar_eventos(difusor, ultimo_id):
+    if ultimo_id is None:
+        ultimo_id = difusor.ultimo_id
+    # Suscribirse antes de leer el buffer para no perder eventos entre ambos
+    suscripcion = difusor.suscribir()
+    try:
+        yield f"retry: {settings.DIFUSION['RECONEXION_MS']}\n\n"
+
+        actual = difusor.ultimo_id
+        pendientes, completo = difusor.desde(ultimo_id)
+        if not completo:
+            yield f'event: reinicio\ndata: {json.dumps({"ultimo_id": actual})}\n\n'
+            # Un id de otro proceso puede ser mayor que los de este difusor
+            ultimo_id = min(ultimo_id, actual)
+        enviado = ultimo_id
+        for id_evento, datos in pendientes:
+            yield _mensaje_sse(id_evento, datos)
+            enviado = id_evento
+
+        # Django 4.2 no avisa a la vista cuando el cliente se desconecta: cada
+        # conexión dura como máximo DURACION_MAXIMA y EventSource se reconecta solo
+        limite = time.monotonic() + settings.DIFUSION['DURACION_MAXIMA']
+        while not suscripcion.desbordada and time.monotonic() < limite:
+            try:
+                id_evento, datos = await asyncio.wait_for(
+                    suscripcion.cola.get(), timeout=settings.DIFUSION['KEEPALIVE']
+                )
+            except asyncio.TimeoutError:
+                # Comentario SSE: mantiene viva la conexión a través de proxies
+                yield ': ping\n\n'
+                continue
+            if id_evento > enviado:
+                yield _mensaje_sse(id_evento, datos)
+                enviado = id_evento
+    finally:
+        difusor.desuscribir(suscripcion)
+
+
+def _mensaje_sse(id_evento, datos):
+    return f'id: {id_evento}\nevent: lectura\ndata: {json.dumps(datos)}\n\n'
+
+
+async def nuevas_lecturas(request):
+    """
+    Long-poll de lecturas nuevas (alternativa a SSE)
+
+    GET /api/async/lecturas/nuevas/?ultimo_id=N&espera=25
+
+    Responde en cuanto hay lecturas con id > ultimo_id, o vacío al cumplirse
+    la espera. El cliente repite con el ultimo_id recibido.
+    """
+    if request.method != 'GET':
+        return JsonResponse({'error': 'Método no permitido'}, status=405)
+    error = await _autenticar(request)
+    if error:
+        return error
+
+    try:
+        espera = min(float(request.GET.get('espera', 25)), settings.DIFUSION['ESPERA_MAXIMA'])
+    except ValueError:
+        return JsonResponse({'error': 'espera debe ser numérico'}, status=400)
+
+    difusor = get_difusor()
+    ultimo_id = _ultimo_id(request)
+    if ultimo_id is None:
+        ultimo_id = difusor.ultimo_id
+    suscripcion = difusor.suscribir()
+    try:
+        eventos, completo = difusor.desde(ultimo_id)
+        if not eventos and completo:
+            try:
+                eventos = [await asyncio.wait_for(suscripcion.cola.get(), timeout=espera)]
+            except asyncio.TimeoutError:
+                eventos = []
+            # Lo que llegó en el mismo lote
+            while not suscripcion.cola.empty():
+                eventos.append(suscripcion.cola.get_nowait())
+    finally:
+        difusor.desuscribir(suscripcion)
+
+    if eventos:
+        ultimo_id = eventos[-1][0]
+    elif not completo:
+        ultimo_id = difusor.ultimo_id
+
+    return JsonResponse({
+        'ultimo_id': ultimo_id,
+        'reinicio': not completo,
+        'lecturas': [{'id': id_evento, **datos} for id_evento, datos in eventos],
+    })
+
+
+# Se autentican con JWT, no con la cookie de sesión
+# (csrf_exempt de Django 4.2 no acepta vistas asíncronas)
+guardar_datos_lote.csrf_exempt = True
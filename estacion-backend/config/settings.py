@@ -1,7 +1,7 @@
 import os
 from pathlib import Path
 from datetime import timedelta
-from decouple import config
+from decouple import Csv, config
 import pymysql
 pymysql.install_as_MySQLdb()
 # Build paths
@@ -11,6 +11,8 @@ BASE_DIR = Path(__file__).resolve().parent.parent
 SECRET_KEY = config('SECRET_KEY', default='tu-clave-secreta-cambiar-en-produccion')
 DEBUG = config('DEBUG', default=True, cast=bool)
 ALLOWED_HOSTS =['Dancar.pythonanywhere.com']
+# Hosts adicionales (servidores locales de pruebas de carga): "127.0.0.1,localhost"
+ALLOWED_HOSTS += config('ALLOWED_HOSTS_EXTRA', default='', cast=Csv())
 # Application definition
 INSTALLED_APPS = [
     'django.contrib.admin',
@@ -31,11 +33,14 @@ INSTALLED_APPS = [
 
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
+    'api.metricas.MetricasMiddleware',
+    'api.routers.ReplicaMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'corsheaders.middleware.CorsMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'api.middleware.RolMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
@@ -60,21 +65,80 @@ TEMPLATES = [
 
 WSGI_APPLICATION = 'config.wsgi.application'
 
-# Database - SQLite (desarrollo)
-DATABASES = {
-    'default': {
-        'ENGINE': 'django.db.backends.mysql',
-        'NAME': 'estacion_meteorologica',
-        'USER': 'root',
-        'PASSWORD': 'root',
-        'HOST': 'localhost',
-        'PORT': '3306',
-        'OPTIONS': {
-            'init_command': "SET sql_mode='STRICT_TRANS_TABLES'",
-            'charset': 'utf8mb4',
+# Database - MySQL (DB_ENGINE=sqlite para desarrollo y benchmarks locales)
+DB_ENGINE = config('DB_ENGINE', default='mysql')
+
+# Pool de conexiones por proceso (api/db/pool.py). Con el pool cada request
+# devuelve su conexión al cerrar, por eso CONN_MAX_AGE queda en 0; sin pool,
+# conexiones persistentes por hilo (no recomendado en ASGI)
+DB_POOL = {
+    'ACTIVO': config('DB_POOL', default=True, cast=bool),
+    'TAMANO': config('DB_POOL_TAMANO', default=10, cast=int),  # conexiones inactivas por proceso
+    'EDAD_MAXIMA': config('DB_POOL_EDAD_MAXIMA', default=3600, cast=int),  # segundos, menor que wait_timeout
+    'PING_INACTIVA': 30,  # segundos inactiva antes de verificarla con un ping
+}
+
+CONEXIONES = {
+    'CONN_MAX_AGE': 0 if DB_POOL['ACTIVO'] else config('DB_CONN_MAX_AGE', default=60, cast=int),
+    'CONN_HEALTH_CHECKS': config('DB_CONN_HEALTH_CHECKS', default=True, cast=bool),
+}
+
+if DB_ENGINE == 'sqlite':
+    DATABASES = {
+        'default': {
+            'ENGINE': 'api.db.sqlite3' if DB_POOL['ACTIVO'] else 'django.db.backends.sqlite3',
+            'NAME': config('DB_NAME', default=str(BASE_DIR / 'db.sqlite3')),
+            **CONEXIONES,
         }
     }
+else:
+    DATABASES = {
+        'default': {
+            'ENGINE': 'api.db.mysql' if DB_POOL['ACTIVO'] else 'django.db.backends.mysql',
+            'NAME': config('DB_NAME', default='estacion_meteorologica'),
+            'USER': config('DB_USER', default='root'),
+            'PASSWORD': config('DB_PASSWORD', default='root'),
+            'HOST': config('DB_HOST', default='localhost'),
+            'PORT': config('DB_PORT', default='3306'),
+            **CONEXIONES,
+            'OPTIONS': {
+                'init_command': "SET sql_mode='STRICT_TRANS_TABLES'",
+                'charset': 'utf8mb4',
+            }
+        }
+    }
+
+# Réplica de lectura opcional (api/routers.py): DB_REPLICA_HOST para MySQL,
+# DB_REPLICA_NAME para otro archivo SQLite
+if config('DB_REPLICA_HOST', default='') or config('DB_REPLICA_NAME', default=''):
+    DATABASES['replica'] = {
+        **DATABASES['default'],
+        'NAME': config('DB_REPLICA_NAME', default=DATABASES['default']['NAME']),
+        'HOST': config('DB_REPLICA_HOST', default=DATABASES['default'].get('HOST', '')),
+        'USER': config('DB_REPLICA_USER', default=DATABASES['default'].get('USER', '')),
+        'PASSWORD': config('DB_REPLICA_PASSWORD', default=DATABASES['default'].get('PASSWORD', '')),
+        'TEST': {'MIRROR': 'default'},
+    }
+
+DATABASE_ROUTERS = ['api.routers.ReplicaRouter']
+
+REPLICA = {
+    'ALIAS': 'replica',
+    'PEGAJOSIDAD': config('DB_REPLICA_PEGAJOSIDAD', default=5, cast=int),  # segundos leyendo de la primaria tras escribir
+    'COOKIE': 'db_primaria_hasta',
 }
+
+# Login con email o username (una sola consulta)
+AUTHENTICATION_BACKENDS = [
+    'api.backends.EmailOUsernameBackend',
+]
+
+# Bloqueo de login tras intentos fallidos (por email/username, en memoria)
+LOGIN_THROTTLE = {
+    'MAX_FALLOS': config('LOGIN_MAX_FALLOS', default=5, cast=int),
+    'VENTANA': config('LOGIN_VENTANA', default=300, cast=int),  # segundos
+}
+
 # Password validation
 AUTH_PASSWORD_VALIDATORS = [
     {'NAME': 'django.contrib.auth.password_validation.UserAttributeSimilarityValidator'},
@@ -111,7 +175,7 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 # REST Framework
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': (
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
+        'api.authentication.JWTRolAuthentication',
     ),
     'DEFAULT_PERMISSION_CLASSES': (
         'rest_framework.permissions.IsAuthenticated',
@@ -123,6 +187,7 @@ SIMPLE_JWT = {
     'ACCESS_TOKEN_LIFETIME': timedelta(hours=24),
     'REFRESH_TOKEN_LIFETIME': timedelta(days=7),
     'ALGORITHM': 'HS256',
+    'TOKEN_USER_CLASS': 'api.authentication.UsuarioToken',
 }
 
 # CORS
@@ -140,7 +205,144 @@ API_EXTERNA = {
     'URL': config('API_EXTERNA_URL', default='https://api.ejemplo.com/datos'),
     'KEY': config('API_EXTERNA_KEY', default='tu-api-key'),
     'TIMEOUT': 10,  # segundos
+    'MAX_CONEXIONES_ASYNC': 100,  # pool del cliente httpx de las vistas asíncronas
+}
+
+# Cache de respuestas GET por versión de datos (api/cache_respuestas.py)
+# Por defecto en archivos, compartida entre workers sin un servicio externo
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    'respuestas': {
+        'BACKEND': config(
+            'CACHE_RESPUESTAS_BACKEND',
+            default='django.core.cache.backends.filebased.FileBasedCache'
+        ),
+        'LOCATION': config('CACHE_RESPUESTAS_LOCATION', default=str(BASE_DIR / 'data' / 'cache_respuestas')),
+        'TIMEOUT': 600,
+        'OPTIONS': {'MAX_ENTRIES': 5000},
+    },
+}
+
+CACHE_RESPUESTAS = {
+    'ALIAS': 'respuestas',
+    'VERSIONES_DIR': BASE_DIR / 'data' / 'versiones',
+}
+
+# Métricas por ruta y perfilado (api/metricas.py, GET /api/metricas/)
+METRICAS = {
+    'TOKEN': config('METRICAS_TOKEN', default=''),  # header X-Metricas-Token para el scraper; vacío = solo administrativos
+    'PERFILADO': config('METRICAS_PERFILADO', default=False, cast=bool),  # cProfile con el header X-Perfilar (solo administrativos)
+    'PERFIL_MUESTREO': config('METRICAS_PERFIL_MUESTREO', default=0.05, cast=float),  # fracción de requests X-Perfilar perfilados
+    'PERFILES_DIR': DATA_LOGS_DIR / 'perfiles',
+}
+
+# Exportaciones de lecturas a CSV en segundo plano (api/exportaciones.py)
+EXPORTACION = {
+    'DIR': BASE_DIR / 'data' / 'exportaciones',
+    'TAMANO_BLOQUE': 5000,  # lecturas por bloque (un punto de reanudación por bloque)
+    'INACTIVIDAD': 120,  # segundos sin avance para considerar una exportación interrumpida
+}
+
+# Feed de lecturas nuevas (SSE / long-poll, api/difusion.py)
+DIFUSION = {
+    'CAPACIDAD': 1000,  # lecturas recientes para reanudar con Last-Event-ID
+    'COLA_MAXIMA': 500,  # eventos pendientes por cliente antes de cortarlo
+    'KEEPALIVE': 15,  # segundos entre pings SSE
+    'RECONEXION_MS': 3000,
+    'DURACION_MAXIMA': 300,  # segundos de una conexión SSE antes de pedir reconexión
+    'ESPERA_MAXIMA': 30,  # segundos de un long-poll
+}
+
+# Sincronización periódica con la API externa (manage.py sincronizar_clima)
+SINCRONIZACION = {
+    'INTERVALO': config('SINCRONIZACION_INTERVALO', default=300, cast=int),  # segundos
+    'BACKOFF_BASE': 5,  # segundos, se duplica con cada fallo consecutivo
+    'BACKOFF_MAXIMO': 600,
+    'IDS_RECORDADOS': 10000,
+    'ESTADO': DATA_LOGS_DIR / 'sincronizacion_clima.json',
 }
 
 # Modelo ML - Predicciones
 ML_MODEL_PATH = BASE_DIR / 'models' / 'prediccion_model.pkl'
+
+# Servicio de predicción (api/prediccion.py)
+ML = {
+    'PRECARGAR': config('ML_PRECARGAR', default=True, cast=bool),  # cargar el modelo al iniciar (antes del fork con --preload)
+    'ESPERA_MS': config('ML_ESPERA_MS', default=5, cast=float),  # ventana para agrupar solicitudes
+    'LOTE_MAXIMO': config('ML_LOTE_MAXIMO', default=64, cast=int),
+    'TIMEOUT': 10,  # segundos
+    'CACHE_MAXIMO': 1024,
+    'HORAS_VENTANA': 24,
+}
+
+# Ingesta de lecturas hacia el CSV de cultivos
+INGESTA = {
+    'CSV_CULTIVOS': BASE_DIR / 'cultivos_viabilidad_FINAL.csv',
+    'TAMANO_LOTE': config('INGESTA_TAMANO_LOTE', default=50, cast=int),
+    'INTERVALO_FLUSH': config('INGESTA_INTERVALO_FLUSH', default=2.0, cast=float),  # segundos
+    'TAMANO_LOTE_BD': 500,  # filas por INSERT en bulk_create
+    # Diario en disco de la cola: lo pendiente sobrevive a un reinicio del worker
+    'DIARIO_DIR': BASE_DIR / 'data' / 'ingesta',
+    # Lotes ya escritos en el CSV que la base de datos rechazó; se reintentan con el siguiente lote
+    'PENDIENTES_BD': BASE_DIR / 'data' / 'ingesta_pendientes_bd.jsonl',
+}
+
+# Cache columnar (mapeada en memoria) del CSV de cultivos
+CACHE_COLUMNAR_DIR = DATA_CSV_DIR / 'cultivos_cache'
+
+# Cache de roles de usuario (por proceso)
+CACHE_ROLES = {
+    'MAXIMO': 10000,  # usuarios en cache
+    'TTL': config('CACHE_ROLES_TTL', default=300, cast=int),  # segundos
+}
+
+# Estadísticas por intervalos (api/estadisticas.py, GET /api/estadisticas/)
+ESTADISTICAS = {
+    'INTERVALO_MINIMO': '1min',
+    'MAXIMO_INTERVALOS': 120000,  # cubetas por consulta (un año a 5 minutos)
+    'VENTANA_MOVIL': 4,  # cubetas del promedio móvil por defecto
+    # Temperatura base (°C) de los grados-día de cada cultivo
+    'TEMPERATURA_BASE': {'tomate': 10, 'banana': 14, 'cacao': 13, 'arroz': 10, 'maiz': 10},
+}
+
+# Control de calidad de las lecturas (api/calidad.py, manage.py revisar_calidad)
+CALIDAD = {
+    'REVISAR_EN_INGESTA': config('CALIDAD_REVISAR_EN_INGESTA', default=True, cast=bool),
+    # Rango físico aceptado de cada métrica (mínimo, máximo)
+    'RANGOS': {
+        'temperatura': (-50, 60),
+        'humedad': (0, 100),
+        'humedad_suelo': (0, 100),
+        'radiacion_solar': (0, 1500),
+        'precipitacion': (0, 300),
+    },
+    # Cambio máximo por minuto respecto de la lectura anterior de la fuente
+    'CAMBIO_MAXIMO': {'temperatura': 3, 'humedad': 15, 'humedad_suelo': 10, 'radiacion_solar': 400},
+    'VENTANA_CAMBIO': 60,  # minutos; con la anterior más vieja no se compara
+    # Picos: |x - mediana móvil| > PICO_UMBRAL MADs y mayor que PICO_MINIMO
+    'PICO_VENTANA': 11,  # lecturas, centrada
+    'PICO_UMBRAL': 6,
+    'PICO_MINIMO': {'temperatura': 3, 'humedad': 10, 'humedad_suelo': 8, 'radiacion_solar': 300},
+    # Sensor plano: el mismo valor durante PLANO_MINUTOS
+    'PLANO_MINUTOS': 180,
+    'PLANO_METRICAS': ['temperatura', 'humedad'],
+    'HUECO_MINUTOS': 30,  # sin lecturas de una fuente (solo se marca)
+    'VENTANA_HORAS': config('CALIDAD_VENTANA_HORAS', default=24, cast=int),
+    'INTERVALO': config('CALIDAD_INTERVALO', default=300, cast=int),  # segundos entre revisiones
+    'CUARENTENA': DATA_LOGS_DIR / 'calidad_cuarentena.jsonl',
+}
+
+# Inscripción masiva de usuarios
+INSCRIPCION = {
+    'PROCESOS': config('INSCRIPCION_PROCESOS', default=os.cpu_count() or 1, cast=int),
+    'MINIMO_PARA_POOL': 20,  # con menos filas se hashea en el mismo proceso
+    'TAMANO_LOTE_BD': 500,
+}
+
+# Viabilidad de cultivos (calculada en el servidor)
+VIABILIDAD = {
+    'UMBRAL': config('VIABILIDAD_UMBRAL', default=75, cast=float),  # puntaje 0-100
+    'CALCULAR_EN_INGESTA': True,  # ignora los 'Si'/'No' enviados por el cliente
+}